@@ -0,0 +1,161 @@
+import bisect
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from utils.config import (
+    WHATSAPP_SERVER_URL,
+    WHATSAPP_HTTP_POOL_SIZE,
+    WHATSAPP_HTTP_CONNECT_TIMEOUT,
+    WHATSAPP_HTTP_READ_TIMEOUT,
+    WHATSAPP_HTTP_RETRIES
+)
+from utils.logging_utils import log_warning
+
+class LatencyHistogram:
+    """Thread-safe latency histogram with fixed millisecond buckets"""
+
+    BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}  # {label: [count per bucket + overflow]}
+        self._totals = {}  # {label: [calls, errors, seconds]}
+
+    def observe(self, label, seconds, error=False):
+        """Record one call
+
+        Args:
+            label (str): Endpoint or operation name
+            seconds (float): Call duration
+            error (bool): Whether the call failed
+        """
+        bucket = bisect.bisect_left(LatencyHistogram.BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            counts = self._counts.setdefault(label, [0] * (len(LatencyHistogram.BUCKETS_MS) + 1))
+            counts[bucket] += 1
+            totals = self._totals.setdefault(label, [0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += error
+            totals[2] += seconds
+
+    def snapshot(self):
+        """Get the histogram of every label
+
+        Returns:
+            dict: {label: {calls, errors, avg_ms, buckets: {"<=ms": count}}}
+        """
+        with self._lock:
+            resultado = {}
+            for label, counts in self._counts.items():
+                calls, errors, seconds = self._totals[label]
+                limites = [f"<={ms}ms" for ms in LatencyHistogram.BUCKETS_MS] + [f">{LatencyHistogram.BUCKETS_MS[-1]}ms"]
+                resultado[label] = {
+                    'calls': calls,
+                    'errors': errors,
+                    'avg_ms': round(seconds * 1000 / calls, 1) if calls else 0.0,
+                    'buckets': {limite: count for limite, count in zip(limites, counts) if count}
+                }
+            return resultado
+
+class BridgeClient:
+    """Pooled HTTP client for the WhatsApp Web JS bridge
+
+    One keep-alive requests.Session is shared by every caller, with a
+    connection pool of WHATSAPP_HTTP_POOL_SIZE and connect/read timeouts, so
+    a hung bridge fails the call instead of blocking it forever. Requests that
+    never reached the bridge (connection refused, connect timeout) are
+    retried with jittered backoff; read timeouts are not, since the bridge may
+    already have sent the message.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, base_url=WHATSAPP_SERVER_URL, pool_size=WHATSAPP_HTTP_POOL_SIZE,
+                 connect_timeout=WHATSAPP_HTTP_CONNECT_TIMEOUT, read_timeout=WHATSAPP_HTTP_READ_TIMEOUT,
+                 retries=WHATSAPP_HTTP_RETRIES):
+        """Create the client
+
+        Args:
+            base_url (str): Bridge URL
+            pool_size (int): Keep-alive connections kept open
+            connect_timeout (float): Seconds to establish a connection
+            read_timeout (float): Seconds to wait for the response
+            retries (int): Extra attempts for requests that could not connect
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = max(0, retries)
+        self.latency = LatencyHistogram()
+        self.retried = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @staticmethod
+    def shared():
+        """The process-wide client (created on first use)"""
+        with BridgeClient._shared_lock:
+            if BridgeClient._shared is None:
+                BridgeClient._shared = BridgeClient()
+            return BridgeClient._shared
+
+    def post(self, path, payload, timeout=None):
+        """POST JSON to a bridge endpoint
+
+        Args:
+            path (str): Endpoint path (e.g. "/send-message")
+            payload (dict): JSON body
+            timeout (tuple, optional): (connect, read) seconds instead of the defaults
+
+        Returns:
+            requests.Response: Bridge response
+
+        Raises:
+            requests.RequestException: If the bridge could not be reached or timed out
+        """
+        for intento in range(self.retries + 1):
+            inicio = time.monotonic()
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=timeout or self.timeout)
+            except requests.ConnectionError as e:
+                self.latency.observe(path, time.monotonic() - inicio, error=True)
+                if not BridgeClient.never_connected(e) or intento == self.retries:
+                    raise
+                self.retried += 1
+                espera = min(5, 0.25 * 2 ** intento) * random.uniform(0.5, 1.5)
+                log_warning(f"WhatsApp bridge unreachable on {path} ({str(e)}), retrying in {espera:.2f}s")
+                time.sleep(espera)
+                continue
+            except requests.RequestException:
+                self.latency.observe(path, time.monotonic() - inicio, error=True)
+                raise
+            self.latency.observe(path, time.monotonic() - inicio, error=response.status_code >= 500)
+            return response
+
+    @staticmethod
+    def never_connected(error):
+        """Whether a failed request never reached the bridge
+
+        Only those are safe to repeat; a timeout or dropped connection
+        mid-request may already have sent the message.
+        """
+        if not isinstance(error, requests.ConnectionError):
+            return False
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        razon = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(razon, NewConnectionError)
+
+    def metrics(self):
+        """Get latency histograms and retry count
+
+        Returns:
+            dict: Per-endpoint latency and retries
+        """
+        return {'endpoints': self.latency.snapshot(), 'retries': self.retried}
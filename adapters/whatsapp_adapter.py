@@ -1,23 +1,56 @@
-import requests
+import base64
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
+from adapters.bridge_client import BridgeClient, LatencyHistogram
 from utils.config import (
     USE_WHATSAPP_WEB, 
-    WHATSAPP_SERVER_URL, 
     TWILIO_ACCOUNT_SID, 
-    TWILIO_AUTH_TOKEN
+    TWILIO_AUTH_TOKEN,
+    WHATSAPP_HTTP_CONNECT_TIMEOUT,
+    WHATSAPP_HTTP_READ_TIMEOUT,
+    WHATSAPP_WEB_SEND_RATE
 )
 from utils.logging_utils import log_info, log_error
 
 class WhatsAppAdapter:
-    """Adapter for WhatsApp messaging (Twilio and WhatsApp Web JS)"""
+    """Adapter for WhatsApp messaging (Twilio and WhatsApp Web JS)
+    
+    Bridge calls go through the shared, pooled BridgeClient; Twilio calls use a
+    keep-alive Twilio HTTP client with a timeout. Latency of both is kept in
+    histograms exposed by metrics().
+    """
+    
+    _twilio_latency = LatencyHistogram()
     
     def __init__(self):
         """Initialize the adapter based on configuration"""
         self.use_whatsapp_web = USE_WHATSAPP_WEB
+        self.bridge = BridgeClient.shared()
         if not self.use_whatsapp_web:
-            self.twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+            self.twilio_client = Client(
+                TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+                http_client=TwilioHttpClient(pool_connections=True, timeout=WHATSAPP_HTTP_READ_TIMEOUT)
+            )
         log_info(f"WhatsApp adapter initialized. Using WhatsApp Web: {self.use_whatsapp_web}")
     
+    @staticmethod
+    def metrics():
+        """Get HTTP latency histograms
+        
+        Returns:
+            dict: Bridge endpoints (with retries) and Twilio calls
+        """
+        return {
+            'bridge': BridgeClient.shared().metrics(),
+            'twilio': WhatsAppAdapter._twilio_latency.snapshot()
+        }
+    
     def send_message(self, number, message):
         """Send a text message to a WhatsApp number
         
@@ -28,34 +61,130 @@ class WhatsAppAdapter:
         Returns:
             bool: Success status
         """
+        success, _, _ = self.send_message_status(number, message)
+        return success
+    
+    def send_message_status(self, number, message):
+        """Send a text message and report how the provider answered
+        
+        Args:
+            number (str): The phone number (with or without +)
+            message (str): The message text to send
+            
+        Returns:
+            tuple: (success, HTTP status code, or None if the request never reached the provider, detail)
+        """
         try:
             if self.use_whatsapp_web:
                 # Clean number for WhatsApp Web JS (digits only)
                 clean_number = number.replace("whatsapp:+", "").replace("+", "")
                 
                 # Use WhatsApp Web JS
-                response = requests.post(
-                    f"{WHATSAPP_SERVER_URL}/send-message",
-                    json={"number": clean_number, "message": message}
+                response = self.bridge.post(
+                    "/send-message",
+                    {"number": clean_number, "message": message}
                 )
                 if response.status_code == 200:
                     log_info(f"Message sent to {clean_number} using WhatsApp Web JS")
-                    return True
+                    return True, 200, None
                 else:
                     log_error(f"Error sending message using WhatsApp Web JS: {response.text}")
-                    return False
+                    return False, response.status_code, response.text
             else:
                 # Use Twilio
-                message = self.twilio_client.messages.create(
-                    body=message,
-                    from_=f"whatsapp:+14155238886",  # Twilio number
-                    to=f"whatsapp:+{number.replace('+', '')}"
-                )
+                inicio = time.monotonic()
+                try:
+                    message = self.twilio_client.messages.create(
+                        body=message,
+                        from_=f"whatsapp:+14155238886",  # Twilio number
+                        to=f"whatsapp:+{number.replace('+', '')}"
+                    )
+                except Exception:
+                    WhatsAppAdapter._twilio_latency.observe("messages.create", time.monotonic() - inicio, error=True)
+                    raise
+                WhatsAppAdapter._twilio_latency.observe("messages.create", time.monotonic() - inicio)
                 log_info(f"Message sent to {number} using Twilio")
-                return True
+                return True, 201, message.sid
+        except TwilioRestException as e:
+            log_error(f"Error sending message to {number}", e)
+            return False, e.status, e.msg
         except Exception as e:
             log_error(f"Error sending message to {number}", e)
-            return False
+            # Only a request that never reached the provider is safe to repeat;
+            # after a timeout the message may have gone out, so report 504
+            status = None if BridgeClient.never_connected(e) else 504
+            return False, status, str(e)
+    
+    def send_messages_batch(self, items, interval=None):
+        """Send many text messages with a single bridge request
+        
+        The bridge's /send-batch endpoint sends them one after another,
+        `interval` seconds apart, and answers with one result per message.
+        Twilio, and bridges without that endpoint, get one request per message
+        (also `interval` apart).
+        
+        Args:
+            items (list): (number, message) pairs
+            interval (float, optional): Seconds between sends (bridge default: 1 / WHATSAPP_WEB_SEND_RATE)
+            
+        Returns:
+            list: (success, HTTP status code or None, detail) per item, in order
+        """
+        items = list(items)
+        if not items:
+            return []
+        if not self.use_whatsapp_web:
+            return self._send_each(items, interval or 0)
+        
+        if interval is None:
+            interval = 1 / WHATSAPP_WEB_SEND_RATE if WHATSAPP_WEB_SEND_RATE > 0 else 0
+        try:
+            response = self.bridge.post(
+                "/send-batch",
+                {
+                    "messages": [
+                        {"number": number.replace("whatsapp:+", "").replace("+", ""), "message": message}
+                        for number, message in items
+                    ],
+                    "intervalMs": int(interval * 1000)
+                },
+                # The bridge answers once the whole batch went out
+                timeout=(WHATSAPP_HTTP_CONNECT_TIMEOUT, WHATSAPP_HTTP_READ_TIMEOUT + len(items) * interval)
+            )
+        except Exception as e:
+            log_error(f"Error sending batch of {len(items)} messages", e)
+            # After a timeout the bridge may have sent part of the batch: report
+            # a gateway error so callers do not send it again
+            status = None if BridgeClient.never_connected(e) else 504
+            return [(False, status, str(e))] * len(items)
+        
+        if response.status_code == 404:
+            # Older bridge without /send-batch
+            return self._send_each(items, interval)
+        if response.status_code != 200:
+            log_error(f"Error sending batch using WhatsApp Web JS: {response.text}")
+            return [(False, response.status_code, response.text)] * len(items)
+        
+        results = response.json().get('results') or []
+        if len(results) != len(items):
+            log_error(f"WhatsApp Web JS answered {len(results)} results for a batch of {len(items)}")
+            return [(False, 502, "Incomplete batch response")] * len(items)
+        
+        resultados = [
+            (True, 200, None) if result.get('status') == 'success'
+            else (False, result.get('code', 500), result.get('message'))
+            for result in results
+        ]
+        log_info(f"Batch sent using WhatsApp Web JS: {sum(ok for ok, _, _ in resultados)}/{len(items)} messages")
+        return resultados
+    
+    def _send_each(self, items, interval):
+        resultados = []
+        for i, (number, message) in enumerate(items):
+            if i and interval:
+                time.sleep(interval)
+            resultados.append(self.send_message_status(number, message))
+        return resultados
     
     def send_file(self, number, file_path, caption=None):
         """Send a file to a WhatsApp number
@@ -74,9 +203,9 @@ class WhatsAppAdapter:
                 clean_number = number.replace("whatsapp:+", "").replace("+", "")
                 
                 # Use WhatsApp Web JS
-                response = requests.post(
-                    f"{WHATSAPP_SERVER_URL}/send-file",
-                    json={"number": clean_number, "filePath": file_path, "caption": caption or ""}
+                response = self.bridge.post(
+                    "/send-file",
+                    {"number": clean_number, "filePath": file_path, "caption": caption or ""}
                 )
                 if response.status_code == 200:
                     log_info(f"File sent to {clean_number} using WhatsApp Web JS")
@@ -90,4 +219,59 @@ class WhatsAppAdapter:
                 return False
         except Exception as e:
             log_error(f"Error sending file to {number}", e)
-            return False 
\ No newline at end of file
+            return False
+    
+    def send_file_bytes(self, number, content, filename, caption=None):
+        """Send an in-memory file to a WhatsApp number
+        
+        The bytes go to the bridge's /send-media endpoint, so no file is
+        written. Bridges without that endpoint get the file through a unique
+        temporary file and /send-file, which is deleted afterwards.
+        
+        Args:
+            number (str): The phone number (with or without +)
+            content (bytes): File contents
+            filename (str): Name shown to the recipient
+            caption (str, optional): Caption for the file
+            
+        Returns:
+            bool: Success status
+        """
+        if not self.use_whatsapp_web:
+            # For Twilio, we need a public URL
+            log_info(f"Twilio requires a public URL to send files")
+            return False
+        
+        try:
+            clean_number = number.replace("whatsapp:+", "").replace("+", "")
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            response = self.bridge.post(
+                "/send-media",
+                {
+                    "number": clean_number,
+                    "data": base64.b64encode(content).decode("ascii"),
+                    "mimetype": mimetype,
+                    "filename": filename,
+                    "caption": caption or ""
+                }
+            )
+            if response.status_code == 200:
+                log_info(f"File {filename} ({len(content)} bytes) sent to {clean_number} using WhatsApp Web JS")
+                return True
+            if response.status_code != 404:
+                log_error(f"Error sending file using WhatsApp Web JS: {response.text}")
+                return False
+        except Exception as e:
+            log_error(f"Error sending file to {number}", e)
+            return False
+        
+        # Older bridge without /send-media: hand it a path instead (a private
+        # directory keeps the filename the recipient sees)
+        directorio = tempfile.mkdtemp(prefix="whatsapp_")
+        try:
+            file_path = os.path.join(directorio, os.path.basename(filename))
+            with open(file_path, 'wb') as f:
+                f.write(content)
+            return self.send_file(number, file_path, caption)
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
@@ -1,12 +1,19 @@
 from flask import Flask
-from routes.webhook_routes import webhook_bp
+from routes.webhook_routes import webhook_bp, start_ingestion_workers
+from services.invitation_dispatcher import InvitationDispatcher
 from routes.landing_routes import landing_bp
 from services.supabase_service import SupabaseService
 from utils.logging_utils import log_info, log_error
+from utils.config import WEBHOOK_ASYNC_INGESTION
 import os
 
-def create_app():
-    """Create and configure the Flask application"""
+def create_app(start_background=True):
+    """Create and configure the Flask application
+    
+    Args:
+        start_background (bool): Start the ingestion workers and resume campaigns
+            (False in processes that serve no requests, like the reloader's watcher)
+    """
     # Initialize Flask app
     app = Flask(__name__)
     
@@ -17,6 +24,15 @@ def create_app():
     # Initialize database
     initialize_database()
     
+    if start_background:
+        # Process webhooks on background workers if enabled
+        if WEBHOOK_ASYNC_INGESTION:
+            start_ingestion_workers()
+        
+        # Finish invitation campaigns cut short by the last shutdown (each one is
+        # claimed in the ledger, so with several workers only one process resumes it)
+        InvitationDispatcher.resume_campaigns()
+    
     log_info("Application initialized successfully")
     return app
 
@@ -28,8 +44,17 @@ def initialize_database():
     else:
         log_error("Failed to initialize database")
 
+def is_reloader_watcher():
+    """Whether this is the debug reloader's parent process
+    
+    app.run(debug=True) re-runs this script in a child process (with
+    WERKZEUG_RUN_MAIN=true) that serves the requests; the parent only watches
+    files and restarts the child.
+    """
+    return __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
 # Create the application instance
-app = create_app()
+app = create_app(start_background=not is_reloader_watcher())
 
 if __name__ == '__main__':
     # Get port from environment or use default
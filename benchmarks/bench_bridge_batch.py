@@ -0,0 +1,67 @@
+"""Micro-benchmark: one bridge request per message vs. /send-batch
+
+Sends the same messages through WhatsAppAdapter against the in-process fake
+bridge (benchmarks/fake_bridge.py), once with send_message_status per message
+and once with send_messages_batch. Pacing is turned off (interval 0) and the
+fake sends take no time, so the numbers are the Python <-> bridge overhead
+alone. Both runs must deliver every message exactly once.
+
+Usage:
+    python benchmarks/bench_bridge_batch.py --messages 5000 --batch-size 50
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bridge import FakeBridge
+
+def run(label, bridge, send, messages):
+    """Send every message with `send` and print throughput and requests made"""
+    bridge.sent.clear()
+    bridge.requests.clear()
+    start = time.perf_counter()
+    send(messages)
+    elapsed = time.perf_counter() - start
+
+    assert sorted(bridge.sent) == sorted(messages), f"{label}: delivered {len(bridge.sent)} of {len(messages)}"
+    requests = sum(bridge.requests.values())
+    print(f"{label:<26} {elapsed:8.3f} s  {len(messages) / elapsed:10.0f} msg/s  "
+          f"{elapsed * 1e6 / len(messages):8.1f} us/msg  requests={requests}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    bridge = FakeBridge().start()
+
+    # Configuration is read at import time, so point it at the fake bridge first
+    os.environ['USE_WHATSAPP_WEB'] = 'true'
+    os.environ['WHATSAPP_SERVER_PORT'] = str(bridge.port)
+    from adapters.whatsapp_adapter import WhatsAppAdapter
+
+    adapter = WhatsAppAdapter()
+    messages = [(f"5691{i:07d}", f"¡Hola Invitado {i}! 🎉 Estás cordialmente invitado.") for i in range(args.messages)]
+
+    def one_by_one(items):
+        for number, message in items:
+            adapter.send_message_status(number, message)
+
+    def batched(items):
+        for start in range(0, len(items), args.batch_size):
+            adapter.send_messages_batch(items[start:start + args.batch_size], interval=0)
+
+    before = run("/send-message per message", bridge, one_by_one, messages)
+    after = run(f"/send-batch x{args.batch_size}", bridge, batched, messages)
+    print(f"speedup: {before / after:.1f}x")
+    bridge.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Throughput/memory benchmark: streaming Excel import vs. pandas + iterrows
+
+Generates guest-list workbooks of the requested sizes and reads each one with
+the streaming reader (ExcelService.iter_guest_chunks) and with the previous
+pd.read_excel + iterrows loop. Every run happens in its own process so peak
+RSS is measured in isolation. Chunks go to a no-op sink, so the numbers cover
+parsing and normalization only (no Supabase round trips).
+
+Usage:
+    python benchmarks/bench_excel_import.py --rows 10000 100000 500000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEADER = ['Nombre', 'Numero', 'Confirmacion', '+1', 'Restricciones alimenticias']
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def generate(path, rows):
+    """Write a guest list with Excel-style numeric phone numbers"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for i in range(rows):
+        sheet.append([
+            f"Invitado {i}",
+            56900000000.0 + i,
+            "Sí" if i % 3 == 0 else None,
+            "No" if i % 3 == 0 else None,
+            "vegetariano" if i % 17 == 0 else None
+        ])
+    workbook.save(path)
+
+def run_streaming(path, chunk_size):
+    from services.excel_service import ExcelService
+    rows = 0
+    for chunk in ExcelService.iter_guest_chunks(path, evento_id=1, chunk_size=chunk_size):
+        rows += len(chunk)
+    return rows
+
+def run_pandas(path, chunk_size):
+    import pandas as pd
+    df = pd.read_excel(path)
+    df.columns = df.columns.str.strip()
+    invitados = []
+    for _, row in df.iterrows():
+        invitado = {
+            'evento_id': 1,
+            'nombre': str(row.get('Nombre', '')) if not pd.isna(row.get('Nombre', '')) else '',
+            'numero': str(row.get('Numero', '')) if not pd.isna(row.get('Numero', '')) else '',
+            'confirmacion': str(row.get('Confirmacion', '')) if not pd.isna(row.get('Confirmacion', '')) else '',
+            'acompanante': str(row.get('+1', '')) if not pd.isna(row.get('+1', '')) else '',
+            'restricciones_alimenticias': str(row.get('Restricciones alimenticias', '')) if not pd.isna(row.get('Restricciones alimenticias', '')) else ''
+        }
+        if invitado['nombre'] and invitado['numero']:
+            invitados.append(invitado)
+    return len(invitados)
+
+MODES = {'streaming': run_streaming, 'pandas': run_pandas}
+
+def worker(mode, path, chunk_size):
+    """Run one reader and print its measurements as JSON"""
+    # Import outside the timed region
+    import pandas  # noqa: F401
+    import services.excel_service  # noqa: F401
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    rows = MODES[mode](path, chunk_size)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        'rows': rows,
+        'seconds': seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'baseline_rss_mb': baseline
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--dir', default=os.path.join(tempfile.gettempdir(), 'bench_excel_import'))
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1], args.chunk_size)
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    print(f"{'rows':>8} {'mode':>10} {'seconds':>9} {'rows/s':>10} {'peak RSS (over imports)':>24}")
+    for rows in args.rows:
+        path = os.path.join(args.dir, f"invitados_{rows}.xlsx")
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            generate(path, rows)
+            print(f"(generated {path} in {time.perf_counter() - start:.1f} s)")
+
+        for mode in args.modes:
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--worker', mode, path, '--chunk-size', str(args.chunk_size)],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+                print(f"{rows:>8} {mode:>10}  skipped: {error}")
+                continue
+            data = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{rows:>8} {mode:>10} {data['seconds']:>9.2f} {data['rows'] / data['seconds']:>10.0f} "
+                  f"{data['peak_rss_mb']:>7.0f} MB (+{data['peak_rss_mb'] - data['baseline_rss_mb']:.0f} MB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Micro-benchmark: per-row iterrows normalization vs. ExcelService.normalize_guest_frame
+
+Builds a DataFrame shaped like pd.read_excel output for a guest list (numbers
+as floats, blank cells as NaN) and normalizes it with the previous iterrows
+loop and with the column-wise pipeline. Both must keep the same rows.
+
+Usage:
+    python benchmarks/bench_guest_normalization.py --rows 1000 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from services.excel_service import ExcelService
+
+def make_frame(rows):
+    """Guest list with the dtypes pd.read_excel produces"""
+    i = np.arange(rows)
+    return pd.DataFrame({
+        'Nombre': np.where(i % 50 == 0, None, [f"Invitado {n}" for n in i]),
+        'Numero': 56900000000.0 + i,
+        'Confirmacion': np.where(i % 3 == 0, 'Sí', None),
+        '+1': np.where(i % 3 == 0, 'No', None),
+        'Restricciones alimenticias': np.where(i % 17 == 0, 'vegetariano', None)
+    })
+
+def iterrows_loop(df, evento_id):
+    """The loop previously used by the import entry points"""
+    invitados = []
+    for _, row in df.iterrows():
+        invitado = {
+            'evento_id': evento_id,
+            'nombre': str(row.get('Nombre', '')) if not pd.isna(row.get('Nombre', '')) else '',
+            'numero': str(row.get('Numero', '')) if not pd.isna(row.get('Numero', '')) else '',
+            'confirmacion': str(row.get('Confirmacion', '')) if not pd.isna(row.get('Confirmacion', '')) else '',
+            'acompanante': str(row.get('+1', '')) if not pd.isna(row.get('+1', '')) else '',
+            'restricciones_alimenticias': str(row.get('Restricciones alimenticias', '')) if not pd.isna(row.get('Restricciones alimenticias', '')) else ''
+        }
+        if invitado['nombre'] and invitado['numero']:
+            invitados.append(invitado)
+    return invitados
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'iterrows s':>11} {'vectorized s':>13} {'speedup':>8}")
+    for rows in args.rows:
+        df = make_frame(rows)
+        legacy, legacy_s = timed(iterrows_loop, df, 1)
+        vectorized, vectorized_s = timed(ExcelService.normalize_guest_frame, df, 1)
+
+        # The loop keeps Excel's ".0" on numbers; everything else must match
+        assert len(legacy) == len(vectorized)
+        assert all(a['numero'][:-2] == b['numero'] and a['nombre'] == b['nombre']
+                   for a, b in zip(legacy, vectorized))
+
+        print(f"{rows:>8} {legacy_s:>11.3f} {vectorized_s:>13.3f} {legacy_s / vectorized_s:>7.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Accuracy/latency benchmark for the deterministic RSVP classifier
+
+Classifies every reply of the labelled corpus (benchmarks/rsvp_corpus.jsonl)
+and reports how many would skip GPT, how accurate those answers are and how
+long classification takes.
+
+Usage:
+    python benchmarks/bench_rsvp_classifier.py --threshold 0.85 --verbose
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.rsvp_classifier import RSVPClassifier
+from utils.text_utils import normalize_text
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rsvp_corpus.jsonl')
+
+def is_correct(resultado, esperado):
+    """Compare a classification with its label"""
+    if resultado['confirmacion'] != esperado['confirmacion']:
+        return False
+    if resultado['acompanante'] != esperado['acompanante']:
+        return False
+    if esperado['restricciones'] is None:
+        return resultado['restricciones'] is None
+    return (resultado['restricciones'] is not None and
+            normalize_text(esperado['restricciones']) in normalize_text(resultado['restricciones']))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threshold', type=float, default=0.85)
+    parser.add_argument('--repeat', type=int, default=200, help="Timing repetitions per message")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding='utf-8') as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    fast_path = correct = 0
+    latencies = []
+    for esperado in corpus:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            resultado = RSVPClassifier.classify(esperado['mensaje'])
+        latencies.append((time.perf_counter() - start) / args.repeat * 1e6)
+
+        confident = resultado['confianza'] >= args.threshold
+        ok = is_correct(resultado, esperado)
+        if confident:
+            fast_path += 1
+            correct += ok
+        if args.verbose and (confident and not ok or not confident):
+            tag = "WRONG " if confident else "to GPT"
+            print(f"{tag} {resultado['confianza']:.2f} {esperado['mensaje']!r} -> {resultado}")
+
+    latencies.sort()
+    print(f"Messages:           {len(corpus)}")
+    print(f"Fast path (>= {args.threshold}): {fast_path} ({fast_path / len(corpus):.0%} of GPT calls avoided)")
+    print(f"Fast-path accuracy: {correct / fast_path:.1%}" if fast_path else "Fast-path accuracy: n/a")
+    print(f"Latency:            p50={statistics.median(latencies):.1f} us  "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f} us")
+
+if __name__ == '__main__':
+    main()
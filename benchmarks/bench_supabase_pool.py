@@ -0,0 +1,144 @@
+"""Micro-benchmark: per-message Supabase latency with and without the client pool
+
+Runs the queries that one inbound guest reply triggers in
+process_inbound_message (organizer check, guest directory lookup, RSVP update,
+counters) against a local HTTP stand-in for PostgREST. The stand-in sleeps on
+every new TCP connection to emulate the TLS handshake paid against the real
+Supabase endpoint. Every message comes from a different guest and the
+organizer cache and guest directory are cleared before each pass, so both
+passes issue the same queries and only the client handling differs.
+
+Usage:
+    python benchmarks/bench_supabase_pool.py --messages 200 --handshake-ms 30
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INVITADO = {
+    'id': 1,
+    'evento_id': 1,
+    'nombre': 'Invitado Benchmark',
+    'numero': '56912345678',
+    'confirmacion': None,
+    'acompanante': None,
+    'restricciones_alimenticias': None,
+    'eventos': {'nombre': 'Evento Benchmark', 'organizador_id': 1, 'organizadores': {'numero': '56900000000'}}
+}
+
+# Not everyone answered, so no "all responded" report is built
+CONTADORES = {'evento_id': 1, 'total': 2, 'confirmados': 1, 'rechazados': 0,
+              'respondidos': 1, 'acompanantes': 0, 'version': 1}
+
+class PostgrestStandIn(BaseHTTPRequestHandler):
+    """Minimal PostgREST stand-in answering every table request with JSON"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    handshake_delay = 0.0
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self):
+        # Called once per TCP connection: emulate the handshake cost
+        with PostgrestStandIn.connections_lock:
+            PostgrestStandIn.connections += 1
+        time.sleep(PostgrestStandIn.handshake_delay)
+        super().setup()
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        table = self.path.split('?')[0].rstrip('/').split('/')[-1]
+        rows = {'organizadores': [], 'evento_contadores': [CONTADORES]}.get(table, [INVITADO])
+        body = json.dumps(rows).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+    do_PATCH = _respond
+    do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+def simulate_message(numero):
+    """Issue the Supabase calls process_inbound_message makes for one guest reply"""
+    from services.supabase_service import SupabaseService
+    from services.guest_directory import GuestDirectory
+    from services.report_service import ReportService
+
+    SupabaseService.get_organizador_by_numero(numero)
+    invitacion = GuestDirectory.resolve(numero)[0]
+    SupabaseService.update_invitado_response(invitacion['invitado_id'], confirmacion='Sí')
+    ReportService.check_all_responses(invitacion['evento_id'], include_pending=False)
+
+def run(label, messages):
+    """Time a number of simulated messages and print latency percentiles"""
+    from services.supabase_service import SupabaseService
+    from services.guest_directory import GuestDirectory
+
+    # Start every pass cold so both make the same queries
+    SupabaseService.organizador_cache.clear()
+    GuestDirectory.clear()
+    connections_before = PostgrestStandIn.connections
+    latencies = []
+    for i in range(messages):
+        start = time.perf_counter()
+        simulate_message(f"569{i:08d}")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<22} mean={statistics.mean(latencies):8.2f} ms  "
+          f"p50={statistics.median(latencies):8.2f} ms  p95={p95:8.2f} ms  "
+          f"connections={PostgrestStandIn.connections - connections_before}")
+    return statistics.mean(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--handshake-ms', type=float, default=30.0)
+    args = parser.parse_args()
+
+    PostgrestStandIn.handshake_delay = args.handshake_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PostgrestStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Configuration is read at import time, so point it at the stand-in first
+    os.environ['SUPABASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ['SUPABASE_KEY'] = "bench.bench.bench"
+
+    from supabase import create_client
+    from services.supabase_pool import SupabaseClientPool
+    from services.supabase_service import SupabaseService
+
+    pooled_init_client = SupabaseService.init_client
+    SupabaseService.init_client = staticmethod(
+        lambda: create_client(os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'])
+    )
+    before = run("create_client per call", args.messages)
+
+    SupabaseService.init_client = pooled_init_client
+    SupabaseClientPool.reset()
+    after = run("pooled client", args.messages)
+
+    print(f"Speed-up: {before / after:.1f}x per message")
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
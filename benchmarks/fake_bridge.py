@@ -0,0 +1,156 @@
+"""In-process stand-in for whatsapp-server.js
+
+Answers /send-message, /send-batch, /send-file, /send-media and /status the
+way the Node bridge does, without a WhatsApp session: every send takes
+`send_delay` seconds, numbers in `failing` fail, and `ready = False` makes
+every endpoint answer 503. Messages that went out are kept in `sent`, so
+benchmarks and ad-hoc checks can point WHATSAPP_SERVER_PORT at it and assert
+on what the adapter or the dispatcher delivered.
+
+Usage:
+    python benchmarks/fake_bridge.py --port 3000 --send-ms 50
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeBridgeHandler(BaseHTTPRequestHandler):
+    """Request handler; state lives on the FakeBridge the server belongs to"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        bridge = self.server.bridge
+        if self.path == '/status':
+            return self._json(200, {
+                'status': 'ready' if bridge.ready else 'not_ready',
+                'message': 'Cliente WhatsApp conectado' if bridge.ready else 'Cliente WhatsApp no conectado'
+            })
+        self._json(404, {'status': 'error', 'message': 'Not found'})
+
+    def do_POST(self):
+        bridge = self.server.bridge
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        with bridge.lock:
+            bridge.requests[self.path] = bridge.requests.get(self.path, 0) + 1
+
+        if self.path not in ('/send-message', '/send-batch', '/send-file', '/send-media'):
+            return self._json(404, {'status': 'error', 'message': 'Not found'})
+        if not bridge.ready:
+            return self._json(503, {'status': 'error', 'message': 'Cliente de WhatsApp no está listo'})
+
+        if self.path == '/send-batch':
+            return self._send_batch(bridge, body)
+
+        error = bridge.deliver(body.get('number'), body.get('message') or body.get('filename') or body.get('filePath'))
+        if error:
+            return self._json(500, {'status': 'error', 'message': error})
+        self._json(200, {'status': 'success', 'message': 'Mensaje enviado con éxito'})
+
+    def _send_batch(self, bridge, body):
+        messages = body.get('messages')
+        if not isinstance(messages, list) or not messages:
+            return self._json(400, {'status': 'error', 'message': 'El campo messages debe ser una lista con al menos un mensaje'})
+        if len(messages) > bridge.batch_max:
+            return self._json(413, {'status': 'error', 'message': f"Máximo {bridge.batch_max} mensajes por lote"})
+
+        interval = max(0, body.get('intervalMs', 500)) / 1000
+        results = []
+        for i, item in enumerate(messages):
+            if i and interval:
+                time.sleep(interval)
+            error = bridge.deliver(item.get('number'), item.get('message'))
+            if error:
+                results.append({'number': item.get('number'), 'status': 'error', 'code': 500, 'message': error})
+            else:
+                results.append({'number': item.get('number'), 'status': 'success'})
+        self._json(200, {'status': 'success', 'results': results})
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeBridge:
+    """Fake WhatsApp Web JS bridge running on a background thread"""
+
+    def __init__(self, port=0, send_delay=0.0, failing=(), batch_max=500):
+        """Create the bridge (call start() to serve)
+
+        Args:
+            port (int): Port to listen on (0 = any free port)
+            send_delay (float): Seconds each send takes
+            failing (iterable): Numbers whose sends fail
+            batch_max (int): Largest /send-batch accepted
+        """
+        self.send_delay = send_delay
+        self.failing = set(failing)
+        self.batch_max = batch_max
+        self.ready = True
+        self.sent = []  # (number, message) in delivery order
+        self.requests = {}  # {path: count}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), FakeBridgeHandler)
+        self.server.bridge = self
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-bridge", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def deliver(self, number, message):
+        """Simulate one send
+
+        Returns:
+            str: Error message, or None if it was sent
+        """
+        if not number or not message:
+            return 'Faltan los campos number y message'
+        if self.send_delay:
+            time.sleep(self.send_delay)
+        if str(number) in self.failing:
+            return f"Número no registrado en WhatsApp: {number}"
+        with self.lock:
+            self.sent.append((str(number), message))
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--send-ms', type=float, default=0.0)
+    parser.add_argument('--fail', nargs='*', default=[], help="Numbers whose sends fail")
+    args = parser.parse_args()
+
+    bridge = FakeBridge(args.port, args.send_ms / 1000, args.fail)
+    print(f"Fake WhatsApp bridge listening on {bridge.url}")
+    try:
+        bridge.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.server.server_close()
+        print(f"Sent {len(bridge.sent)} messages; requests per endpoint: {bridge.requests}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+-- Copia opcional en Supabase del registro de campañas de envío (CAMPAIGN_LEDGER_SUPABASE=true).
+-- El registro principal es SQLite local (CAMPAIGN_LEDGER_DB); esta tabla recibe los mismos lotes.
+CREATE TABLE IF NOT EXISTS campana_envios (
+    campana_id TEXT NOT NULL,
+    numero TEXT NOT NULL,
+    estado TEXT NOT NULL CHECK (estado IN ('queued', 'sent', 'failed', 'delivered')),
+    error TEXT,
+    proveedor_id TEXT,
+    actualizado_en TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (campana_id, numero)
+);
+
+CREATE INDEX IF NOT EXISTS idx_campana_envios_estado ON campana_envios(campana_id, estado);
+
+ALTER TABLE public.campana_envios ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Permitir todas las operaciones para campana_envios" ON public.campana_envios;
+CREATE POLICY "Permitir todas las operaciones para campana_envios"
+ON public.campana_envios
+FOR ALL
+USING (true)
+WITH CHECK (true);
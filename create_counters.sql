@@ -0,0 +1,95 @@
+-- Contadores de respuestas por evento, mantenidos de forma incremental por un trigger
+-- sobre invitados (respuestas, importaciones y borrados) para no releer la lista completa
+CREATE TABLE IF NOT EXISTS evento_contadores (
+    evento_id INTEGER PRIMARY KEY REFERENCES eventos(id) ON DELETE CASCADE,
+    total INTEGER NOT NULL DEFAULT 0,
+    confirmados INTEGER NOT NULL DEFAULT 0,
+    rechazados INTEGER NOT NULL DEFAULT 0,
+    respondidos INTEGER NOT NULL DEFAULT 0,
+    acompanantes INTEGER NOT NULL DEFAULT 0,
+    version BIGINT NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+-- Suma (signo = 1) o resta (signo = -1) la contribución de un invitado a los contadores
+CREATE OR REPLACE FUNCTION sumar_contadores_evento(
+    p_evento_id INTEGER,
+    p_confirmacion TEXT,
+    p_acompanante TEXT,
+    p_signo INTEGER
+) RETURNS VOID AS $$
+DECLARE
+    -- Misma regla que utils.text_utils.has_rsvp: solo "sí" y "no" (sin importar
+    -- mayúsculas ni espacios) cuentan como respuesta
+    v_respuesta TEXT := lower(trim(coalesce(p_confirmacion, '')));
+    v_confirmado BOOLEAN := v_respuesta = 'sí';
+BEGIN
+    INSERT INTO evento_contadores AS c
+        (evento_id, total, confirmados, rechazados, respondidos, acompanantes, version)
+    VALUES (
+        p_evento_id,
+        p_signo,
+        p_signo * v_confirmado::int,
+        p_signo * (v_respuesta = 'no')::int,
+        p_signo * (v_respuesta IN ('sí', 'no'))::int,
+        p_signo * (v_confirmado AND lower(trim(coalesce(p_acompanante, ''))) = 'sí')::int,
+        1
+    )
+    ON CONFLICT (evento_id) DO UPDATE SET
+        total = c.total + EXCLUDED.total,
+        confirmados = c.confirmados + EXCLUDED.confirmados,
+        rechazados = c.rechazados + EXCLUDED.rechazados,
+        respondidos = c.respondidos + EXCLUDED.respondidos,
+        acompanantes = c.acompanantes + EXCLUDED.acompanantes,
+        version = c.version + 1,
+        actualizado_en = now();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_contadores_evento() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.evento_id IS NOT NULL THEN
+        PERFORM sumar_contadores_evento(OLD.evento_id, OLD.confirmacion, OLD.acompanante, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.evento_id IS NOT NULL THEN
+        PERFORM sumar_contadores_evento(NEW.evento_id, NEW.confirmacion, NEW.acompanante, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_invitados_contadores ON invitados;
+CREATE TRIGGER trg_invitados_contadores
+AFTER INSERT OR UPDATE OR DELETE ON invitados
+FOR EACH ROW EXECUTE FUNCTION actualizar_contadores_evento();
+
+-- Carga inicial (o recálculo) a partir de los invitados existentes; volver a
+-- ejecutar este archivo recalcula los contadores con la regla actual
+INSERT INTO evento_contadores (evento_id, total, confirmados, rechazados, respondidos, acompanantes)
+SELECT
+    e.id,
+    count(i.id),
+    count(*) FILTER (WHERE lower(trim(i.confirmacion)) = 'sí'),
+    count(*) FILTER (WHERE lower(trim(i.confirmacion)) = 'no'),
+    count(*) FILTER (WHERE lower(trim(i.confirmacion)) IN ('sí', 'no')),
+    count(*) FILTER (WHERE lower(trim(i.confirmacion)) = 'sí' AND lower(trim(i.acompanante)) = 'sí')
+FROM eventos e
+LEFT JOIN invitados i ON i.evento_id = e.id
+GROUP BY e.id
+ON CONFLICT (evento_id) DO UPDATE SET
+    total = EXCLUDED.total,
+    confirmados = EXCLUDED.confirmados,
+    rechazados = EXCLUDED.rechazados,
+    respondidos = EXCLUDED.respondidos,
+    acompanantes = EXCLUDED.acompanantes,
+    version = evento_contadores.version + 1,
+    actualizado_en = now();
+
+ALTER TABLE public.evento_contadores ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Permitir todas las operaciones para evento_contadores" ON public.evento_contadores;
+CREATE POLICY "Permitir todas las operaciones para evento_contadores"
+ON public.evento_contadores
+FOR ALL
+USING (true)
+WITH CHECK (true);
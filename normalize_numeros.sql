@@ -0,0 +1,51 @@
+-- Números de invitados en formato canónico: solo dígitos, con código de país y sin "+"
+-- (el mismo formato que produce utils/phone_utils.normalize_phone), para que las
+-- búsquedas sean .eq('numero', ...) exactos sobre un índice.
+-- Los números nacionales (PHONE_NATIONAL_MAX_DIGITS dígitos o menos) reciben el
+-- código DEFAULT_COUNTRY_CODE. SQL no lee el .env: antes de ejecutar, copiar ambos
+-- valores en "parametros" (codigo_pais vacío = no agregar código, como en Python).
+WITH parametros AS (
+    SELECT '56'::text AS codigo_pais, 9 AS max_digitos_nacionales
+), limpios AS (
+    SELECT
+        id,
+        btrim(regexp_replace(regexp_replace(numero, '^whatsapp:', ''), '(@.*|\.0)$', '')) AS texto
+    FROM invitados
+), digitos AS (
+    SELECT id, texto, regexp_replace(texto, '\D', '', 'g') AS d
+    FROM limpios
+)
+UPDATE invitados i
+SET numero = CASE
+    WHEN x.texto LIKE '00%' THEN substr(x.d, 3)
+    WHEN x.texto LIKE '+%' THEN x.d
+    WHEN p.codigo_pais <> '' AND length(x.d) BETWEEN 1 AND p.max_digitos_nacionales
+        THEN p.codigo_pais || ltrim(x.d, '0')
+    ELSE x.d
+END
+FROM digitos x, parametros p
+WHERE i.id = x.id;
+
+-- Un número por evento. Se conserva la fila que tiene respuesta (confirmacion
+-- 'sí' o 'no', la misma regla de create_counters.sql), luego la que registra
+-- acompañante y luego la más antigua; las demás filas del número se eliminan.
+WITH ranking AS (
+    SELECT
+        id,
+        row_number() OVER (
+            PARTITION BY evento_id, numero
+            ORDER BY
+                lower(btrim(coalesce(confirmacion, ''))) IN ('sí', 'no') DESC,
+                coalesce(acompanante::text, '') <> '' DESC,
+                id
+        ) AS orden
+    FROM invitados
+    WHERE evento_id IS NOT NULL
+)
+DELETE FROM invitados i
+USING ranking r
+WHERE i.id = r.id
+  AND r.orden > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_invitados_evento_numero ON invitados (evento_id, numero);
+CREATE INDEX IF NOT EXISTS idx_invitados_numero ON invitados (numero);
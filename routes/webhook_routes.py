@@ -1,12 +1,19 @@
 from flask import Blueprint, request, jsonify
+from postgrest.types import ReturnMethod
 from services.openai_service import OpenAIService
 from services.supabase_service import SupabaseService
 from services.session_service import SessionService
 from services.verification_service import VerificationService
 from services.excel_service import ExcelService
 from services.report_service import ReportService
+from services.ingestion_queue import IngestionQueue, IngestionWorkerPool, RETRYABLE_STATUS
+from services.dedupe_service import DedupeService
+from services.conversation_store import ConversationStore
+from services.guest_directory import GuestDirectory
+from services.invitation_dispatcher import InvitationDispatcher
 from adapters.whatsapp_adapter import WhatsAppAdapter
 from utils.logging_utils import log_info, log_error
+from utils.phone_utils import normalize_phone
 from utils.config import EXCEL_FILE, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, USE_WHATSAPP_WEB
 import os
 
@@ -16,9 +23,11 @@ webhook_bp = Blueprint('webhook', __name__)
 # Initialize WhatsApp adapter
 whatsapp = WhatsAppAdapter()
 
-# Admin conversation history
-admin_conversation_history = [
-    {"role": "system", "content": """Eres un asistente inteligente para gestionar invitaciones a través de WhatsApp. 
+# Ingestion worker pool (None when webhooks are processed inline)
+ingestion_pool = None
+
+# Admin chat histories, one per organizer number
+admin_conversations = ConversationStore("""Eres un asistente inteligente para gestionar invitaciones a través de WhatsApp. 
 Tu trabajo es ayudar al administrador a utilizar el sistema de gestión de invitaciones.
 
 Información importante:
@@ -27,30 +36,113 @@ Información importante:
 3. El sistema procesa automáticamente respuestas de los invitados usando GPT
 
 Responde de manera concisa y amigable. Si el usuario es nuevo, explícale brevemente cómo funciona el sistema.
-"""}
-]
+""")
 
 @webhook_bp.route("/webhook", methods=["POST"])
 def recibir_respuesta():
     """Process messages received from WhatsApp"""
-    global admin_conversation_history
+    payload = parse_inbound_message()
+    
+    # Status callbacks and empty deliveries have nothing to queue; acknowledge them
+    # so the provider does not retry (inline processing handles them as before)
+    if ingestion_pool is not None and not (payload['numero'] and (payload['mensaje'] or payload['media_url'] or payload['has_media'])):
+        log_info(f"Ignoring webhook delivery without sender or content: {payload}")
+        return "Ignored", 200
+    
+    # Provider retries and duplicate bridge deliveries short-circuit here
+    dedupe_key = DedupeService.message_key(payload)
+    if DedupeService.is_duplicate(dedupe_key):
+        return "Duplicate message ignored", 200
     
+    # Ingestion mode: acknowledge now, process on the worker queue
+    if ingestion_pool is not None:
+        if not ingestion_pool.submit(payload):
+            DedupeService.forget(dedupe_key)
+            return "Queue full, retry later", 503, {"Retry-After": "5"}
+        return "Message queued", 200
+    
+    body, status = process_inbound_message(payload)
+    if status >= 500:
+        # Let the provider's retry be processed again
+        DedupeService.forget(dedupe_key)
+    return body, status
+
+@webhook_bp.route("/webhook/metrics", methods=["GET"])
+def webhook_metrics():
+    """Expose ingestion queue metrics"""
+    return jsonify({
+        "ingestion": ingestion_pool.metrics() if ingestion_pool is not None else None,
+        "dedupe": DedupeService.metrics(),
+        "analysis": OpenAIService.get_stats(),
+        "analysis_cache": OpenAIService.analysis_cache.metrics(),
+        "admin_conversations": admin_conversations.metrics(),
+        "guest_directory": GuestDirectory.metrics(),
+        "organizer_cache": SupabaseService.organizador_cache.stats(),
+        "export_cache": ExcelService.export_cache.metrics(),
+        "supabase_payload": SupabaseService.payload_metrics(),
+        "dispatch": InvitationDispatcher.metrics(),
+        "whatsapp_http": WhatsAppAdapter.metrics(),
+        "analysis_batches": OpenAIService._batcher.metrics() if OpenAIService._batcher is not None else None
+    })
+
+def parse_inbound_message():
+    """Normalize the current webhook request from either provider
+    
+    Returns:
+        dict: {numero, mensaje, media_url, has_media, provider, message_id, timestamp}
+    """
     # Different formats based on provider
     if request.is_json and USE_WHATSAPP_WEB:
         # WhatsApp Web JS format
         data = request.json
-        numero = data.get("From", "").replace("@c.us", "")
+        numero = normalize_phone(data.get("From", ""))
         mensaje = data.get("Body", "").strip()
         media_url = None  # Media handled in Node.js server
+        provider = "whatsapp_web"
+        message_id = data.get("MessageId")
         log_info(f"Message received from WhatsApp Web JS: From={numero}, Message={mensaje}")
     else:
         # Twilio format
         data = request.form
-        numero = data.get("From", "").replace("whatsapp:", "").replace("+", "")
+        numero = normalize_phone(data.get("From", ""))
         mensaje = data.get("Body", "").strip()
         media_url = data.get("MediaUrl0", "")
+        provider = "twilio"
+        message_id = data.get("MessageSid") or data.get("SmsMessageSid")
         log_info(f"Message received from Twilio: From={numero}, Message={mensaje}")
     
+    return {
+        'numero': numero,
+        'mensaje': mensaje,
+        'media_url': media_url,
+        'has_media': bool(data.get("HasMedia")),
+        'provider': provider,
+        'message_id': message_id,
+        'timestamp': data.get("Timestamp")
+    }
+
+def start_ingestion_workers():
+    """Enable asynchronous ingestion and start the queue workers"""
+    global ingestion_pool
+    
+    if ingestion_pool is None:
+        ingestion_pool = IngestionWorkerPool(IngestionQueue(), process_inbound_message)
+        ingestion_pool.start()
+    return ingestion_pool
+
+def process_inbound_message(payload):
+    """Handle one inbound message (inline or from the ingestion queue)
+    
+    Args:
+        payload (dict): Message data from parse_inbound_message
+        
+    Returns:
+        tuple: (response body, status code)
+    """
+    numero = payload['numero']
+    mensaje = payload['mensaje']
+    media_url = payload['media_url']
+    
     log_info(f"Message received from {numero}: '{mensaje}'")
     
     # Check if it's a verification command (priority processing)
@@ -130,7 +222,7 @@ def recibir_respuesta():
             return "Command processed", 200
             
         # Process Excel file
-        if media_url or (USE_WHATSAPP_WEB and data.get("HasMedia")):
+        if media_url or (USE_WHATSAPP_WEB and payload['has_media']):
             # Check for active event
             evento_activo_id = SessionService.get_active_event(numero)
             
@@ -147,6 +239,10 @@ def recibir_respuesta():
             
             log_info(f"Attached file detected for event ID: {evento_activo_id}")
             
+            # The bridge also posts the same file to /process-excel; import it once
+            if payload.get('message_id') and DedupeService.is_duplicate(f"excel:{payload['message_id']}"):
+                return "Excel already processed", 200
+            
             # File handling based on source
             if USE_WHATSAPP_WEB:
                 # WhatsApp Web JS: file is already saved as invitados.xlsx
@@ -159,8 +255,9 @@ def recibir_respuesta():
                         auth_tuple=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
                     )
                     if not success:
+                        # The organizer was told and can send the file again: not retried
                         whatsapp.send_message(numero, f"❌ Error al descargar archivo: {file_path}")
-                        return "Error downloading file", 500
+                        return "Error downloading file", 422
                 else:
                     whatsapp.send_message(numero, "❌ Por favor, envía un archivo Excel (.xlsx)")
                     return "Incorrect format", 400
@@ -182,30 +279,14 @@ def recibir_respuesta():
             return "Excel processed", 200
             
         # Chat with GPT for other messages
-        respuesta = OpenAIService.chat_with_gpt(mensaje, admin_conversation_history)
+        respuesta = OpenAIService.chat_with_gpt(mensaje, admin_conversations, numero)
         whatsapp.send_message(numero, respuesta)
         
         return "Message processed", 200
     
     # Processing for normal guests
-    # First, find which event(s) this number is invited to
-    eventos_invitado = []
-    
-    try:
-        supabase = SupabaseService.init_client()
-        if supabase:
-            response = supabase.table('invitados').select('*,eventos(*)').eq('numero', numero).execute()
-            if response.data:
-                for invitado in response.data:
-                    if 'eventos' in invitado and invitado['eventos']:
-                        eventos_invitado.append({
-                            'invitado_id': invitado['id'],
-                            'evento_id': invitado['evento_id'],
-                            'evento_nombre': invitado['eventos']['nombre'],
-                            'organizador_id': invitado['eventos']['organizador_id']
-                        })
-    except Exception as e:
-        log_error(f"Error looking up guest events: {str(e)}")
+    # First, find which event(s) this number is invited to (from the guest directory)
+    eventos_invitado = GuestDirectory.resolve(numero)
     
     # If not in any event, generic message
     if not eventos_invitado:
@@ -228,6 +309,9 @@ def recibir_respuesta():
         invitado_id = invitado_data['invitado_id']
         evento_id = invitado_data['evento_id']
         
+        # A reply proves the invitation arrived
+        InvitationDispatcher.ledger().mark_delivered(evento_id, numero)
+        
         # Analyze message with GPT
         resultados = OpenAIService.analyze_response(mensaje)
         
@@ -257,41 +341,33 @@ def recibir_respuesta():
                     log_info(f"- {cambio}")
                 
                 # Check if all have responded
-                todas_respondieron, num_respuestas, total_invitados, faltantes = ReportService.check_all_responses(evento_id)
+                todas_respondieron, num_respuestas, total_invitados, faltantes = ReportService.check_all_responses(evento_id, include_pending=False)
                 
                 if todas_respondieron:
                     log_info(f"All guests ({total_invitados}/{total_invitados}) have responded!")
                     
-                    # Find the event organizer
-                    success, evento = SupabaseService.get_event_by_id(evento_id)
-                    if success:
-                        # Get organizer number
-                        response = supabase.table('organizadores').select('*').eq('id', invitado_data['organizador_id']).execute()
-                        if response.data:
-                            organizador_numero = response.data[0]['numero']
-                            
-                            # Send notification to organizer
-                            mensaje_notificacion = f"""🎉 ¡Excelente noticia! Todos los invitados ({total_invitados}) han respondido a la invitación para "{invitado_data['evento_nombre']}".
+                    # Organizer number comes with the guest entry
+                    organizador_numero = invitado_data['organizador_numero']
+                    if organizador_numero:
+                        # Send notification to organizer
+                        mensaje_notificacion = f"""🎉 ¡Excelente noticia! Todos los invitados ({total_invitados}) han respondido a la invitación para "{invitado_data['evento_nombre']}".
 
 📊 Resumen:
 {ReportService.generate_event_report(evento_id)}
 
 Te envío el archivo Excel actualizado con todas las respuestas."""
-                            
-                            # Send notification
-                            whatsapp.send_message(organizador_numero, mensaje_notificacion)
-                            
-                            # Export updated data and send Excel
-                            output_file = f"evento_{evento_id}.xlsx"
-                            success, file_path = ExcelService.export_evento_to_excel(evento_id, output_file)
-                            if success:
-                                whatsapp.send_file(organizador_numero, os.path.abspath(file_path), "📊 Archivo Excel con todas las respuestas")
-                                log_info(f"Excel sent to organizer ({organizador_numero}) with all responses")
+                        
+                        # Send notification
+                        whatsapp.send_message(organizador_numero, mensaje_notificacion)
+                        
+                        # Export updated data and send Excel
+                        success, contenido = ExcelService.get_evento_workbook(evento_id)
+                        if success:
+                            whatsapp.send_file_bytes(organizador_numero, contenido, f"evento_{evento_id}.xlsx", "📊 Archivo Excel con todas las respuestas")
+                            log_info(f"Excel sent to organizer ({organizador_numero}) with all responses")
                 
                 # Send confirmation to guest
-                # Get guest name
-                response = supabase.table('invitados').select('nombre').eq('id', invitado_id).execute()
-                nombre_invitado = response.data[0]['nombre'] if response.data else ""
+                nombre_invitado = invitado_data['nombre']
                 
                 confirmacion = f"¡Gracias {nombre_invitado}! Tu respuesta ha sido registrada correctamente para el evento \"{invitado_data['evento_nombre']}\"."
                 
@@ -301,11 +377,12 @@ Te envío el archivo Excel actualizado con todas las respuestas."""
                 
                 return confirmacion, 200
             else:
+                # Nothing was sent to the guest yet, so the message can be processed again
                 log_error(f"Error updating response: {result}")
-                return "❌ Lo siento, no pudimos procesar tu respuesta", 500
+                return "❌ Lo siento, no pudimos procesar tu respuesta", RETRYABLE_STATUS
         else:
             log_error(f"Could not interpret message: '{mensaje}'")
-            return "❌ Lo siento, no pudimos interpretar tu respuesta", 500
+            return "❌ Lo siento, no pudimos interpretar tu respuesta", RETRYABLE_STATUS
     
     # If in multiple events, ask which one they're responding to
     else:
@@ -325,7 +402,15 @@ def process_received_excel():
     """Process an Excel file received through WhatsApp Web JS"""
     try:
         data = request.json
-        numero = data.get("from", "").replace("@c.us", "")
+        numero = normalize_phone(data.get("from", ""))
+        
+        # The bridge also forwards this message to /webhook; import it once
+        message_id = data.get("messageId")
+        if message_id and DedupeService.is_duplicate(f"excel:{message_id}"):
+            return jsonify({
+                "status": "success",
+                "message": "Excel already processed"
+            }), 200
         
         # Check if invitados.xlsx exists
         if not os.path.exists(EXCEL_FILE):
@@ -379,7 +464,7 @@ def generar_codigo():
     """Generate a verification code for a phone number"""
     try:
         data = request.json
-        numero = data.get('numero', '').strip()
+        numero = normalize_phone(data.get('numero', ''))
         
         log_info(f"Generating code for: {numero}")
         
@@ -506,12 +591,14 @@ def resetear_organizador(numero):
         if success and eventos:
             for evento in eventos:
                 # Delete guests associated with the event
-                supabase.table('invitados').delete().eq('evento_id', evento['id']).execute()
+                supabase.table('invitados').delete(returning=ReturnMethod.minimal).eq('evento_id', evento['id']).execute()
                 # Delete event
-                supabase.table('eventos').delete().eq('id', evento['id']).execute()
+                supabase.table('eventos').delete(returning=ReturnMethod.minimal).eq('id', evento['id']).execute()
+                GuestDirectory.invalidate_event(evento['id'])
         
         # Delete the organizer
-        supabase.table('organizadores').delete().eq('id', organizador_id).execute()
+        supabase.table('organizadores').delete(returning=ReturnMethod.minimal).eq('id', organizador_id).execute()
+        SupabaseService.invalidate_organizador(numero)
         
         # Clear session state
         SessionService.clear_session(numero)
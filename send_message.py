@@ -1,10 +1,16 @@
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 import pandas as pd
-import time
 import os
-import requests
 from datetime import datetime
 from dotenv import load_dotenv
+from adapters.bridge_client import BridgeClient
+from services.excel_service import ExcelService
+from services.supabase_service import SupabaseService
+from services import projections
+from services.invitation_dispatcher import InvitationDispatcher, INVITATION_MESSAGE
+from utils.config import WHATSAPP_HTTP_READ_TIMEOUT
+from utils.text_utils import has_rsvp
 
 # Cargar variables de entorno
 load_dotenv()
@@ -15,11 +21,10 @@ auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 
 # Configuración de WhatsApp Web JS
 USE_WHATSAPP_WEB = os.getenv("USE_WHATSAPP_WEB", "false").lower() == "true"
-WHATSAPP_SERVER_URL = f"http://localhost:{os.getenv('WHATSAPP_SERVER_PORT', '3000')}"
 
 # Inicializar cliente según configuración
 if not USE_WHATSAPP_WEB:
-    client = Client(account_sid, auth_token)
+    client = Client(account_sid, auth_token, http_client=TwilioHttpClient(timeout=WHATSAPP_HTTP_READ_TIMEOUT))
     from_whatsapp_number = os.getenv("TWILIO_PHONE_NUMBER", "whatsapp:+14155238886")
     
     # Si no tiene el formato correcto, añadirlo
@@ -29,22 +34,14 @@ if not USE_WHATSAPP_WEB:
 def enviar_invitacion(numero, nombre):
     """Envía un mensaje de invitación personalizado a un número"""
     try:
-        mensaje = f"""¡Hola {nombre}! 🎉
-
-Estás cordialmente invitado a nuestra celebración. 
-
-Por favor, confirma tu asistencia respondiendo a este mensaje.
-Si vienes acompañado, indícalo en tu respuesta.
-Si tienes alguna restricción alimenticia, también háznoslo saber.
-
-¡Esperamos tu respuesta! 🙂"""
+        mensaje = INVITATION_MESSAGE.format(nombre=nombre)
 
         if USE_WHATSAPP_WEB:
             # Usar WhatsApp Web JS
             numero_limpio = numero.replace("whatsapp:+", "").replace("+", "")
-            response = requests.post(
-                f"{WHATSAPP_SERVER_URL}/send-message",
-                json={"number": numero_limpio, "message": mensaje}
+            response = BridgeClient.shared().post(
+                "/send-message",
+                {"number": numero_limpio, "message": mensaje}
             )
             if response.status_code == 200:
                 print(f"Mensaje enviado a {nombre} ({numero_limpio}) usando WhatsApp Web JS")
@@ -68,46 +65,76 @@ Si tienes alguna restricción alimenticia, también háznoslo saber.
     except Exception as e:
         return False, str(e)
 
-def enviar_invitaciones_masivas(excel_file):
-    """Envía invitaciones a todos los números en el Excel que no han respondido"""
+def enviar_invitaciones_masivas(excel_file, organizador_numero=None, evento_id=None):
+    """Envía invitaciones a todos los números en el Excel que no han respondido
+
+    El envío corre en segundo plano con InvitationDispatcher (concurrente y con
+    límite de tasa por proveedor). Si se indica organizador_numero, la función
+    vuelve de inmediato y el organizador recibe el progreso y el reporte final
+    por WhatsApp; si no, espera a que termine y devuelve el reporte. Con
+    evento_id el envío queda registrado como la campaña del evento: mientras
+    no termina, no se reenvía a quien ya recibió la invitación y se reanuda
+    tras un reinicio; una vez terminada, el siguiente envío abre una nueva
+    ronda para quienes siguen sin responder.
+    """
     try:
         df = pd.read_excel(excel_file)
-        total = 0
-        enviados = 0
-        errores = []
-
-        for index, row in df.iterrows():
-            total += 1
-            numero = str(row["Numero"]).strip()
-            nombre = str(row["Nombre"]).strip()
-            confirmacion = str(row["Confirmacion"]).strip().lower()
-            
-            # Solo enviar a los que no han respondido
-            if confirmacion not in ["sí", "no"]:
-                success, result = enviar_invitacion(numero, nombre)
-                if success:
-                    enviados += 1
-                    print(f"✅ Mensaje enviado a {nombre} ({numero})")
-                else:
-                    errores.append(f"❌ Error al enviar a {nombre} ({numero}): {result}")
-                # Esperar 1 segundo entre mensajes para evitar límites de rate
-                time.sleep(1)
-
-        reporte = f"""�� Reporte de envío:
-- Total procesados: {total}
-- Mensajes enviados: {enviados}
-- Errores: {len(errores)}"""
-
-        if errores:
-            reporte += "\n\nDetalles de errores:"
-            for error in errores:
-                reporte += f"\n{error}"
-
-        return True, reporte
+        invitados = ExcelService.normalize_guest_frame(df)
+
+        # Solo enviar a los que no han respondido
+        pendientes = [(invitado['numero'], invitado['nombre']) for invitado in invitados
+                      if not has_rsvp(invitado['confirmacion'])]
+
+        return _iniciar_envio(pendientes, organizador_numero, evento_id, len(invitados))
+
+    except ValueError as e:
+        return False, str(e)
+    except Exception as e:
+        return False, f"Error al procesar envío masivo: {str(e)}"
+
+def enviar_invitaciones_evento(evento_id, organizador_numero=None):
+    """Envía invitaciones a los invitados de un evento que no han respondido
+
+    Lee los pendientes directamente de Supabase, página a página y con el
+    filtro de confirmación aplicado en la consulta, sin exportar ni releer un
+    Excel. Pendiente es quien no respondió "sí" o "no"
+    (utils.text_utils.has_rsvp), la misma regla que usa
+    enviar_invitaciones_masivas. El envío queda registrado como la campaña
+    del evento (ver enviar_invitaciones_masivas).
+    """
+    try:
+        pendientes = [(invitado['numero'], invitado['nombre'])
+                      for pagina in SupabaseService.iter_invitados_by_evento(
+                          evento_id, columns=projections.INVITADO_ENVIO, pending_only=True)
+                      for invitado in pagina]
+
+        if not pendientes:
+            return True, "✅ Todos los invitados ya respondieron. No hay invitaciones pendientes."
+
+        return _iniciar_envio(pendientes, organizador_numero, evento_id)
 
     except Exception as e:
         return False, f"Error al procesar envío masivo: {str(e)}"
 
+def _iniciar_envio(pendientes, organizador_numero, evento_id, total_invitados=None):
+    job = InvitationDispatcher.start(pendientes, organizador_numero, evento_id=evento_id)
+    if job is None:
+        return True, "⏳ Ya hay un envío de invitaciones en curso para este evento. Te avisaré cuando termine."
+    if organizador_numero:
+        mensaje = f"📤 Envío iniciado: {job.total} invitaciones pendientes"
+        if total_invitados is not None:
+            mensaje += f" de {total_invitados} invitados"
+        mensaje += ". Te avisaré del progreso y del resultado final."
+        if job.ronda > 1:
+            mensaje += (f" El envío anterior ya había terminado, así que esta es la "
+                        f"ronda {job.ronda}: se invita de nuevo a quienes aún no han respondido.")
+        if job.omitidos:
+            mensaje += f" ({job.omitidos} ya habían recibido la invitación y no se les reenvía.)"
+        return True, mensaje
+
+    job.wait()
+    return True, job.report()
+
 if __name__ == "__main__":
     # Ejemplo de uso directo
     resultado, mensaje = enviar_invitaciones_masivas("invitados.xlsx")
@@ -1,3 +1,4 @@
+from services.supabase_pool import SupabaseClientPool
 from services.supabase_service import SupabaseService
 from services.openai_service import OpenAIService
 from services.excel_service import ExcelService
@@ -6,6 +7,7 @@ from services.report_service import ReportService
 from services.session_service import SessionService
 
 __all__ = [
+    'SupabaseClientPool',
     'SupabaseService',
     'OpenAIService',
     'ExcelService',
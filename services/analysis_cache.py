@@ -0,0 +1,170 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from utils.cache import TTLCache
+from utils.config import ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_DB
+from utils.logging_utils import log_info, log_error
+from utils.text_utils import normalize_text
+
+class AnalysisCache:
+    """Content-addressed cache of GPT analyses of guest replies
+
+    Keys are the normalized message (casefolded, accent-folded, punctuation
+    stripped) plus the prompt version, so "Sí, ahí estaré" and "si ahi
+    estare" share one entry. Emoji and question marks change the meaning of
+    a reply ("Voy con mi esposa" vs "¿Voy con mi esposa?", 👍 vs 😢), so they
+    stay in the key, and messages with no words at all are never cached.
+    Entries live in an in-memory LRU and, optionally, in a SQLite file that
+    survives restarts.
+    """
+
+    def __init__(self, max_size=ANALYSIS_CACHE_SIZE, db_path=ANALYSIS_CACHE_DB):
+        """Create the cache
+
+        Args:
+            max_size (int): Entries kept in memory
+            db_path (str, optional): SQLite file for the on-disk tier (empty disables it)
+        """
+        self.memory = TTLCache(max_size=max_size)
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'llm_calls': 0,
+            'llm_ms_total': 0.0,
+            'llm_ms_avoided': 0.0
+        }
+
+        if db_path:
+            try:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS analisis (
+                        clave TEXT PRIMARY KEY,
+                        resultado TEXT NOT NULL,
+                        llm_ms REAL,
+                        creado_en REAL NOT NULL
+                    )
+                """)
+                log_info(f"Analysis cache disk tier enabled: {db_path}")
+            except Exception as e:
+                log_error("Error opening analysis cache database, using memory only", e)
+                self._conn = None
+
+    @staticmethod
+    def make_key(mensaje, prompt_version):
+        """Build the cache key for a message
+
+        Args:
+            mensaje (str): Guest message
+            prompt_version (str): Version of the analysis prompt
+
+        Returns:
+            str: Cache key, or None if the message must not be cached (no words)
+        """
+        normalized = normalize_text(mensaje)
+        if not normalized:
+            return None
+        # Emoji (and skin tones) in order, plus one marker for questions
+        simbolos = "".join(c for c in mensaje if unicodedata.category(c) in ('So', 'Sk'))
+        pregunta = "?" if "?" in mensaje or "¿" in mensaje else ""
+        return hashlib.sha1(f"{prompt_version}:{normalized}:{simbolos}{pregunta}".encode('utf-8')).hexdigest()
+
+    def get(self, mensaje, prompt_version):
+        """Look up a previous analysis
+
+        Args:
+            mensaje (str): Guest message
+            prompt_version (str): Version of the analysis prompt
+
+        Returns:
+            dict or None: Cached analysis
+        """
+        key = self.make_key(mensaje, prompt_version)
+        if key is None:
+            with self._lock:
+                self.stats['bypassed'] += 1
+            return None
+        entry = self.memory.get(key)
+        tier = 'memory_hits'
+
+        if entry is None and self._conn is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT resultado, llm_ms FROM analisis WHERE clave = ?", (key,)
+                ).fetchone()
+            if row is not None:
+                entry = (json.loads(row[0]), row[1])
+                self.memory.set(key, entry)
+                tier = 'disk_hits'
+
+        with self._lock:
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            resultado, llm_ms = entry
+            self.stats[tier] += 1
+            self.stats['llm_ms_avoided'] += llm_ms if llm_ms is not None else self._avg_llm_ms()
+        return dict(resultado)
+
+    def set(self, mensaje, prompt_version, resultado, llm_ms=None):
+        """Store an analysis
+
+        Args:
+            mensaje (str): Guest message
+            prompt_version (str): Version of the analysis prompt
+            resultado (dict): Analysis to cache
+            llm_ms (float, optional): Duration of the LLM call that produced it
+        """
+        key = self.make_key(mensaje, prompt_version)
+        if key is not None:
+            self.memory.set(key, (dict(resultado), llm_ms))
+
+        with self._lock:
+            if llm_ms is not None:
+                self.stats['llm_calls'] += 1
+                self.stats['llm_ms_total'] += llm_ms
+            if self._conn is not None and key is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO analisis (clave, resultado, llm_ms, creado_en) VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(resultado), llm_ms, time.time())
+                    )
+                except Exception as e:
+                    log_error("Error writing analysis cache entry", e)
+
+    def metrics(self):
+        """Get hit/miss counters and the LLM time saved
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            avg_llm_ms = self._avg_llm_ms()
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        return {
+            'memory_hits': stats['memory_hits'],
+            'disk_hits': stats['disk_hits'],
+            'misses': stats['misses'],
+            'bypassed': stats['bypassed'],
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_size': len(self.memory),
+            'avg_llm_ms': round(avg_llm_ms, 1),
+            'llm_calls_avoided': hits,
+            'llm_ms_avoided': round(stats['llm_ms_avoided'], 1)
+        }
+
+    def _avg_llm_ms(self):
+        # Caller holds the lock
+        if not self.stats['llm_calls']:
+            return 0.0
+        return self.stats['llm_ms_total'] / self.stats['llm_calls']
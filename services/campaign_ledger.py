@@ -0,0 +1,361 @@
+import os
+import sqlite3
+import threading
+import time
+from postgrest.types import ReturnMethod
+from services.supabase_service import SupabaseService
+from utils.config import (
+    CAMPAIGN_LEDGER_DB,
+    CAMPAIGN_LEDGER_SUPABASE,
+    CAMPAIGN_FLUSH_SIZE,
+    CAMPAIGN_FLUSH_INTERVAL
+)
+from utils.logging_utils import log_info, log_warning
+
+# Recipient states
+QUEUED = 'queued'
+SENT = 'sent'
+FAILED = 'failed'
+DELIVERED = 'delivered'
+
+# Campaign states: 'sending' while a process (propietario_pid) sends it,
+# 'running' when unfinished and unowned (interrupted), 'done' when finished
+SENDING = 'sending'
+RUNNING = 'running'
+DONE = 'done'
+
+class CampaignLedger:
+    """Durable per-recipient record of invitation campaigns
+
+    Each evento has one open campaign at a time. While it is unfinished,
+    running !enviar again resumes it: recipients already sent or delivered
+    are skipped and only queued or failed ones are sent. Once it is done,
+    the next !enviar opens a new round ("evento-<id>", then "evento-<id>-r2",
+    ...) that invites again everyone the caller passes, e.g. as a reminder
+    to guests who have not answered. Outcomes are
+    buffered and written in one transaction every CAMPAIGN_FLUSH_SIZE
+    updates or CAMPAIGN_FLUSH_INTERVAL seconds; after a crash at most that
+    window of sends is repeated. With CAMPAIGN_LEDGER_SUPABASE the same
+    batches are mirrored to the campana_envios table (create_campaigns.sql).
+
+    Several processes can share the ledger file (reloader, multi-worker
+    servers): a campaign is claimed atomically by the process that sends it,
+    and the others leave it alone while that process is alive.
+    """
+
+    def __init__(self, db_path=CAMPAIGN_LEDGER_DB, mirror_to_supabase=CAMPAIGN_LEDGER_SUPABASE,
+                 flush_size=CAMPAIGN_FLUSH_SIZE, flush_interval=CAMPAIGN_FLUSH_INTERVAL):
+        """Open (or create) the ledger database
+
+        Args:
+            db_path (str): SQLite file path
+            mirror_to_supabase (bool): Also upsert every flushed batch to Supabase
+            flush_size (int): Buffered updates that trigger a write
+            flush_interval (float): Seconds after which buffered updates are written
+        """
+        self.mirror_to_supabase = mirror_to_supabase
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer = {}  # {(campana_id, numero): (estado, error, proveedor_id, actualizado_en)}
+        self._last_flush = time.monotonic()
+        self.stats = {'flushes': 0, 'rows_written': 0, 'mirror_errors': 0}
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS campanas (
+                id TEXT PRIMARY KEY,
+                evento_id INTEGER,
+                organizador_numero TEXT,
+                estado TEXT NOT NULL DEFAULT 'running',
+                propietario_pid INTEGER,
+                creada_en REAL NOT NULL,
+                actualizada_en REAL NOT NULL
+            )
+        """)
+        columnas = [fila[1] for fila in self._conn.execute("PRAGMA table_info(campanas)")]
+        if 'propietario_pid' not in columnas:
+            self._conn.execute("ALTER TABLE campanas ADD COLUMN propietario_pid INTEGER")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS envios (
+                campana_id TEXT NOT NULL,
+                numero TEXT NOT NULL,
+                nombre TEXT,
+                estado TEXT NOT NULL DEFAULT 'queued',
+                intentos INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                proveedor_id TEXT,
+                actualizado_en REAL NOT NULL,
+                PRIMARY KEY (campana_id, numero)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_envios_estado ON envios(campana_id, estado)")
+
+    @staticmethod
+    def campaign_id(evento_id, ronda=1):
+        """Ledger key of an evento's invitation campaign
+
+        Args:
+            evento_id (int): ID of the evento
+            ronda (int): 1 for the first campaign, 2 for the one after it finished, ...
+        """
+        return f"evento-{evento_id}" if ronda <= 1 else f"evento-{evento_id}-r{ronda}"
+
+    def current_campaign(self, evento_id):
+        """Key of the evento's latest campaign, or None if it never had one"""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT id FROM campanas WHERE evento_id = ? ORDER BY creada_en DESC, rowid DESC LIMIT 1",
+                (evento_id,)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def open(self, evento_id, destinatarios, organizador_numero=None):
+        """Resume an evento's unfinished campaign, or open a new round, and queue new recipients
+
+        The campaign is claimed for this process; if another live process is
+        already sending it nothing is queued and None is returned.
+
+        Args:
+            evento_id (int): ID of the evento
+            destinatarios (iterable): (numero, nombre) pairs that should have an invitation
+            organizador_numero (str, optional): Number that receives progress
+
+        Returns:
+            tuple: (campana_id, list of (numero, nombre) still to send, ronda), or None if claimed elsewhere
+        """
+        ahora = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rondas = self._conn.execute(
+                    "SELECT id, estado FROM campanas WHERE evento_id = ? ORDER BY creada_en, rowid", (evento_id,)
+                ).fetchall()
+                if rondas and rondas[-1][1] != DONE:
+                    campana_id, ronda = rondas[-1][0], len(rondas)
+                else:
+                    ronda = len(rondas) + 1
+                    campana_id = CampaignLedger.campaign_id(evento_id, ronda)
+                if self._owned_elsewhere(campana_id):
+                    self._conn.execute("ROLLBACK")
+                    log_info(f"Campaign {campana_id} is being sent by another process")
+                    return None
+                self._conn.execute(
+                    """INSERT INTO campanas (id, evento_id, organizador_numero, estado, propietario_pid, creada_en, actualizada_en)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(id) DO UPDATE SET estado = excluded.estado,
+                           propietario_pid = excluded.propietario_pid,
+                           organizador_numero = COALESCE(excluded.organizador_numero, organizador_numero),
+                           actualizada_en = excluded.actualizada_en""",
+                    (campana_id, evento_id, organizador_numero, SENDING, os.getpid(), ahora, ahora)
+                )
+                # Numbers already in the ledger keep their state
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO envios (campana_id, numero, nombre, actualizado_en) VALUES (?, ?, ?, ?)",
+                    ((campana_id, numero, nombre, ahora) for numero, nombre in destinatarios)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        pendientes = self.pending(campana_id)
+        log_info(f"Campaign {campana_id} opened (round {ronda}): {len(pendientes)} recipients to send")
+        return campana_id, pendientes, ronda
+
+    def claim(self, campana_id):
+        """Take over an unfinished campaign for this process
+
+        Args:
+            campana_id (str): Campaign key
+
+        Returns:
+            bool: True if this process now owns it (False if finished or owned by a live process)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                reclamada = not self._owned_elsewhere(campana_id) and self._conn.execute(
+                    "UPDATE campanas SET estado = ?, propietario_pid = ?, actualizada_en = ? WHERE id = ? AND estado != ?",
+                    (SENDING, os.getpid(), time.time(), campana_id, DONE)
+                ).rowcount == 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return reclamada
+
+    def pending(self, campana_id):
+        """Recipients of a campaign that still need an invitation
+
+        Args:
+            campana_id (str): Campaign key
+
+        Returns:
+            list: (numero, nombre) pairs in queued or failed state
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT numero, nombre FROM envios WHERE campana_id = ? AND estado IN (?, ?) ORDER BY rowid",
+                (campana_id, QUEUED, FAILED)
+            ).fetchall()
+        return [(numero, nombre) for numero, nombre in rows]
+
+    def record(self, campana_id, numero, estado, error=None, proveedor_id=None):
+        """Buffer a recipient's new state (written in the next batch)
+
+        Args:
+            campana_id (str): Campaign key
+            numero (str): Recipient number
+            estado (str): sent, failed or delivered
+            error (str, optional): Failure detail
+            proveedor_id (str, optional): Provider message ID
+        """
+        with self._lock:
+            self._buffer[(campana_id, numero)] = (estado, error, proveedor_id, time.time())
+            due = (len(self._buffer) >= self.flush_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def mark_delivered(self, evento_id, numero):
+        """Record that a guest got the invitation (e.g. because they replied) in the evento's latest campaign
+
+        Args:
+            evento_id (int): ID of the evento
+            numero (str): Guest number
+        """
+        campana_id = self.current_campaign(evento_id)
+        if campana_id is not None:
+            self.record(campana_id, numero, DELIVERED)
+
+    def finish(self, campana_id):
+        """Write pending updates and close the campaign if nothing is left to send
+
+        Args:
+            campana_id (str): Campaign key
+
+        Returns:
+            dict: Recipients per state
+        """
+        self.flush()
+        resumen = self.summary(campana_id)
+        estado = RUNNING if resumen.get(QUEUED) else DONE
+        with self._lock:
+            self._conn.execute(
+                "UPDATE campanas SET estado = ?, propietario_pid = NULL, actualizada_en = ? WHERE id = ?",
+                (estado, time.time(), campana_id)
+            )
+        return resumen
+
+    def running_campaigns(self):
+        """Campaigns interrupted before they finished (no live process sending them)
+
+        Returns:
+            list: (campana_id, evento_id, organizador_numero) tuples
+        """
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id, evento_id, organizador_numero, estado, propietario_pid FROM campanas WHERE estado != ?",
+                (DONE,)
+            ).fetchall()
+        return [(campana_id, evento_id, organizador_numero)
+                for campana_id, evento_id, organizador_numero, estado, pid in filas
+                if estado != SENDING or not CampaignLedger._alive(pid)]
+
+    def summary(self, campana_id):
+        """Recipients per state
+
+        Args:
+            campana_id (str): Campaign key
+
+        Returns:
+            dict: {estado: count}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT estado, COUNT(*) FROM envios WHERE campana_id = ? GROUP BY estado",
+                (campana_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def flush(self):
+        """Write buffered updates in one transaction (and mirror them if enabled)"""
+        with self._lock:
+            if not self._buffer:
+                self._last_flush = time.monotonic()
+                return
+            lote = [(estado, error, proveedor_id, actualizado_en, estado, campana_id, numero)
+                    for (campana_id, numero), (estado, error, proveedor_id, actualizado_en) in self._buffer.items()]
+            self._buffer = {}
+            self._last_flush = time.monotonic()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A delivered recipient never goes back to sent or failed
+                self._conn.executemany(
+                    """UPDATE envios SET estado = ?, error = ?, proveedor_id = COALESCE(?, proveedor_id),
+                           actualizado_en = ?, intentos = intentos + (? != 'delivered')
+                       WHERE campana_id = ? AND numero = ? AND estado != 'delivered'""",
+                    lote
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += len(lote)
+
+        if self.mirror_to_supabase:
+            self._mirror(lote)
+
+    def metrics(self):
+        """Get write statistics and campaign counts
+
+        Returns:
+            dict: Flushes, rows written, buffered updates and campaigns per state
+        """
+        with self._lock:
+            campanas = dict(self._conn.execute("SELECT estado, COUNT(*) FROM campanas GROUP BY estado").fetchall())
+            return dict(self.stats, buffered=len(self._buffer), campaigns=campanas)
+
+    def _owned_elsewhere(self, campana_id):
+        # Caller holds self._lock inside a transaction
+        fila = self._conn.execute(
+            "SELECT estado, propietario_pid FROM campanas WHERE id = ?", (campana_id,)
+        ).fetchone()
+        return (fila is not None and fila[0] == SENDING and fila[1] != os.getpid()
+                and CampaignLedger._alive(fila[1]))
+
+    @staticmethod
+    def _alive(pid):
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _mirror(self, lote):
+        try:
+            supabase = SupabaseService.init_client()
+            if not supabase:
+                return
+            filas = [{
+                'campana_id': campana_id,
+                'numero': numero,
+                'estado': estado,
+                'error': error,
+                'proveedor_id': proveedor_id,
+                'actualizado_en': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(actualizado_en))
+            } for estado, error, proveedor_id, actualizado_en, _, campana_id, numero in lote]
+            supabase.table('campana_envios').upsert(
+                filas, on_conflict='campana_id,numero', returning=ReturnMethod.minimal
+            ).execute()
+        except Exception as e:
+            self.stats['mirror_errors'] += 1
+            log_warning(f"Could not mirror campaign ledger batch to Supabase: {str(e)}")
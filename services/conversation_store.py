@@ -0,0 +1,128 @@
+import threading
+from collections import deque
+from utils.cache import TTLCache
+from utils.config import (
+    CONVERSATION_MAX_MESSAGES,
+    CONVERSATION_MAX_TOKENS,
+    CONVERSATION_IDLE_TTL,
+    CONVERSATION_MAX_SESSIONS
+)
+
+# Per-message overhead of the chat format (role, separators)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text):
+    """Rough token count for Spanish/English chat text (~4 characters per token)
+
+    Args:
+        text (str): Message content
+
+    Returns:
+        int: Estimated tokens
+    """
+    return len(text or "") // 4 + 1
+
+class ConversationStore:
+    """Bounded per-number chat histories with a pinned system prompt
+
+    Each number gets its own ring buffer of the last max_messages turns. The
+    system prompt is kept outside the buffer, so it is never truncated away.
+    Prompts are trimmed from the oldest turn down to a token budget.
+    Conversations idle for longer than idle_ttl are dropped, as are the least
+    recently used ones once max_sessions is reached.
+    """
+
+    def __init__(self, system_prompt, max_messages=CONVERSATION_MAX_MESSAGES,
+                 max_tokens=CONVERSATION_MAX_TOKENS, idle_ttl=CONVERSATION_IDLE_TTL,
+                 max_sessions=CONVERSATION_MAX_SESSIONS):
+        """Create the store
+
+        Args:
+            system_prompt (str): Prompt sent first in every conversation
+            max_messages (int): Turns kept per conversation
+            max_tokens (int): Token budget for the prompt, system prompt included
+            idle_ttl (float): Seconds of inactivity before a conversation is dropped
+            max_sessions (int): Conversations kept in memory
+        """
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.sessions = TTLCache(max_size=max_sessions, ttl=idle_ttl)
+        self._lock = threading.Lock()
+        self.stats = {
+            'truncated_prompts': 0,
+            'prompt_tokens_total': 0,
+            'prompts': 0
+        }
+
+    def build_prompt(self, numero, mensaje):
+        """Record a user message and build the messages for the completion
+
+        Args:
+            numero (str): Phone number that owns the conversation
+            mensaje (str): New user message
+
+        Returns:
+            list: System prompt followed by the newest turns that fit the budget
+        """
+        with self._lock:
+            history = self._history(numero)
+            history.append({"role": "user", "content": mensaje})
+
+            budget = self.max_tokens - self._tokens(self.system_message)
+            selected = []
+            for message in reversed(history):
+                cost = self._tokens(message)
+                # The newest message is always sent, even if it alone exceeds the budget
+                if selected and cost > budget:
+                    break
+                selected.append(message)
+                budget -= cost
+
+            prompt = [self.system_message] + selected[::-1]
+            self.stats['prompts'] += 1
+            self.stats['prompt_tokens_total'] += sum(self._tokens(m) for m in prompt)
+            if len(selected) < len(history):
+                self.stats['truncated_prompts'] += 1
+            return prompt
+
+    def add_reply(self, numero, respuesta):
+        """Record the assistant reply
+
+        Args:
+            numero (str): Phone number that owns the conversation
+            respuesta (str): Assistant message
+        """
+        with self._lock:
+            self._history(numero).append({"role": "assistant", "content": respuesta})
+
+    def reset(self, numero):
+        """Forget a conversation"""
+        self.sessions.delete(numero)
+
+    def metrics(self):
+        """Get session and prompt size statistics
+
+        Returns:
+            dict: Store statistics
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            'sessions': self.sessions.stats(),
+            'prompts': stats['prompts'],
+            'truncated_prompts': stats['truncated_prompts'],
+            'avg_prompt_tokens': round(stats['prompt_tokens_total'] / stats['prompts'], 1) if stats['prompts'] else 0.0
+        }
+
+    def _history(self, numero):
+        # Caller holds the lock; re-setting the entry restarts its idle timer
+        history = self.sessions.get(numero)
+        if history is None:
+            history = deque(maxlen=self.max_messages)
+        self.sessions.set(numero, history)
+        return history
+
+    @staticmethod
+    def _tokens(message):
+        return estimate_tokens(message["content"]) + _MESSAGE_OVERHEAD_TOKENS
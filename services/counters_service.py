@@ -0,0 +1,109 @@
+import itertools
+from services import projections
+from services.supabase_service import SupabaseService
+from utils.logging_utils import log_info, log_error, log_warning
+from utils.text_utils import has_rsvp
+
+class CountersService:
+    """Per-event RSVP counters
+
+    The evento_contadores table (create_counters.sql) is kept up to date by a
+    trigger on invitados, so every reply, import or deletion adjusts the counts
+    incrementally and reading them is a single-row lookup. Events without a
+    counters row (table not migrated yet) fall back to counting a two-column
+    projection of the roster.
+    """
+
+    @staticmethod
+    def get_counters(evento_id):
+        """Get the RSVP counters of an evento
+
+        Args:
+            evento_id (int): ID of the evento
+
+        Returns:
+            tuple: (success, {total, confirmados, rechazados, respondidos, pendientes, acompanantes, version} or error_message)
+        """
+        try:
+            supabase = SupabaseService.init_client()
+            if not supabase:
+                return False, "Could not connect to Supabase"
+
+            try:
+                response = SupabaseService.execute(
+                    supabase.table('evento_contadores').select(projections.CONTADORES).eq('evento_id', evento_id),
+                    'evento_contadores'
+                )
+                if response.data:
+                    return True, CountersService._with_pending(response.data[0])
+                log_warning(f"No counters row for event {evento_id}, counting roster")
+            except Exception as e:
+                log_warning(f"Counters table unavailable, counting roster: {str(e)}")
+
+            return CountersService.count_from_roster(evento_id)
+        except Exception as e:
+            log_error(f"Error getting counters for event {evento_id}", e)
+            return False, f"Error: {str(e)}"
+
+    @staticmethod
+    def count_from_roster(evento_id):
+        """Compute the counters from the invitados of an evento
+
+        Args:
+            evento_id (int): ID of the evento
+
+        Returns:
+            tuple: (success, counters dict or error_message)
+        """
+        try:
+            counters = {
+                'evento_id': evento_id,
+                'total': 0,
+                'confirmados': 0,
+                'rechazados': 0,
+                'respondidos': 0,
+                'acompanantes': 0,
+                'version': None
+            }
+            invitados = itertools.chain.from_iterable(
+                SupabaseService.iter_invitados_by_evento(evento_id, columns=projections.INVITADO_CONTEO)
+            )
+            for invitado in invitados:
+                confirmacion = (invitado.get('confirmacion') or '').strip().lower()
+                counters['total'] += 1
+                counters['respondidos'] += has_rsvp(confirmacion)
+                counters['rechazados'] += confirmacion == 'no'
+                if confirmacion == 'sí':
+                    counters['confirmados'] += 1
+                    counters['acompanantes'] += (invitado.get('acompanante') or '').strip().lower() == 'sí'
+
+            log_info(f"Counted roster of event {evento_id}: {counters['total']} invitados")
+            return True, CountersService._with_pending(counters)
+        except Exception as e:
+            log_error(f"Error counting invitados for event {evento_id}", e)
+            return False, f"Error: {str(e)}"
+
+    @staticmethod
+    def get_pending_names(evento_id):
+        """Get the names of invitados that have not responded
+
+        Args:
+            evento_id (int): ID of the evento
+
+        Returns:
+            tuple: (success, list of names or error_message)
+        """
+        try:
+            nombres = []
+            for pagina in SupabaseService.iter_invitados_by_evento(evento_id, columns=projections.INVITADO_NOMBRE, pending_only=True):
+                nombres.extend(invitado['nombre'] for invitado in pagina)
+            return True, nombres
+        except Exception as e:
+            log_error(f"Error getting pending invitados for event {evento_id}", e)
+            return False, f"Error: {str(e)}"
+
+    @staticmethod
+    def _with_pending(counters):
+        counters = dict(counters)
+        counters['pendientes'] = counters['total'] - counters['respondidos']
+        return counters
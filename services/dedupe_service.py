@@ -0,0 +1,67 @@
+import hashlib
+from utils.cache import TTLCache
+from utils.config import DEDUPE_TTL_SECONDS, DEDUPE_MAX_ENTRIES
+from utils.logging_utils import log_info
+
+class DedupeService:
+    """Idempotency store for inbound provider messages
+
+    Twilio retries slow webhooks with the same MessageSid and the Node bridge
+    forwards media messages to more than one endpoint. Every message is keyed on
+    its provider ID (or a content + timestamp hash) and only the first delivery
+    inside the TTL window is processed.
+    """
+
+    seen = TTLCache(max_size=DEDUPE_MAX_ENTRIES, ttl=DEDUPE_TTL_SECONDS)
+
+    @staticmethod
+    def message_key(payload):
+        """Build the idempotency key for an inbound message
+
+        Args:
+            payload (dict): Message data from parse_inbound_message
+
+        Returns:
+            str or None: Key, or None if the message cannot be identified
+        """
+        if payload.get('message_id'):
+            return f"sid:{payload['message_id']}"
+
+        if payload.get('timestamp'):
+            content = f"{payload['numero']}|{payload['mensaje']}|{payload['timestamp']}"
+            return f"hash:{hashlib.sha1(content.encode('utf-8')).hexdigest()}"
+
+        # Without an ID or timestamp, identical replies ("sí") are legitimate repeats
+        return None
+
+    @staticmethod
+    def is_duplicate(key):
+        """Check a key and remember it if it is new
+
+        Args:
+            key (str or None): Idempotency key
+
+        Returns:
+            bool: True if the key was already seen inside the TTL window
+        """
+        if key is None:
+            return False
+        if DedupeService.seen.add(key):
+            return False
+        log_info(f"Duplicate message ignored: {key}")
+        return True
+
+    @staticmethod
+    def forget(key):
+        """Forget a key so the message can be processed again (e.g. after a failure)"""
+        if key is not None:
+            DedupeService.seen.delete(key)
+
+    @staticmethod
+    def metrics():
+        """Get hit (duplicate) and miss (new message) counters
+
+        Returns:
+            dict: Store statistics
+        """
+        return DedupeService.seen.stats()
@@ -1,17 +1,55 @@
+import io
+import itertools
 import os
+import tempfile
 import pandas as pd
 from datetime import datetime
-from utils.config import EXCEL_FILE
+from openpyxl import Workbook, load_workbook
+from utils.config import EXCEL_FILE, IMPORT_BATCH_SIZE
 from utils.logging_utils import log_info, log_error
+from services import projections
 from services.supabase_service import SupabaseService
+from services.guest_import import GuestImport
+from services.counters_service import CountersService
+from services.export_cache import ExportCache
+from utils.phone_utils import normalize_phone_series
+
+def _text_column(serie):
+    """Column as stripped text, without the ".0" Excel adds to whole numbers"""
+    kind = pd.api.types.infer_dtype(serie, skipna=True)
+    if kind == 'floating' and (serie.dropna() % 1 == 0).all():
+        serie = serie.astype('Int64')
+    texto = serie.astype(object).fillna('').astype(str).str.strip()
+    if kind.startswith('mixed'):
+        # Text and numbers in one column: the floats came out as "56912345678.0"
+        texto = texto.str.replace(r'^(-?\d+)\.0$', r'\1', regex=True)
+    return texto
 
 class ExcelService:
     """Service for Excel file operations"""
     
+    # Spreadsheet column -> invitados column
+    GUEST_COLUMNS = {
+        'Nombre': 'nombre',
+        'Numero': 'numero',
+        'Confirmacion': 'confirmacion',
+        '+1': 'acompanante',
+        'Restricciones alimenticias': 'restricciones_alimenticias'
+    }
+    REQUIRED_COLUMNS = ['Nombre', 'Numero']
+    
+    # Rendered workbooks by evento and roster version
+    export_cache = ExportCache()
+    
     @staticmethod
     def import_excel_to_evento(file_path, evento_id):
         """Import data from Excel to an evento
         
+        The sheet is streamed in chunks and each chunk is written as soon as
+        it is read, so memory holds one chunk and the set of imported numbers.
+        If the import fails after writing some batches, the message says what
+        was applied (see GuestImport).
+        
         Args:
             file_path (str): Path to Excel file
             evento_id (int): ID of the evento
@@ -19,58 +57,225 @@ class ExcelService:
         Returns:
             tuple: (success, message)
         """
+        importacion = None
         try:
-            # Read Excel
-            df = pd.read_excel(file_path)
+            chunks = ExcelService.iter_guest_chunks(file_path, evento_id)
             
-            # Clean column names
-            df.columns = df.columns.str.strip()
+            # The first chunk validates the header before touching the database
+            primero = next(chunks, None)
+            if primero is None:
+                return False, "No se encontraron datos válidos para importar"
             
-            # Verify required columns
-            required_columns = ["Nombre", "Numero"]
-            current_columns = [col.strip() for col in df.columns]
-            required_columns_clean = [col.strip() for col in required_columns]
+            importacion = GuestImport(evento_id)
+            importacion.start()
+            importacion.add(primero)
+            for chunk in chunks:
+                importacion.add(chunk)
+            resumen = importacion.finish()
             
-            if not all(col in current_columns for col in required_columns_clean):
-                missing_cols = [col for col in required_columns_clean if col not in current_columns]
-                return False, f"El Excel debe contener las columnas obligatorias: {', '.join(missing_cols)}"
-                
-            # Convert DataFrame to list of dictionaries
-            invitados_formateados = []
-            
-            for _, row in df.iterrows():
-                invitado_formateado = {
-                    'evento_id': evento_id,
-                    'nombre': str(row.get('Nombre', '')) if not pd.isna(row.get('Nombre', '')) else '',
-                    'numero': str(row.get('Numero', '')) if not pd.isna(row.get('Numero', '')) else '',
-                    'confirmacion': str(row.get('Confirmacion', '')) if not pd.isna(row.get('Confirmacion', '')) else '',
-                    'acompanante': str(row.get('+1', '')) if not pd.isna(row.get('+1', '')) else '',
-                    'restricciones_alimenticias': str(row.get('Restricciones alimenticias', '')) if not pd.isna(row.get('Restricciones alimenticias', '')) else ''
-                }
-                
-                # Validate that number and name are not empty
-                if invitado_formateado['nombre'] and invitado_formateado['numero']:
-                    invitados_formateados.append(invitado_formateado)
+            log_info(f"Excel imported successfully: {resumen['filas']} rows for evento {evento_id}")
+            return True, ExcelService.describe_import(resumen)
+        except Exception as e:
+            if importacion is not None and importacion.applied():
+                # Batches already written stay; re-uploading the file completes the import
+                log_error(f"Excel import for evento {evento_id} interrupted after partial changes: {importacion.stats}", e)
+                return False, ExcelService.describe_partial_import(importacion.stats, e)
+            if isinstance(e, ValueError):
+                return False, str(e)
+            log_error("Error importing Excel to evento", e)
+            return False, f"Error al importar Excel: {str(e)}"
+    
+    @staticmethod
+    def normalize_guest_frame(df, evento_id=None, dedupe=True):
+        """Turn a spreadsheet DataFrame into guest records with column-wise operations
+        
+        Strips column names, fills NaN, casts to text, strips values, drops the
+        ".0" Excel adds to numbers and keeps rows with a name and a number.
+        Numbers become canonical keys (see utils.phone_utils.normalize_phone).
+        
+        Args:
+            df (DataFrame): Sheet with the spreadsheet column names
+            evento_id (int, optional): Added to every record when given
+            dedupe (bool): Keep only the first row of each number
             
-            if not invitados_formateados:
-                return False, "No se encontraron datos válidos para importar"
-                
-            # Import to Supabase
-            success, message = SupabaseService.import_invitados_to_evento(evento_id, invitados_formateados)
+        Returns:
+            list: Guest dicts ready for Supabase
             
-            if success:
-                log_info(f"Excel imported successfully: {len(invitados_formateados)} invitados for evento {evento_id}")
-                return True, f"Excel importado con éxito. {len(invitados_formateados)} invitados registrados para su evento."
+        Raises:
+            ValueError: If a required column is missing
+        """
+        df = df.rename(columns=lambda col: str(col).strip())
+        df = df.loc[:, ~df.columns.duplicated()]
+        
+        missing_cols = [col for col in ExcelService.REQUIRED_COLUMNS if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"El Excel debe contener las columnas obligatorias: {', '.join(missing_cols)}")
+        
+        invitados = pd.DataFrame(index=df.index)
+        if evento_id is not None:
+            invitados['evento_id'] = evento_id
+        for col, campo in ExcelService.GUEST_COLUMNS.items():
+            if col in df.columns and campo == 'numero':
+                invitados[campo] = normalize_phone_series(df[col])
+            elif col in df.columns:
+                invitados[campo] = _text_column(df[col])
             else:
-                return False, message
-                
+                invitados[campo] = ''
+        
+        # Validate that number and name are not empty
+        invitados = invitados[(invitados['nombre'] != '') & (invitados['numero'] != '')]
+        if dedupe:
+            invitados = invitados.drop_duplicates(subset='numero', keep='first')
+        
+        # Same records as to_dict('records'), without boxing every cell
+        columnas = list(invitados.columns)
+        return [dict(zip(columnas, fila)) for fila in zip(*(invitados[col].tolist() for col in columnas))]
+    
+    @staticmethod
+    def iter_guest_chunks(file_path, evento_id, chunk_size=IMPORT_BATCH_SIZE):
+        """Stream guest rows from an Excel file in chunks
+        
+        Uses openpyxl's read-only mode, which parses the sheet row by row
+        instead of loading the whole workbook. Each chunk is normalized with
+        normalize_guest_frame.
+        
+        Args:
+            file_path (str): Path to Excel file
+            evento_id (int): ID of the evento
+            chunk_size (int): Sheet rows per chunk
+            
+        Yields:
+            list: Guest dicts ready for Supabase (rows without name or number are skipped)
+            
+        Raises:
+            ValueError: If a required column is missing
+        """
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(col).strip() if col is not None else '' for col in next(rows, ())]
+            
+            # Validates the header even when the sheet has no data rows
+            ExcelService.normalize_guest_frame(pd.DataFrame(columns=header))
+            
+            while True:
+                batch = list(itertools.islice(rows, chunk_size))
+                if not batch:
+                    break
+                # Rows may be shorter or longer than the header
+                batch = [row[:len(header)] + (None,) * (len(header) - len(row)) for row in batch]
+                # Repeated numbers span chunks; GuestImport drops and counts them
+                chunk = ExcelService.normalize_guest_frame(
+                    pd.DataFrame.from_records(batch, columns=header), evento_id, dedupe=False
+                )
+                if chunk:
+                    yield chunk
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def describe_import(resumen):
+        """Format an import summary for the organizer
+        
+        Args:
+            resumen (dict): Summary returned by the import
+            
+        Returns:
+            str: Message
+        """
+        registrados = resumen['insertados'] + resumen['actualizados'] + resumen['sin_cambios']
+        message = (f"Excel importado con éxito. {registrados} invitados registrados para su evento "
+                   f"({resumen['insertados']} nuevos, {resumen['actualizados']} actualizados, "
+                   f"{resumen['sin_cambios']} sin cambios, {resumen['eliminados']} eliminados).")
+        if resumen['duplicados']:
+            message += f" Se omitieron {resumen['duplicados']} números repetidos."
+        return message
+    
+    @staticmethod
+    def describe_partial_import(resumen, error):
+        """Format the message for an import that failed after writing some batches
+        
+        Args:
+            resumen (dict): Counts of the import so far
+            error (Exception): Error that interrupted it
+            
+        Returns:
+            str: Message
+        """
+        return (f"La importación se interrumpió ({str(error)}) y quedó aplicada solo en parte: "
+                f"{resumen['insertados']} nuevos, {resumen['actualizados']} actualizados y "
+                f"{resumen['eliminados']} eliminados. Vuelva a enviar el mismo Excel para completarla.")
+    
+    @staticmethod
+    def get_evento_workbook(evento_id):
+        """Get an evento's guest list workbook, rendering it only if the roster changed
+        
+        Args:
+            evento_id (int): ID of the evento
+            
+        Returns:
+            tuple: (success, workbook bytes or error_message)
+        """
+        # The counters row carries the roster version (None when the counters
+        # table is missing, in which case nothing is cached)
+        success, contadores = CountersService.get_counters(evento_id)
+        version = contadores.get('version') if success else None
+        
+        if version is not None:
+            contenido = ExcelService.export_cache.get(evento_id, version)
+            if contenido is not None:
+                log_info(f"Excel for evento {evento_id} served from cache (version {version})")
+                return True, contenido
+        
+        success, contenido = ExcelService.render_evento_workbook(evento_id)
+        if success and version is not None:
+            ExcelService.export_cache.set(evento_id, version, contenido)
+        return success, contenido
+    
+    @staticmethod
+    def render_evento_workbook(evento_id):
+        """Render an evento's guest list as an .xlsx workbook in memory
+        
+        Rows are streamed from paginated Supabase reads into an openpyxl
+        write-only workbook, so neither the roster nor the sheet is held in
+        memory as a whole and nothing is written to disk.
+        
+        Args:
+            evento_id (int): ID of the evento
+            
+        Returns:
+            tuple: (success, workbook bytes or error_message)
+        """
+        try:
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet()
+            sheet.append(list(ExcelService.GUEST_COLUMNS))
+            
+            filas = 0
+            campos = list(ExcelService.GUEST_COLUMNS.values())
+            for pagina in SupabaseService.iter_invitados_by_evento(evento_id, columns=projections.INVITADO_EXPORT):
+                for invitado in pagina:
+                    sheet.append([invitado.get(campo) for campo in campos])
+                filas += len(pagina)
+            
+            if not filas:
+                return False, "No hay datos para exportar"
+            
+            buffer = io.BytesIO()
+            workbook.save(buffer)
+            log_info(f"Excel rendered for evento {evento_id}: {filas} rows, {buffer.tell()} bytes")
+            return True, buffer.getvalue()
         except Exception as e:
-            log_error("Error importing Excel to evento", e)
-            return False, f"Error al importar Excel: {str(e)}"
+            log_error("Error exporting evento to Excel", e)
+            return False, f"Error al exportar a Excel: {str(e)}"
     
     @staticmethod
     def export_evento_to_excel(evento_id, output_file=None):
-        """Export invitados data to Excel file
+        """Export invitados data to an Excel file
+        
+        For the file-path bridge API. Without output_file the workbook goes to
+        a unique temporary file, so concurrent exports of the same evento do
+        not overwrite each other; the caller deletes it once it is sent.
         
         Args:
             evento_id (int): ID of the evento
@@ -79,39 +284,16 @@ class ExcelService:
         Returns:
             tuple: (success, file_path or error_message)
         """
+        success, contenido = ExcelService.get_evento_workbook(evento_id)
+        if not success:
+            return False, contenido
+        
         try:
-            # Generate unique filename for each evento if not provided
             if output_file is None:
-                output_file = f"evento_{evento_id}.xlsx"
-            
-            # Get invitados from evento
-            success, invitados = SupabaseService.get_invitados_by_evento(evento_id)
-            if not success:
-                return False, invitados
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(invitados)
-            
-            # Skip if no data
-            if df.empty:
-                return False, "No hay datos para exportar"
-            
-            # Rename columns for Excel format
-            df = df.rename(columns={
-                'nombre': 'Nombre',
-                'numero': 'Numero',
-                'confirmacion': 'Confirmacion',
-                'acompanante': '+1',
-                'restricciones_alimenticias': 'Restricciones alimenticias'
-            })
-            
-            # Select relevant columns
-            columns = ['Nombre', 'Numero', 'Confirmacion', '+1', 'Restricciones alimenticias']
-            if all(col in df.columns for col in columns):
-                df = df[columns]
-            
-            # Save Excel
-            df.to_excel(output_file, index=False)
+                fd, output_file = tempfile.mkstemp(prefix=f"evento_{evento_id}_", suffix=".xlsx")
+                os.close(fd)
+            with open(output_file, 'wb') as f:
+                f.write(contenido)
             
             log_info(f"Excel exported successfully to {output_file}")
             return True, output_file
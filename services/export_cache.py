@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from utils.config import EXPORT_CACHE_SIZE, EXPORT_CACHE_MAX_BYTES, EXPORT_CACHE_TTL
+
+class ExportCache:
+    """Rendered guest-list workbooks keyed on evento and roster version
+
+    The version is evento_contadores.version, which the counters trigger bumps
+    on every insert, update or delete of an invitado, so a cached workbook is
+    served only while the roster is unchanged. One workbook is kept per
+    evento; entries are evicted least recently used when either the entry
+    count or the total size is exceeded, and expire after ttl seconds.
+    """
+
+    def __init__(self, max_entries=EXPORT_CACHE_SIZE, max_bytes=EXPORT_CACHE_MAX_BYTES, ttl=EXPORT_CACHE_TTL):
+        """Create the cache
+
+        Args:
+            max_entries (int): Workbooks kept
+            max_bytes (int): Total size of the workbooks kept
+            ttl (float): Seconds a workbook stays valid
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # {evento_id: (version, expires_at, contenido)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'bytes_served': 0}
+
+    def get(self, evento_id, version):
+        """Get the workbook rendered for a roster version
+
+        Args:
+            evento_id (int): ID of the evento
+            version (int): Current roster version
+
+        Returns:
+            bytes: Workbook, or None if not cached for this version
+        """
+        with self._lock:
+            entry = self._data.get(evento_id)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            cached_version, expires_at, contenido = entry
+            if cached_version != version or expires_at < time.monotonic():
+                self._remove(evento_id)
+                self.stats['stale'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._data.move_to_end(evento_id)
+            self.stats['hits'] += 1
+            self.stats['bytes_served'] += len(contenido)
+            return contenido
+
+    def set(self, evento_id, version, contenido):
+        """Store the workbook rendered for a roster version
+
+        Args:
+            evento_id (int): ID of the evento
+            version (int): Roster version the workbook was rendered from
+            contenido (bytes): Workbook
+        """
+        if len(contenido) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(evento_id)
+            self._data[evento_id] = (version, time.monotonic() + self.ttl, contenido)
+            self._bytes += len(contenido)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, evento_id):
+        """Drop the workbook of an evento"""
+        with self._lock:
+            self._remove(evento_id)
+
+    def metrics(self):
+        """Get cache statistics
+
+        Returns:
+            dict: Entries, bytes held and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self._data),
+                bytes=self._bytes,
+                hit_rate=round(self.stats['hits'] / lookups, 4) if lookups else 0.0
+            )
+
+    def _remove(self, evento_id):
+        entry = self._data.pop(evento_id, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
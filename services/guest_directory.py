@@ -0,0 +1,176 @@
+import itertools
+import threading
+from collections import defaultdict
+from services.supabase_service import SupabaseService
+from utils.cache import TTLCache
+from utils.config import GUEST_DIRECTORY_SIZE, GUEST_DIRECTORY_TTL, GUEST_DIRECTORY_NEGATIVE_TTL
+from utils.logging_utils import log_info, log_error
+from utils.phone_utils import normalize_phone
+
+# One query resolves the guest, its event and the organizer's number
+_GUEST_COLUMNS = 'id,nombre,numero,evento_id,eventos(nombre,organizador_id,organizadores(numero))'
+
+# Numbers per IN filter when completing a warmed event (keeps URLs short)
+_IN_CHUNK = 200
+
+class GuestDirectory:
+    """In-process index from a guest's phone number to their invitations
+
+    Maps a normalized number to {evento_id: {invitado_id, nombre, evento_id,
+    evento_nombre, organizador_id, organizador_numero}} so routing an inbound
+    reply needs no query. Events are warmed on import and invalidated on
+    import, delete and reset; unknown numbers cost one exact-match query on
+    the canonical number and are cached (briefly, when they are not guests
+    at all).
+    """
+
+    entries = TTLCache(max_size=GUEST_DIRECTORY_SIZE, ttl=GUEST_DIRECTORY_TTL)
+    # {evento_id: {normalized numero}} for invalidation
+    _event_numbers = defaultdict(set)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def resolve(numero):
+        """Get every invitation of a phone number
+
+        Args:
+            numero (str): Phone number as received
+
+        Returns:
+            list: Invitation dicts (empty if the number is not a guest)
+        """
+        clave = normalize_phone(numero)
+        if not clave:
+            return []
+
+        invitaciones = GuestDirectory.entries.get(clave)
+        if invitaciones is not None:
+            return list(invitaciones.values())
+
+        try:
+            supabase = SupabaseService.init_client()
+            if not supabase:
+                return []
+
+            # Stored numbers are canonical (see normalize_numeros.sql), so this hits the index
+            response = SupabaseService.execute(
+                supabase.table('invitados').select(_GUEST_COLUMNS).eq('numero', clave),
+                'guest_directory_resolve'
+            )
+            invitaciones = {}
+            for row in response.data:
+                invitacion = GuestDirectory._to_entry(row)
+                if invitacion:
+                    invitaciones[invitacion['evento_id']] = invitacion
+            GuestDirectory._store(clave, invitaciones)
+            return list(invitaciones.values())
+        except Exception as e:
+            log_error(f"Error looking up guest events: {str(e)}")
+            return []
+
+    @staticmethod
+    def warm_event(evento_id):
+        """Load the guests of an evento into the directory
+
+        Args:
+            evento_id (int): ID of the evento
+
+        Returns:
+            bool: Success status
+        """
+        try:
+            supabase = SupabaseService.init_client()
+            if not supabase:
+                return False
+
+            por_numero = defaultdict(dict)
+            claves = set()
+            filas = itertools.chain.from_iterable(
+                SupabaseService.iter_invitados_by_evento(evento_id, columns=_GUEST_COLUMNS)
+            )
+            for row in filas:
+                invitacion = GuestDirectory._to_entry(row)
+                clave = normalize_phone(row.get('numero'))
+                if invitacion and clave:
+                    por_numero[clave][evento_id] = invitacion
+                    claves.add(clave)
+
+            # Invitations of the same numbers in other events, so entries are complete
+            claves = sorted(claves)
+            for i in range(0, len(claves), _IN_CHUNK):
+                otros = SupabaseService.execute(
+                    supabase.table('invitados')
+                    .select(_GUEST_COLUMNS)
+                    .in_('numero', claves[i:i + _IN_CHUNK])
+                    .neq('evento_id', evento_id),
+                    'guest_directory_warm'
+                )
+                for row in otros.data:
+                    invitacion = GuestDirectory._to_entry(row)
+                    clave = normalize_phone(row.get('numero'))
+                    if invitacion and clave in por_numero:
+                        por_numero[clave][invitacion['evento_id']] = invitacion
+
+            for clave, invitaciones in por_numero.items():
+                GuestDirectory._store(clave, invitaciones)
+            log_info(f"Guest directory warmed for event {evento_id}: {len(por_numero)} numbers")
+            return True
+        except Exception as e:
+            log_error(f"Error warming guest directory for event {evento_id}", e)
+            return False
+
+    @staticmethod
+    def invalidate_event(evento_id):
+        """Drop every cached number invited to an evento"""
+        with GuestDirectory._lock:
+            numeros = GuestDirectory._event_numbers.pop(evento_id, set())
+        for clave in numeros:
+            GuestDirectory.entries.delete(clave)
+
+    @staticmethod
+    def invalidate_number(numero):
+        """Drop a cached number (e.g. after it was added to or removed from an evento)"""
+        GuestDirectory.entries.delete(normalize_phone(numero))
+
+    @staticmethod
+    def clear():
+        """Drop the whole directory"""
+        GuestDirectory.entries.clear()
+        with GuestDirectory._lock:
+            GuestDirectory._event_numbers.clear()
+
+    @staticmethod
+    def metrics():
+        """Get hit/miss counters
+
+        Returns:
+            dict: Directory statistics
+        """
+        stats = GuestDirectory.entries.stats()
+        with GuestDirectory._lock:
+            stats['indexed_events'] = len(GuestDirectory._event_numbers)
+        return stats
+
+    @staticmethod
+    def _store(clave, invitaciones):
+        # Numbers that are nobody's guest are cached only briefly
+        ttl = None if invitaciones else GUEST_DIRECTORY_NEGATIVE_TTL
+        GuestDirectory.entries.set(clave, invitaciones, ttl=ttl)
+        with GuestDirectory._lock:
+            for evento_id in invitaciones:
+                GuestDirectory._event_numbers[evento_id].add(clave)
+
+    @staticmethod
+    def _to_entry(row):
+        evento = row.get('eventos')
+        if not evento:
+            return None
+        organizador = evento.get('organizadores') or {}
+        return {
+            'invitado_id': row['id'],
+            'nombre': row.get('nombre') or "",
+            'evento_id': row['evento_id'],
+            'evento_nombre': evento.get('nombre'),
+            'organizador_id': evento.get('organizador_id'),
+            'organizador_numero': organizador.get('numero')
+        }
@@ -0,0 +1,214 @@
+import time
+from contextlib import contextmanager
+from postgrest.types import ReturnMethod
+from services.supabase_service import SupabaseService
+from services.guest_directory import GuestDirectory
+from utils.config import IMPORT_BATCH_SIZE
+from utils.logging_utils import log_info
+from utils.phone_utils import normalize_phone
+from utils.text_utils import has_rsvp
+
+# Columns compared between the spreadsheet and the stored roster (rows already
+# match on the normalized number). Recorded answers are only overwritten by a
+# non-empty spreadsheet value.
+_COMPARED_FIELDS = ('nombre', 'confirmacion', 'acompanante', 'restricciones_alimenticias')
+_COLUMNS = 'id,numero,' + ','.join(_COMPARED_FIELDS)
+
+class GuestImport:
+    """Diffing import of an evento's guest list
+
+    Rows are matched to the stored roster on the normalized phone number. Each
+    chunk is diffed against the stored rows with the same numbers, looked up
+    in batches of batch_size: new numbers are inserted and changed rows are
+    upserted by ID. finish() then streams the roster and deletes the numbers
+    missing from the spreadsheet. Unchanged rows are not written, and recorded
+    answers survive a re-upload.
+
+    Memory holds the set of imported numbers (needed to find deletions and
+    numbers repeated across chunks), not the stored roster. The exception is
+    rows stored before numbers were canonical (normalize_numeros.sql not run),
+    which are indexed by start().
+
+    PostgREST has no transaction across requests, so an import that fails
+    part-way keeps the batches already written. Deletes run last, so nothing
+    is removed before finish(). applied() tells whether anything was written;
+    uploading the same file again completes the import.
+
+    Usage:
+        importacion = GuestImport(evento_id)
+        importacion.start()
+        importacion.add(invitados)  # Once, or once per chunk
+        resumen = importacion.finish()
+    """
+
+    def __init__(self, evento_id, batch_size=IMPORT_BATCH_SIZE):
+        """Create the import
+
+        Args:
+            evento_id (int): ID of the evento
+            batch_size (int): Rows per insert/upsert/delete request
+        """
+        self.evento_id = evento_id
+        self.batch_size = max(1, batch_size)
+        self.supabase = None
+        self.legacy = {}     # {normalized numero: [stored rows whose numero is not canonical]}
+        self.sobrantes = []  # IDs of stored duplicates of the same number
+        self.vistos = set()  # Normalized numbers imported so far
+        self.stats = {
+            'filas': 0,
+            'insertados': 0,
+            'actualizados': 0,
+            'sin_cambios': 0,
+            'eliminados': 0,
+            'duplicados': 0,
+            'invalidos': 0
+        }
+        self.tiempos = {'carga': 0.0, 'diff': 0.0, 'insert': 0.0, 'update': 0.0, 'delete': 0.0}
+
+    def start(self):
+        """Connect and index stored rows whose numbers are not canonical yet"""
+        self.supabase = SupabaseService.init_client()
+        if not self.supabase:
+            raise ConnectionError("Could not connect to Supabase")
+
+        with self._timed('carga'):
+            for pagina in SupabaseService.iter_invitados_by_evento(self.evento_id, columns=_COLUMNS):
+                for row in pagina:
+                    clave = normalize_phone(row.get('numero'))
+                    # Rows without a usable number are deleted by finish()
+                    if clave and clave != str(row.get('numero')):
+                        self.legacy.setdefault(clave, []).append(row)
+
+    def add(self, invitados):
+        """Diff a batch of spreadsheet rows and apply inserts and updates
+
+        Args:
+            invitados (list): Guest dicts with evento_id, nombre, numero and the RSVP fields
+        """
+        with self._timed('diff'):
+            nuevos, cambios, chunk = [], [], {}
+            for invitado in invitados:
+                self.stats['filas'] += 1
+                clave = normalize_phone(invitado.get('numero'))
+                if not clave:
+                    self.stats['invalidos'] += 1
+                    continue
+                invitado['numero'] = clave
+                if clave in self.vistos:
+                    self.stats['duplicados'] += 1
+                    continue
+                self.vistos.add(clave)
+                chunk[clave] = invitado
+
+            existentes = self._lookup(list(chunk))
+            for clave, invitado in chunk.items():
+                actual = existentes.get(clave)
+                if actual is None:
+                    nuevos.append(invitado)
+                    continue
+
+                fila = self._merge(actual, invitado, clave)
+                if fila is None:
+                    self.stats['sin_cambios'] += 1
+                else:
+                    cambios.append(fila)
+
+        with self._timed('insert'):
+            for lote in self._chunks(nuevos):
+                self.supabase.table('invitados').insert(lote, returning=ReturnMethod.minimal).execute()
+                self.stats['insertados'] += len(lote)
+
+        with self._timed('update'):
+            for lote in self._chunks(cambios):
+                self.supabase.table('invitados').upsert(lote, on_conflict='id', returning=ReturnMethod.minimal).execute()
+                self.stats['actualizados'] += len(lote)
+
+    def finish(self):
+        """Delete rows missing from the spreadsheet and refresh the guest directory
+
+        Returns:
+            dict: Counts per operation and seconds per phase
+        """
+        with self._timed('delete'):
+            for lote in self._chunks(self.sobrantes):
+                self._delete(lote)
+            # Keyset pages are not disturbed by deleting rows already read
+            for pagina in SupabaseService.iter_invitados_by_evento(self.evento_id, columns='id,numero'):
+                eliminar = [row['id'] for row in pagina if normalize_phone(row.get('numero')) not in self.vistos]
+                for lote in self._chunks(eliminar):
+                    self._delete(lote)
+
+        GuestDirectory.invalidate_event(self.evento_id)
+        GuestDirectory.warm_event(self.evento_id)
+
+        resumen = dict(self.stats)
+        resumen['tiempos'] = {fase: round(segundos, 3) for fase, segundos in self.tiempos.items()}
+        log_info(f"Import for evento {self.evento_id}: {resumen}")
+        return resumen
+
+    def applied(self):
+        """Whether any insert, update or delete has been written"""
+        return bool(self.stats['insertados'] or self.stats['actualizados'] or self.stats['eliminados'])
+
+    def _lookup(self, claves):
+        """Stored row for each number, queuing other rows of the same number for deletion
+
+        Args:
+            claves (list): Normalized numbers
+
+        Returns:
+            dict: {normalized numero: stored row}
+        """
+        candidatos = {}
+        for lote in self._chunks(claves):
+            response = SupabaseService.execute(
+                self.supabase.table('invitados').select(_COLUMNS)
+                .eq('evento_id', self.evento_id).in_('numero', lote),
+                'invitados_import_lookup'
+            )
+            for row in response.data:
+                candidatos.setdefault(row['numero'], []).append(row)
+
+        existentes = {}
+        for clave in claves:
+            filas = candidatos.get(clave, []) + self.legacy.pop(clave, [])
+            if not filas:
+                continue
+            # Same survivor rule as normalize_numeros.sql: the row with an RSVP,
+            # then the one with acompanante, then the oldest
+            filas.sort(key=lambda row: (not has_rsvp(row.get('confirmacion')),
+                                        not str(row.get('acompanante') or ''), row['id']))
+            existentes[clave] = filas[0]
+            self.sobrantes.extend(row['id'] for row in filas[1:])
+        return existentes
+
+    def _delete(self, ids):
+        self.supabase.table('invitados').delete(returning=ReturnMethod.minimal).in_('id', ids).execute()
+        self.stats['eliminados'] += len(ids)
+
+    def _merge(self, actual, invitado, clave):
+        """Build the upsert row for a stored guest, or None if nothing changed"""
+        # Rows stored before numbers were canonical are rewritten with the key
+        fila = {'id': actual['id'], 'evento_id': self.evento_id, 'numero': clave}
+        cambiado = str(actual['numero']) != clave
+        for campo in _COMPARED_FIELDS:
+            guardado = actual.get(campo) or ''
+            nuevo = invitado.get(campo) or ''
+            if nuevo.strip() and nuevo != guardado:
+                fila[campo] = nuevo
+                cambiado = True
+            else:
+                fila[campo] = actual.get(campo)
+        return fila if cambiado else None
+
+    def _chunks(self, filas):
+        for i in range(0, len(filas), self.batch_size):
+            yield filas[i:i + self.batch_size]
+
+    @contextmanager
+    def _timed(self, fase):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[fase] += time.perf_counter() - inicio
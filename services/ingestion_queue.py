@@ -0,0 +1,386 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from utils.config import (
+    INGESTION_QUEUE_DB,
+    INGESTION_WORKERS,
+    INGESTION_MAX_DEPTH,
+    INGESTION_MAX_ATTEMPTS
+)
+from services.keyed_executor import KeyedExecutor
+from utils.logging_utils import log_info, log_error, log_warning
+
+# Handler status meaning "failed before messaging anyone, safe to run again".
+# Other 5xx results already had side effects (the user was told about the
+# error) and are not retried.
+RETRYABLE_STATUS = 503
+
+class IngestionQueue:
+    """Durable SQLite-backed queue of inbound webhook messages"""
+
+    def __init__(self, db_path=INGESTION_QUEUE_DB, max_depth=INGESTION_MAX_DEPTH):
+        """Open (or create) the queue database
+
+        Args:
+            db_path (str): SQLite file path
+            max_depth (int): Pending messages accepted before rejecting new ones
+        """
+        self.db_path = db_path
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._not_empty = threading.Event()
+        # Identifies this queue's claims; the pid alone may be reused by a restarted container
+        self._owner = uuid.uuid4().hex
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS mensajes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pending',
+                intentos INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                encolado_en REAL NOT NULL,
+                iniciado_en REAL,
+                propietario TEXT,
+                propietario_pid INTEGER
+            )
+        """)
+        columnas = [fila[1] for fila in self._conn.execute("PRAGMA table_info(mensajes)")]
+        if 'propietario' not in columnas:
+            self._conn.execute("ALTER TABLE mensajes ADD COLUMN propietario TEXT")
+            self._conn.execute("ALTER TABLE mensajes ADD COLUMN propietario_pid INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_mensajes_estado ON mensajes(estado, id)")
+
+        self._depth = self._count('pending')
+        if self._depth:
+            self._not_empty.set()
+
+    def put(self, payload):
+        """Add a message to the queue
+
+        Args:
+            payload (dict): JSON-serializable message data
+
+        Returns:
+            int or None: Queue item ID, or None if the queue is full
+        """
+        with self._lock:
+            if self._depth >= self.max_depth:
+                return None
+            cursor = self._conn.execute(
+                "INSERT INTO mensajes (payload, encolado_en) VALUES (?, ?)",
+                (json.dumps(payload), time.time())
+            )
+            self._depth += 1
+        self._not_empty.set()
+        return cursor.lastrowid
+
+    def claim(self):
+        """Take the oldest pending message and mark it as processing
+
+        Returns:
+            tuple or None: (item_id, payload, enqueued_at, attempt) or None if empty
+        """
+        with self._lock:
+            # IMMEDIATE takes the write lock so other processes cannot claim the same row
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload, encolado_en, intentos FROM mensajes WHERE estado = 'pending' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        """UPDATE mensajes SET estado = 'processing', intentos = intentos + 1, iniciado_en = ?,
+                               propietario = ?, propietario_pid = ? WHERE id = ?""",
+                        (time.time(), self._owner, os.getpid(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if row is None:
+                self._depth = 0
+                self._not_empty.clear()
+                return None
+            self._depth = max(0, self._depth - 1)
+        return row[0], json.loads(row[1]), row[2], row[3] + 1
+
+    def retry(self, item_id):
+        """Count another processing attempt of a claimed message
+
+        Args:
+            item_id (int): Queue item ID
+        """
+        with self._lock:
+            self._conn.execute("UPDATE mensajes SET intentos = intentos + 1 WHERE id = ?", (item_id,))
+
+    def complete(self, item_id):
+        """Remove a successfully processed message
+
+        Args:
+            item_id (int): Queue item ID
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM mensajes WHERE id = ?", (item_id,))
+
+    def fail(self, item_id, error):
+        """Mark a message as failed, keeping it for inspection
+
+        Args:
+            item_id (int): Queue item ID
+            error (str): Error description
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE mensajes SET estado = 'failed', error = ? WHERE id = ?",
+                (str(error), item_id)
+            )
+
+    def recover(self, max_attempts=INGESTION_MAX_ATTEMPTS):
+        """Requeue messages left in processing by a worker that died
+
+        Messages claimed by a process that is still alive are left alone.
+        Orphans that already used max_attempts are marked failed instead.
+
+        Args:
+            max_attempts (int): Processing attempts before a message is marked failed
+
+        Returns:
+            int: Number of recovered messages
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                filas = self._conn.execute(
+                    "SELECT id, intentos, propietario, propietario_pid FROM mensajes WHERE estado = 'processing'"
+                ).fetchall()
+                huerfanos = [(item_id, intentos) for item_id, intentos, propietario, pid in filas
+                             if propietario != self._owner and not self._alive(pid)]
+                agotados = [item_id for item_id, intentos in huerfanos if intentos >= max_attempts]
+                pendientes = [item_id for item_id, intentos in huerfanos if intentos < max_attempts]
+                self._conn.executemany(
+                    "UPDATE mensajes SET estado = 'failed', error = ?, propietario = NULL, propietario_pid = NULL WHERE id = ?",
+                    [(f"Worker died after {max_attempts} attempts", item_id) for item_id in agotados]
+                )
+                self._conn.executemany(
+                    "UPDATE mensajes SET estado = 'pending', propietario = NULL, propietario_pid = NULL WHERE id = ?",
+                    [(item_id,) for item_id in pendientes]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._depth += len(pendientes)
+        if pendientes:
+            self._not_empty.set()
+            log_warning(f"Recovered {len(pendientes)} unfinished messages from the ingestion queue")
+        if agotados:
+            log_warning(f"Marked {len(agotados)} unfinished messages as failed after {max_attempts} attempts")
+        return len(pendientes)
+
+    def wait(self, timeout):
+        """Block until there may be pending messages
+
+        Args:
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            bool: True if messages may be available
+        """
+        return self._not_empty.wait(timeout)
+
+    def depth(self):
+        """Number of pending messages"""
+        return self._depth
+
+    def oldest_pending_age(self):
+        """Seconds the oldest pending message has been waiting"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(encolado_en) FROM mensajes WHERE estado = 'pending'"
+            ).fetchone()
+        return round(time.time() - row[0], 3) if row and row[0] else 0.0
+
+    def failed_count(self):
+        """Number of messages that exhausted their attempts"""
+        with self._lock:
+            return self._count('failed')
+
+    def _count(self, estado):
+        return self._conn.execute("SELECT COUNT(*) FROM mensajes WHERE estado = ?", (estado,)).fetchone()[0]
+
+    @staticmethod
+    def _alive(pid):
+        if not pid or pid == os.getpid():
+            # Same pid but another owner: a previous run of this container
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+class IngestionWorkerPool:
+    """Drains an IngestionQueue with per-sender ordering
+
+    A dispatcher thread claims messages in arrival order and hands them to a
+    KeyedExecutor keyed on the sender's number: messages from the same guest are
+    processed one after another, messages from different guests in parallel.
+    Messages whose handler raises or answers RETRYABLE_STATUS are retried in
+    place, so a later message from the same sender never overtakes an earlier
+    one. Handlers must not raise after messaging the user. Any other 5xx
+    answer is final: the message is kept as failed without running again.
+    """
+
+    def __init__(self, queue, handler, concurrency=INGESTION_WORKERS,
+                 max_attempts=INGESTION_MAX_ATTEMPTS):
+        """Create the pool
+
+        Args:
+            queue (IngestionQueue): Queue to drain
+            handler (callable): Function called with each message payload
+            concurrency (int): Number of parallel lanes
+            max_attempts (int): Processing attempts before a message is marked failed
+        """
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.executor = None
+        self._dispatcher = None
+        self._stop = threading.Event()
+        # Bounds the messages held in memory by the lanes
+        self._slots = threading.BoundedSemaphore(concurrency * 8)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'rejected': 0,
+            'processed': 0,
+            'retried': 0,
+            'failed': 0,
+            'in_flight': 0,
+            'total_wait_ms': 0.0,
+            'total_processing_ms': 0.0
+        }
+
+    def start(self):
+        """Recover unfinished messages and start the dispatcher and lanes"""
+        self.queue.recover(self.max_attempts)
+        self.executor = KeyedExecutor(self.concurrency, name="ingestion")
+        self._dispatcher = threading.Thread(target=self._run, name="ingestion-dispatcher", daemon=True)
+        self._dispatcher.start()
+        log_info(f"Ingestion workers started: {self.concurrency}")
+
+    def stop(self, timeout=5):
+        """Stop dispatching and wait for the lanes to finish"""
+        self._stop.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+            self._dispatcher = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def submit(self, payload):
+        """Enqueue a message for background processing
+
+        Args:
+            payload (dict): Message data
+
+        Returns:
+            bool: False if rejected because the queue is full (back-pressure)
+        """
+        item_id = self.queue.put(payload)
+        self._count('enqueued' if item_id is not None else 'rejected')
+        if item_id is None:
+            log_warning(f"Ingestion queue full ({self.queue.depth()} pending), message rejected")
+        return item_id is not None
+
+    def metrics(self):
+        """Get queue depth and throughput metrics
+
+        Returns:
+            dict: Back-pressure and processing metrics
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        done = stats['processed'] + stats['failed']
+        return {
+            'workers': self.concurrency,
+            'depth': self.queue.depth(),
+            'max_depth': self.queue.max_depth,
+            'oldest_pending_age_s': self.queue.oldest_pending_age(),
+            'lane_backlog': self.executor.pending() if self.executor is not None else [],
+            'enqueued': stats['enqueued'],
+            'rejected': stats['rejected'],
+            'processed': stats['processed'],
+            'retried': stats['retried'],
+            'failed': stats['failed'],
+            'dead_letter': self.queue.failed_count(),
+            'in_flight': stats['in_flight'],
+            'avg_wait_ms': round(stats['total_wait_ms'] / done, 2) if done else 0.0,
+            'avg_processing_ms': round(stats['total_processing_ms'] / done, 2) if done else 0.0
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._slots.acquire(timeout=1.0):
+                continue
+            item = self.queue.claim()
+            if item is None:
+                self._slots.release()
+                self.queue.wait(1.0)
+                continue
+            item_id, payload, enqueued_at, attempt = item
+            self.executor.submit(payload.get('numero', ''), self._process, item_id, payload, enqueued_at, attempt)
+
+    def _process(self, item_id, payload, enqueued_at, first_attempt=1):
+        started = time.time()
+        outcome = 'failed'
+        self._count('in_flight')
+        try:
+            if first_attempt > self.max_attempts:
+                # Requeued before recovery counted attempts: nothing left to try
+                self.queue.fail(item_id, f"Gave up after {first_attempt - 1} attempts")
+            for attempt in range(first_attempt, self.max_attempts + 1):
+                try:
+                    result = self.handler(payload)
+                    status = result[1] if isinstance(result, tuple) and len(result) > 1 else 200
+                    if status == RETRYABLE_STATUS:
+                        raise RuntimeError(f"Handler asked to retry: {result[0]}")
+                    if status >= 500:
+                        # The user may already have been told about the error: do not repeat it
+                        log_warning(f"Queued message {item_id} failed with {status}, not retried: {result[0]}")
+                        self.queue.fail(item_id, f"{status}: {result[0]}")
+                        break
+                    self.queue.complete(item_id)
+                    outcome = 'processed'
+                    break
+                except Exception as e:
+                    log_error(f"Error processing queued message {item_id} (attempt {attempt})", e)
+                    if attempt >= self.max_attempts:
+                        self.queue.fail(item_id, e)
+                    else:
+                        self.queue.retry(item_id)
+                        self._count('retried')
+                        time.sleep(0.5 * attempt)
+        finally:
+            finished = time.time()
+            with self._stats_lock:
+                self.stats['in_flight'] -= 1
+                self.stats[outcome] += 1
+                self.stats['total_wait_ms'] += (started - enqueued_at) * 1000
+                self.stats['total_processing_ms'] += (finished - started) * 1000
+            self._slots.release()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
@@ -0,0 +1,382 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from adapters.whatsapp_adapter import WhatsAppAdapter
+from services.campaign_ledger import CampaignLedger, SENT, FAILED
+from utils.config import (
+    USE_WHATSAPP_WEB,
+    DISPATCH_CONCURRENCY,
+    DISPATCH_MAX_ATTEMPTS,
+    DISPATCH_PROGRESS_EVERY,
+    DISPATCH_BATCH_SIZE,
+    TWILIO_SEND_RATE,
+    WHATSAPP_WEB_SEND_RATE
+)
+from utils.logging_utils import log_info, log_error
+from utils.rate_limiter import TokenBucket
+
+INVITATION_MESSAGE = """¡Hola {nombre}! 🎉
+
+Estás cordialmente invitado a nuestra celebración.
+
+Por favor, confirma tu asistencia respondiendo a este mensaje.
+Si vienes acompañado, indícalo en tu respuesta.
+Si tienes alguna restricción alimenticia, también háznoslo saber.
+
+¡Esperamos tu respuesta! 🙂"""
+
+# Provider answers that mean "slow down" rather than "this message failed"
+_THROTTLED = {429, 503}
+
+class DispatchJob:
+    """Progress of one bulk send"""
+
+    def __init__(self, destinatarios, organizador_numero=None, campana_id=None, omitidos=0,
+                 evento_id=None, ronda=1):
+        """Create the job
+
+        Args:
+            destinatarios (list): (numero, nombre) pairs
+            organizador_numero (str, optional): Number that receives progress and the final report
+            campana_id (str, optional): Ledger campaign the outcomes are recorded in
+            omitidos (int): Recipients skipped because the ledger shows them as already invited
+            evento_id (int, optional): Evento the campaign belongs to
+            ronda (int): Campaign round of the evento (2 and up re-invite after a finished campaign)
+        """
+        self.destinatarios = destinatarios
+        self.organizador_numero = organizador_numero
+        self.campana_id = campana_id
+        self.omitidos = omitidos
+        self.evento_id = evento_id
+        self.ronda = ronda
+        self.total = len(destinatarios)
+        self.enviados = 0
+        self.errores = []
+        self.reintentos = 0
+        self.inicio = time.monotonic()
+        self.fin = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def procesados(self):
+        return self.enviados + len(self.errores)
+
+    def record(self, numero, nombre, success, detail=None):
+        """Count one finished recipient
+
+        Returns:
+            int: Recipients processed so far
+        """
+        with self._lock:
+            if success:
+                self.enviados += 1
+            else:
+                self.errores.append(f"❌ Error al enviar a {nombre} ({numero}): {detail}")
+            return self.procesados
+
+    def wait(self, timeout=None):
+        """Block until every recipient was processed
+
+        Returns:
+            bool: True if the job finished
+        """
+        return self._done.wait(timeout)
+
+    def summary(self):
+        """Get the job counters
+
+        Returns:
+            dict: Totals, errors, retries and elapsed seconds
+        """
+        with self._lock:
+            fin = self.fin if self.fin is not None else time.monotonic()
+            return {
+                'total': self.total,
+                'enviados': self.enviados,
+                'errores': len(self.errores),
+                'reintentos': self.reintentos,
+                'omitidos': self.omitidos,
+                'campana_id': self.campana_id,
+                'ronda': self.ronda,
+                'terminado': self._done.is_set(),
+                'segundos': round(fin - self.inicio, 1)
+            }
+
+    def report(self):
+        """Format the final report for the organizer
+
+        Returns:
+            str: Report text
+        """
+        resumen = self.summary()
+        reporte = f"""📊 Reporte de envío:
+- Total procesados: {resumen['total']}
+- Mensajes enviados: {resumen['enviados']}
+- Errores: {resumen['errores']}
+- Duración: {resumen['segundos']} s"""
+        if resumen['omitidos']:
+            reporte += f"\n- Omitidos (ya invitados antes): {resumen['omitidos']}"
+
+        if self.errores:
+            reporte += "\n\nDetalles de errores:"
+            for error in self.errores:
+                reporte += f"\n{error}"
+        return reporte
+
+class InvitationDispatcher:
+    """Concurrent, rate-limited invitation sender
+
+    Jobs run on a background thread with DISPATCH_CONCURRENCY workers. Every
+    send takes a token from its provider's bucket (Twilio and the WhatsApp
+    Web bridge have separate limits shared by all jobs); 429/503 answers
+    halve that provider's rate and the send is retried with jittered backoff,
+    while successes bring the rate back up. The organizer gets a progress
+    message every DISPATCH_PROGRESS_EVERY recipients and a final report.
+
+    Through the WhatsApp Web bridge, recipients go out in /send-batch requests
+    of DISPATCH_BATCH_SIZE: the bridge spaces the messages at the bucket's
+    current rate, and batches from all jobs are sent one at a time since the
+    bridge drives a single WhatsApp session.
+
+    Jobs started for an evento go through the CampaignLedger: recipients
+    already invited in the current campaign are skipped, every outcome is
+    recorded, a second start while the evento's campaign is running (in this
+    or another process) is refused, and campaigns cut short by a restart are
+    picked up by resume_campaigns() in exactly one process. Starting again
+    after a campaign finished opens a new round that re-invites everyone.
+    """
+
+    _buckets = {
+        'twilio': TokenBucket(TWILIO_SEND_RATE),
+        'whatsapp_web': TokenBucket(WHATSAPP_WEB_SEND_RATE)
+    }
+    _adapter = None
+    _ledger = None
+    _lock = threading.Lock()
+    _batch_lock = threading.Lock()
+    _active_events = set()  # evento IDs with a campaign running in this process
+    jobs = deque(maxlen=20)  # Recent jobs for metrics
+
+    @staticmethod
+    def provider():
+        """Name of the provider messages are sent through"""
+        return 'whatsapp_web' if USE_WHATSAPP_WEB else 'twilio'
+
+    @staticmethod
+    def start(destinatarios, organizador_numero=None, mensaje=INVITATION_MESSAGE, evento_id=None):
+        """Start sending invitations in the background
+
+        Args:
+            destinatarios (list): (numero, nombre) pairs
+            organizador_numero (str, optional): Number that receives progress and the final report
+            mensaje (str): Template with a {nombre} placeholder
+            evento_id (int, optional): Record the send as the evento's campaign in the ledger
+
+        Returns:
+            DispatchJob or None: The running job, or None if the evento's campaign is already running
+        """
+        campana_id, omitidos, ronda = None, 0, 1
+        if evento_id is not None:
+            with InvitationDispatcher._lock:
+                if evento_id in InvitationDispatcher._active_events:
+                    log_info(f"A campaign for evento {evento_id} is already running")
+                    return None
+                InvitationDispatcher._active_events.add(evento_id)
+            try:
+                destinatarios = list(destinatarios)
+                abierta = InvitationDispatcher.ledger().open(evento_id, destinatarios, organizador_numero)
+            except Exception:
+                InvitationDispatcher._release(evento_id)
+                raise
+            if abierta is None:
+                # Another process (reloader child, other worker) is sending it
+                InvitationDispatcher._release(evento_id)
+                return None
+            campana_id, pendientes, ronda = abierta
+            omitidos = len(destinatarios) - len(pendientes)
+            destinatarios = pendientes
+        job = DispatchJob(destinatarios, organizador_numero, campana_id, omitidos, evento_id, ronda)
+        return InvitationDispatcher._launch(job, mensaje)
+
+    @staticmethod
+    def resume_campaigns(mensaje=INVITATION_MESSAGE):
+        """Restart campaigns interrupted by a previous shutdown
+
+        Returns:
+            int: Number of campaigns resumed
+        """
+        reanudadas = 0
+        try:
+            ledger = InvitationDispatcher.ledger()
+            for campana_id, evento_id, organizador_numero in ledger.running_campaigns():
+                with InvitationDispatcher._lock:
+                    if evento_id in InvitationDispatcher._active_events:
+                        continue
+                    InvitationDispatcher._active_events.add(evento_id)
+                # Only one process may resume it: the claim is atomic in the ledger
+                if not ledger.claim(campana_id):
+                    InvitationDispatcher._release(evento_id)
+                    continue
+                pendientes = ledger.pending(campana_id)
+                if not pendientes:
+                    ledger.finish(campana_id)
+                    InvitationDispatcher._release(evento_id)
+                    continue
+                log_info(f"Resuming campaign {campana_id}: {len(pendientes)} recipients left")
+                InvitationDispatcher._launch(DispatchJob(pendientes, organizador_numero, campana_id, evento_id=evento_id), mensaje)
+                reanudadas += 1
+        except Exception as e:
+            log_error("Error resuming invitation campaigns", e)
+        return reanudadas
+
+    @staticmethod
+    def ledger():
+        """The shared campaign ledger (opened on first use)"""
+        with InvitationDispatcher._lock:
+            if InvitationDispatcher._ledger is None:
+                InvitationDispatcher._ledger = CampaignLedger()
+            return InvitationDispatcher._ledger
+
+    @staticmethod
+    def _release(evento_id):
+        with InvitationDispatcher._lock:
+            InvitationDispatcher._active_events.discard(evento_id)
+
+    @staticmethod
+    def _launch(job, mensaje):
+        InvitationDispatcher.jobs.append(job)
+        thread = threading.Thread(
+            target=InvitationDispatcher._run,
+            args=(job, mensaje),
+            name="invitation-dispatch",
+            daemon=True
+        )
+        thread.start()
+        log_info(f"Invitation dispatch started: {job.total} recipients via {InvitationDispatcher.provider()}")
+        return job
+
+    @staticmethod
+    def metrics():
+        """Get limiter state and recent jobs
+
+        Returns:
+            dict: Per-provider bucket stats and job summaries
+        """
+        return {
+            'providers': {nombre: bucket.stats() for nombre, bucket in InvitationDispatcher._buckets.items()},
+            'jobs': [job.summary() for job in InvitationDispatcher.jobs],
+            'ledger': InvitationDispatcher._ledger.metrics() if InvitationDispatcher._ledger is not None else None
+        }
+
+    @staticmethod
+    def _get_adapter():
+        with InvitationDispatcher._lock:
+            if InvitationDispatcher._adapter is None:
+                InvitationDispatcher._adapter = WhatsAppAdapter()
+            return InvitationDispatcher._adapter
+
+    @staticmethod
+    def _run(job, mensaje):
+        try:
+            if InvitationDispatcher.provider() == 'whatsapp_web' and DISPATCH_BATCH_SIZE > 1:
+                InvitationDispatcher._send_batches(job, mensaje)
+            else:
+                with ThreadPoolExecutor(max_workers=max(1, DISPATCH_CONCURRENCY), thread_name_prefix="dispatch") as pool:
+                    for _ in pool.map(lambda destinatario: InvitationDispatcher._send_one(job, destinatario, mensaje),
+                                      job.destinatarios):
+                        pass
+        except Exception as e:
+            log_error("Error in invitation dispatch", e)
+        finally:
+            with job._lock:
+                job.fin = time.monotonic()
+            if job.campana_id:
+                try:
+                    InvitationDispatcher.ledger().finish(job.campana_id)
+                except Exception as e:
+                    log_error(f"Error closing campaign {job.campana_id}", e)
+                InvitationDispatcher._release(job.evento_id)
+            log_info(f"Invitation dispatch finished: {job.summary()}")
+            if job.organizador_numero:
+                InvitationDispatcher._get_adapter().send_message(job.organizador_numero, job.report())
+            job._done.set()
+
+    @staticmethod
+    def _send_one(job, destinatario, mensaje):
+        numero, nombre = destinatario
+        adapter = InvitationDispatcher._get_adapter()
+        bucket = InvitationDispatcher._buckets[InvitationDispatcher.provider()]
+        texto = mensaje.format(nombre=nombre)
+
+        for intento in range(1, DISPATCH_MAX_ATTEMPTS + 1):
+            bucket.acquire()
+            success, status, detail = adapter.send_message_status(numero, texto)
+            if success:
+                bucket.speed_up()
+                break
+            if status is not None and status not in _THROTTLED:
+                break  # Rejected for this number (invalid, blocked...): retrying will not help
+            if status in _THROTTLED:
+                bucket.slow_down()
+            if intento < DISPATCH_MAX_ATTEMPTS:
+                with job._lock:
+                    job.reintentos += 1
+                time.sleep(min(30, 2 ** intento) * random.uniform(0.5, 1.5))
+
+        InvitationDispatcher._finish_one(job, adapter, numero, nombre, success, detail)
+        return success
+
+    @staticmethod
+    def _send_batches(job, mensaje):
+        adapter = InvitationDispatcher._get_adapter()
+        bucket = InvitationDispatcher._buckets['whatsapp_web']
+
+        for inicio in range(0, job.total, DISPATCH_BATCH_SIZE):
+            pendientes = job.destinatarios[inicio:inicio + DISPATCH_BATCH_SIZE]
+            for intento in range(1, DISPATCH_MAX_ATTEMPTS + 1):
+                with InvitationDispatcher._batch_lock:
+                    resultados = adapter.send_messages_batch(
+                        [(numero, mensaje.format(nombre=nombre)) for numero, nombre in pendientes],
+                        interval=1 / bucket.rate
+                    )
+
+                reintentar = []
+                throttled = False
+                for (numero, nombre), (success, status, detail) in zip(pendientes, resultados):
+                    if success:
+                        bucket.speed_up()
+                    elif (status is None or status in _THROTTLED) and intento < DISPATCH_MAX_ATTEMPTS:
+                        # Bridge unreachable or not ready: the message was not sent
+                        throttled = throttled or status in _THROTTLED
+                        reintentar.append((numero, nombre))
+                        continue
+                    InvitationDispatcher._finish_one(job, adapter, numero, nombre, success, detail)
+
+                if not reintentar:
+                    break
+                if throttled:
+                    bucket.slow_down()
+                with job._lock:
+                    job.reintentos += len(reintentar)
+                time.sleep(min(30, 2 ** intento) * random.uniform(0.5, 1.5))
+                pendientes = reintentar
+
+    @staticmethod
+    def _finish_one(job, adapter, numero, nombre, success, detail):
+        procesados = job.record(numero, nombre, success, detail)
+        if job.campana_id:
+            InvitationDispatcher.ledger().record(
+                job.campana_id, numero,
+                SENT if success else FAILED,
+                error=None if success else str(detail),
+                proveedor_id=detail if success else None
+            )
+        if (job.organizador_numero and DISPATCH_PROGRESS_EVERY > 0
+                and procesados % DISPATCH_PROGRESS_EVERY == 0 and procesados < job.total):
+            adapter.send_message(
+                job.organizador_numero,
+                f"📤 Progreso del envío: {procesados}/{job.total} procesados, {len(job.errores)} errores"
+            )
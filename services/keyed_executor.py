@@ -0,0 +1,80 @@
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from utils.logging_utils import log_info
+
+class KeyedExecutor:
+    """Executor that keeps per-key ordering while running different keys in parallel
+
+    Every key is hashed to one single-threaded lane, so tasks for the same key
+    (e.g. a guest's phone number) run strictly in submission order, while tasks
+    for other keys run concurrently on the remaining lanes. The hash is stable
+    across processes and restarts, so a number always lands on the same lane and
+    any per-number state kept by that lane stays warm.
+    """
+
+    def __init__(self, lanes=4, name="keyed"):
+        """Create the lanes
+
+        Args:
+            lanes (int): Number of single-threaded lanes
+            name (str): Thread name prefix
+        """
+        self.lanes = max(1, lanes)
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-lane-{i}")
+            for i in range(self.lanes)
+        ]
+        self._pending = [0] * self.lanes
+        self._lock = threading.Lock()
+        log_info(f"Keyed executor '{name}' started with {self.lanes} lanes")
+
+    def lane_for(self, key):
+        """Get the lane index for a key
+
+        Args:
+            key (str): Ordering key
+
+        Returns:
+            int: Lane index
+        """
+        return zlib.crc32(str(key).encode('utf-8')) % self.lanes
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Schedule a task after every task previously submitted for the same key
+
+        Args:
+            key (str): Ordering key
+            fn (callable): Task to run
+
+        Returns:
+            Future: Result of the task
+        """
+        lane = self.lane_for(key)
+        with self._lock:
+            self._pending[lane] += 1
+        future = self._executors[lane].submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._task_done(lane))
+        return future
+
+    def pending(self):
+        """Get the number of queued or running tasks per lane
+
+        Returns:
+            list: Pending task count for each lane
+        """
+        with self._lock:
+            return list(self._pending)
+
+    def shutdown(self, wait=True):
+        """Stop every lane
+
+        Args:
+            wait (bool): Wait for queued tasks to finish
+        """
+        for executor in self._executors:
+            executor.shutdown(wait=wait)
+
+    def _task_done(self, lane):
+        with self._lock:
+            self._pending[lane] -= 1
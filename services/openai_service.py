@@ -1,21 +1,147 @@
 import json
+import threading
+import time
 from openai import OpenAI
-from utils.config import OPENAI_API_KEY
-from utils.logging_utils import log_info, log_error
+from services.rsvp_classifier import RSVPClassifier
+from services.analysis_cache import AnalysisCache
+from services.rsvp_batcher import RSVPBatcher
+from utils.config import (
+    OPENAI_API_KEY,
+    OPENAI_TIMEOUT,
+    OPENAI_MAX_RETRIES,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_QUEUE_TIMEOUT,
+    RSVP_CLASSIFIER_THRESHOLD,
+    OPENAI_BATCH_ENABLED,
+    OPENAI_BATCH_MAX_ITEMS,
+    OPENAI_BATCH_MAX_WAIT_MS,
+    OPENAI_BATCH_RESULT_TIMEOUT
+)
+from utils.logging_utils import log_info, log_error, log_warning
+
+ANALYSIS_SYSTEM_PROMPT = "Eres un asistente experto en interpretar respuestas a invitaciones."
+
+ANALYSIS_CONTEXT = """Contexto: Es una respuesta a un mensaje que pregunta sobre:
+1. Confirmación de asistencia
+2. Si llevará acompañante
+3. Restricciones alimenticias
+"""
+
+ANALYSIS_RULES = """Reglas de interpretación:
+- Si menciona que va con alguien (esposa, pareja, amigo, etc.), implica que confirma asistencia Y que lleva acompañante
+- Si dice que va solo/sola, implica que confirma asistencia pero NO lleva acompañante
+- Cualquier mención a dieta especial o alergias debe registrarse como restricción
+- Si no menciona restricciones, usar null
+"""
+
+# Keys every analysis must have; callers index them directly
+ANALYSIS_KEYS = ('confirmacion', 'acompanante', 'restricciones')
 
 class OpenAIService:
     """Service to handle OpenAI API interactions"""
     
+    # Bump when the analysis prompt changes so cached results are not reused
+    ANALYZE_PROMPT_VERSION = "v1"
+    
+    # Cache of GPT analyses keyed on the normalized message
+    analysis_cache = AnalysisCache()
+    
+    # Created on first use when OPENAI_BATCH_ENABLED is set
+    _batcher = None
+    _batcher_lock = threading.Lock()
+    
+    # Single pooled client shared by every request
+    _client = None
+    _client_lock = threading.Lock()
+    
+    # Caps in-flight LLM requests so bursts queue instead of exhausting workers
+    _llm_slots = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+    _stats_lock = threading.Lock()
+    
+    # Counters for how guest replies were analyzed and LLM concurrency
+    stats = {
+        'fast_path': 0,
+        'llm_calls': 0,
+        'llm_in_flight': 0,
+        'llm_waiting': 0,
+        'llm_max_waiting': 0,
+        'llm_rejected': 0,
+        'llm_wait_ms_total': 0.0
+    }
+    
     @staticmethod
     def init_client():
-        """Initialize and return OpenAI client"""
+        """Return the shared OpenAI client, creating it on first use"""
         try:
-            client = OpenAI(api_key=OPENAI_API_KEY)
-            return client
+            with OpenAIService._client_lock:
+                if OpenAIService._client is None:
+                    OpenAIService._client = OpenAI(
+                        api_key=OPENAI_API_KEY,
+                        timeout=OPENAI_TIMEOUT,
+                        max_retries=OPENAI_MAX_RETRIES
+                    )
+                return OpenAIService._client
         except Exception as e:
             log_error("Error initializing OpenAI client", e)
             return None
     
+    @staticmethod
+    def create_completion(**kwargs):
+        """Create a chat completion within the global concurrency limit
+        
+        Args:
+            **kwargs: Arguments for chat.completions.create
+            
+        Returns:
+            ChatCompletion: API response
+            
+        Raises:
+            TimeoutError: If no slot frees up within OPENAI_QUEUE_TIMEOUT seconds
+        """
+        client = OpenAIService.init_client()
+        if not client:
+            raise RuntimeError("OpenAI client not available")
+        
+        queued = time.perf_counter()
+        with OpenAIService._stats_lock:
+            OpenAIService.stats['llm_waiting'] += 1
+            OpenAIService.stats['llm_max_waiting'] = max(
+                OpenAIService.stats['llm_max_waiting'], OpenAIService.stats['llm_waiting']
+            )
+        acquired = OpenAIService._llm_slots.acquire(timeout=OPENAI_QUEUE_TIMEOUT)
+        with OpenAIService._stats_lock:
+            OpenAIService.stats['llm_waiting'] -= 1
+            OpenAIService.stats['llm_wait_ms_total'] += (time.perf_counter() - queued) * 1000
+            if not acquired:
+                OpenAIService.stats['llm_rejected'] += 1
+            else:
+                OpenAIService.stats['llm_in_flight'] += 1
+                OpenAIService.stats['llm_calls'] += 1
+        if not acquired:
+            raise TimeoutError(f"No LLM slot available after {OPENAI_QUEUE_TIMEOUT}s")
+        
+        try:
+            return client.chat.completions.create(**kwargs)
+        finally:
+            OpenAIService._llm_slots.release()
+            with OpenAIService._stats_lock:
+                OpenAIService.stats['llm_in_flight'] -= 1
+    
+    @staticmethod
+    def get_stats():
+        """Get analysis and LLM concurrency counters
+        
+        Returns:
+            dict: Counters and queue-depth metrics
+        """
+        with OpenAIService._stats_lock:
+            stats = dict(OpenAIService.stats)
+        stats['llm_max_concurrency'] = OPENAI_MAX_CONCURRENCY
+        stats['llm_avg_wait_ms'] = round(
+            stats.pop('llm_wait_ms_total') / (stats['llm_calls'] + stats['llm_rejected']), 1
+        ) if stats['llm_calls'] + stats['llm_rejected'] else 0.0
+        return stats
+    
     @staticmethod
     def analyze_response(mensaje):
         """Use GPT to analyze response message and extract relevant information
@@ -26,22 +152,46 @@ class OpenAIService:
         Returns:
             dict or None: Extracted information or None on error
         """
+        # Trivial replies ("sí", "no puedo", "voy con mi esposa") skip the LLM
+        resultado = RSVPClassifier.classify(mensaje)
+        if resultado['confianza'] >= RSVP_CLASSIFIER_THRESHOLD:
+            with OpenAIService._stats_lock:
+                OpenAIService.stats['fast_path'] += 1
+            log_info(f"Fast-path analysis result: {resultado}")
+            return resultado
+        
+        # Same text already analyzed (e.g. "Confirmo asistencia" from many guests)
+        resultado = OpenAIService.analysis_cache.get(mensaje, OpenAIService.ANALYZE_PROMPT_VERSION)
+        if resultado is not None:
+            log_info(f"Cached analysis result: {resultado}")
+            return resultado
+        
+        # During RSVP bursts, replies share one structured completion
+        if OPENAI_BATCH_ENABLED:
+            started = time.perf_counter()
+            try:
+                resultado = OpenAIService.get_batcher().submit(mensaje).result(timeout=OPENAI_BATCH_RESULT_TIMEOUT)
+            except Exception as e:
+                log_error("Error waiting for batched analysis", e)
+                resultado = None
+            if resultado is not None:
+                log_info(f"GPT batched analysis result: {resultado}")
+                OpenAIService.analysis_cache.set(
+                    mensaje,
+                    OpenAIService.ANALYZE_PROMPT_VERSION,
+                    resultado,
+                    llm_ms=(time.perf_counter() - started) * 1000
+                )
+                return resultado
+            log_info("Batched analysis unavailable, analyzing message individually")
+        
         log_info(f"Analyzing message with GPT: '{mensaje}'")
         
         prompt = f"""Analiza este mensaje de respuesta a una invitación y extrae la información solicitada.
-Contexto: Es una respuesta a un mensaje que pregunta sobre:
-1. Confirmación de asistencia
-2. Si llevará acompañante
-3. Restricciones alimenticias
-
+{ANALYSIS_CONTEXT}
 Mensaje a analizar: "{mensaje}"
 
-Reglas de interpretación:
-- Si menciona que va con alguien (esposa, pareja, amigo, etc.), implica que confirma asistencia Y que lleva acompañante
-- Si dice que va solo/sola, implica que confirma asistencia pero NO lleva acompañante
-- Cualquier mención a dieta especial o alergias debe registrarse como restricción
-- Si no menciona restricciones, usar null
-
+{ANALYSIS_RULES}
 Responde SOLO con este JSON exacto:
 {{
     "confirmacion": "sí/no",
@@ -50,14 +200,11 @@ Responde SOLO con este JSON exacto:
 }}"""
 
         try:
-            client = OpenAIService.init_client()
-            if not client:
-                return None
-                
-            response = client.chat.completions.create(
+            started = time.perf_counter()
+            response = OpenAIService.create_completion(
                 model="gpt-3.5-turbo",
                 messages=[
-                    {"role": "system", "content": "Eres un asistente experto en interpretar respuestas a invitaciones."},
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0
@@ -65,37 +212,121 @@ Responde SOLO con este JSON exacto:
             
             resultado = json.loads(response.choices[0].message.content)
             log_info(f"GPT analysis result: {resultado}")
+            if not OpenAIService.is_analysis(resultado):
+                log_warning(f"Discarding malformed GPT analysis: {resultado}")
+                return None
+            
+            OpenAIService.analysis_cache.set(
+                mensaje,
+                OpenAIService.ANALYZE_PROMPT_VERSION,
+                resultado,
+                llm_ms=(time.perf_counter() - started) * 1000
+            )
             return resultado
         except Exception as e:
             log_error("Error analyzing message with GPT", e)
             return None
     
     @staticmethod
-    def chat_with_gpt(mensaje, conversation_history):
+    def get_batcher():
+        """Get the process-wide RSVP batcher, creating it on first use
+        
+        Returns:
+            RSVPBatcher: Batcher sending replies through analyze_batch
+        """
+        with OpenAIService._batcher_lock:
+            if OpenAIService._batcher is None:
+                OpenAIService._batcher = RSVPBatcher(
+                    OpenAIService.analyze_batch,
+                    max_items=OPENAI_BATCH_MAX_ITEMS,
+                    max_wait_ms=OPENAI_BATCH_MAX_WAIT_MS
+                )
+            return OpenAIService._batcher
+    
+    @staticmethod
+    def analyze_batch(items):
+        """Analyze several replies with one structured completion
+        
+        Args:
+            items (list): [(item_id, mensaje)]
+            
+        Returns:
+            tuple: ({item_id: analysis dict}, tokens_used); malformed items are left
+                out so they fall back to the single-message call
+        """
+        mensajes = json.dumps([{"id": item_id, "mensaje": mensaje} for item_id, mensaje in items], ensure_ascii=False)
+        prompt = f"""Analiza estos mensajes de respuesta a una invitación y extrae la información solicitada de cada uno.
+{ANALYSIS_CONTEXT}
+Mensajes a analizar (JSON):
+{mensajes}
+
+{ANALYSIS_RULES}
+Responde SOLO con un arreglo JSON con un objeto por mensaje, usando el mismo "id":
+[
+    {{"id": 1, "confirmacion": "sí/no", "acompanante": "sí/no", "restricciones": "texto de la restricción o null si no hay"}}
+]"""
+
+        response = OpenAIService.create_completion(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0
+        )
+        
+        resultados = {}
+        contenido = json.loads(response.choices[0].message.content)
+        if not isinstance(contenido, list):
+            log_warning(f"Batched analysis is not a JSON array, discarding it: {str(contenido)[:200]}")
+            contenido = []
+        for resultado in contenido:
+            if not OpenAIService.is_analysis(resultado):
+                log_warning(f"Discarding malformed batched analysis: {resultado}")
+                continue
+            try:
+                item_id = int(resultado.get("id"))
+            except (TypeError, ValueError):
+                log_warning(f"Discarding batched analysis without a valid id: {resultado}")
+                continue
+            resultado.pop("id")
+            resultados[item_id] = resultado
+        
+        tokens = response.usage.total_tokens if getattr(response, 'usage', None) else 0
+        return resultados, tokens
+    
+    @staticmethod
+    def is_analysis(resultado):
+        """Whether a parsed GPT answer has every analysis key
+        
+        Args:
+            resultado: Parsed JSON
+            
+        Returns:
+            bool: True if it is a dict with confirmacion, acompanante and restricciones
+        """
+        return isinstance(resultado, dict) and all(clave in resultado for clave in ANALYSIS_KEYS)
+    
+    @staticmethod
+    def chat_with_gpt(mensaje, conversations, numero):
         """Maintain a conversation with GPT
         
         Args:
             mensaje (str): User message
-            conversation_history (list): History of conversation
+            conversations (ConversationStore): Per-number conversation histories
+            numero (str): Phone number the conversation belongs to
             
         Returns:
             str: GPT response
         """
         log_info(f"Chatting with GPT. Message: '{mensaje}'")
         
-        # Add user message to history
-        conversation_history.append({"role": "user", "content": mensaje})
-        
         try:
-            # Limit history to avoid excessive tokens (last 10 messages)
-            limited_history = conversation_history[-10:]
+            # System prompt plus the newest turns that fit the token budget
+            limited_history = conversations.build_prompt(numero, mensaje)
             
-            client = OpenAIService.init_client()
-            if not client:
-                return "Lo siento, hubo un problema al conectar con el asistente."
-                
             # Call GPT
-            response = client.chat.completions.create(
+            response = OpenAIService.create_completion(
                 model="gpt-3.5-turbo",
                 messages=limited_history,
                 temperature=0.7,
@@ -107,7 +338,7 @@ Responde SOLO con este JSON exacto:
             log_info(f"GPT response: '{respuesta[:50]}...'")
             
             # Add response to history
-            conversation_history.append({"role": "assistant", "content": respuesta})
+            conversations.add_reply(numero, respuesta)
             
             return respuesta
         except Exception as e:
@@ -0,0 +1,28 @@
+"""Columns selected by each Supabase read
+
+Reads name the projection they need instead of select('*'), so the JSONB
+columns (invitados.respuestas_adicionales, eventos.estructura_excel) and
+anything added to the tables later are only transferred by the callers
+that use them.
+"""
+
+# organizadores
+ORGANIZADOR = 'id,numero,nombre'
+
+# eventos (without estructura_excel)
+EVENTO = 'id,organizador_id,nombre,descripcion,fecha,fecha_creacion'
+EVENTO_RESUMEN = 'id,nombre'
+
+# invitados (without respuestas_adicionales)
+INVITADO = 'id,evento_id,nombre,numero,confirmacion,acompanante,restricciones_alimenticias'
+INVITADO_RESPUESTA = 'id,evento_id,nombre,confirmacion,acompanante,restricciones_alimenticias'
+INVITADO_EXPORT = 'nombre,numero,confirmacion,acompanante,restricciones_alimenticias'
+INVITADO_CONTEO = 'confirmacion,acompanante'
+INVITADO_NOMBRE = 'nombre'
+INVITADO_ENVIO = 'numero,nombre'
+
+# evento_contadores
+CONTADORES = 'evento_id,total,confirmados,rechazados,respondidos,acompanantes,version'
+
+# Table probes (initialize_database, pool health checks)
+SONDA = 'id'
@@ -1,4 +1,5 @@
 from services.supabase_service import SupabaseService
+from services.counters_service import CountersService
 from utils.logging_utils import log_info, log_error
 
 class ReportService:
@@ -20,57 +21,58 @@ class ReportService:
             if not success:
                 return "Error al obtener datos del evento"
             
-            # Get invitados data
-            success, invitados = SupabaseService.get_invitados_by_evento(evento_id)
+            # Get RSVP counters
+            success, contadores = CountersService.get_counters(evento_id)
             if not success:
-                return f"Error al generar reporte: {invitados}"
+                return f"Error al generar reporte: {contadores}"
             
-            total = len(invitados)
-            confirmados = len([i for i in invitados if i.get('confirmacion', '').lower() == 'sí'])
-            rechazados = len([i for i in invitados if i.get('confirmacion', '').lower() == 'no'])
+            total = contadores['total']
+            confirmados = contadores['confirmados']
+            rechazados = contadores['rechazados']
             pendientes = total - confirmados - rechazados
             
             return f"""📊 Reporte de "{evento['nombre']}":
 - Total invitados: {total}
 - Confirmados: {confirmados}
 - Rechazados: {rechazados}
-- Pendientes: {pendientes}"""
+- Pendientes: {pendientes}
+- Acompañantes: {contadores['acompanantes']}"""
         except Exception as e:
             log_error("Error generating event report", e)
             return f"Error al generar reporte: {str(e)}"
     
     @staticmethod
-    def check_all_responses(evento_id):
+    def check_all_responses(evento_id, include_pending=True):
         """Check if all invitados have responded
         
         Args:
             evento_id (int): ID of the evento
+            include_pending (bool): Also fetch the names of pending invitados
             
         Returns:
-            tuple: (all_responded, responded_count, total_count, pending_list)
+            tuple: (all_responded, responded_count, total_count, pending_list or None if it could not be read)
         """
         try:
-            # Get invitados data
-            success, invitados = SupabaseService.get_invitados_by_evento(evento_id)
+            success, contadores = CountersService.get_counters(evento_id)
             if not success:
-                log_error(f"Error getting invitados for event {evento_id}: {invitados}")
+                log_error(f"Error getting counters for event {evento_id}: {contadores}")
                 return False, 0, 0, []
                 
-            total_invitados = len(invitados)
+            total_invitados = contadores['total']
             if total_invitados == 0:
                 return True, 0, 0, []  # No invitados, all responded
                 
-            # Count responses
-            respondieron = [i for i in invitados if i.get('confirmacion') is not None 
-                            and i.get('confirmacion').strip() != '']
-            num_respuestas = len(respondieron)
-            
-            # List of pending invitados
-            faltantes = [i['nombre'] for i in invitados if i.get('confirmacion') is None 
-                        or i.get('confirmacion').strip() == '']
-            
+            num_respuestas = contadores['respondidos']
             todas_respondieron = (num_respuestas == total_invitados)
             
+            # List of pending invitados (only the unanswered rows are read)
+            faltantes = []
+            if include_pending and not todas_respondieron:
+                success, faltantes = CountersService.get_pending_names(evento_id)
+                if not success:
+                    log_error(f"Error getting pending invitados for event {evento_id}: {faltantes}")
+                    faltantes = None
+            
             return todas_respondieron, num_respuestas, total_invitados, faltantes
         except Exception as e:
             log_error(f"Error checking responses for event {evento_id}", e)
@@ -92,6 +94,9 @@ class ReportService:
             if todas_respondieron:
                 return "✅ Todos los invitados han respondido"
             
+            if faltantes is None:
+                return "❌ No se pudo obtener la lista de invitados pendientes. Intenta de nuevo más tarde."
+            
             if not faltantes:
                 return "No hay invitados pendientes"
             
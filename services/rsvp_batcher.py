@@ -0,0 +1,117 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.logging_utils import log_info, log_error
+
+class RSVPBatcher:
+    """Micro-batches guest replies into a single LLM request
+
+    Replies submitted while a batch is open are collected for up to
+    max_wait_ms or max_items, whichever comes first, and sent together. The
+    batch function returns results keyed by item ID, which are fanned back out
+    to the waiting callers.
+    """
+
+    def __init__(self, batch_fn, max_items=20, max_wait_ms=200, concurrency=2):
+        """Create the batcher
+
+        Args:
+            batch_fn (callable): Called with [(item_id, mensaje)], returns ({item_id: result}, tokens_used)
+            max_items (int): Maximum replies per batch
+            max_wait_ms (int): Maximum time the first reply of a batch waits for company
+            concurrency (int): Batches that may be in flight at once
+        """
+        self.batch_fn = batch_fn
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._senders = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rsvp-batch")
+        self._lock = threading.Lock()
+        self.stats = {
+            'batches': 0,
+            'items': 0,
+            'max_batch_size': 0,
+            'failed_batches': 0,
+            'tokens': 0,
+            'total_wait_ms': 0.0,
+            'total_batch_ms': 0.0
+        }
+        self._collector = threading.Thread(target=self._collect, name="rsvp-batch-collector", daemon=True)
+        self._collector.start()
+        log_info(f"RSVP batcher started (max {self.max_items} items / {max_wait_ms} ms)")
+
+    def submit(self, mensaje):
+        """Queue a reply for the next batch
+
+        Args:
+            mensaje (str): Guest reply
+
+        Returns:
+            Future: Resolves to the analysis dict, or None if the batch failed
+        """
+        future = Future()
+        self._queue.put((next(self._ids), mensaje, future, time.perf_counter()))
+        return future
+
+    def metrics(self):
+        """Get batch size, wait time and token usage
+
+        Returns:
+            dict: Batching statistics
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        batches = stats['batches']
+        return {
+            'batches': batches,
+            'items': stats['items'],
+            'pending': self._queue.qsize(),
+            'avg_batch_size': round(stats['items'] / batches, 2) if batches else 0.0,
+            'max_batch_size': stats['max_batch_size'],
+            'failed_batches': stats['failed_batches'],
+            'avg_wait_ms': round(stats['total_wait_ms'] / stats['items'], 1) if stats['items'] else 0.0,
+            'avg_batch_ms': round(stats['total_batch_ms'] / batches, 1) if batches else 0.0,
+            'tokens': stats['tokens'],
+            'tokens_per_item': round(stats['tokens'] / stats['items'], 1) if stats['items'] else 0.0
+        }
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_items:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch):
+        dispatched = time.perf_counter()
+        results, tokens = {}, 0
+        try:
+            results, tokens = self.batch_fn([(item_id, mensaje) for item_id, mensaje, _, _ in batch])
+            failed = False
+        except Exception as e:
+            log_error(f"Error analyzing batch of {len(batch)} replies", e)
+            failed = True
+        finished = time.perf_counter()
+
+        for item_id, _, future, _ in batch:
+            future.set_result(results.get(item_id))
+
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['items'] += len(batch)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            self.stats['failed_batches'] += failed
+            self.stats['tokens'] += tokens or 0
+            self.stats['total_wait_ms'] += sum((dispatched - queued) * 1000 for _, _, _, queued in batch)
+            self.stats['total_batch_ms'] += (finished - dispatched) * 1000
+        log_info(f"Analyzed batch of {len(batch)} replies in {(finished - dispatched) * 1000:.0f} ms ({tokens} tokens)")
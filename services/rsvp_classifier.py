@@ -0,0 +1,224 @@
+import re
+from utils.text_utils import normalize_text
+
+def _phrases(*phrases):
+    """Compile alternatives into one word-bounded regex"""
+    return re.compile(r"\b(?:" + "|".join(phrases) + r")\b")
+
+# Every pattern is matched against normalize_text() output (lowercase, no accents except ñ)
+_UNCERTAIN = _phrases(
+    r"no se", r"no estoy segur[oa]s?", r"tal vez", r"talvez", r"quizas?", r"a lo mejor",
+    r"depende", r"te aviso", r"les aviso", r"te confirmo (?:despues|luego|mas tarde)",
+    r"veremos", r"puede ser", r"probablemente", r"intentare", r"creo que si", r"creo que no"
+)
+
+# Negated absence means attending: "no me lo pierdo", "no puedo faltar"
+_NEGATED_ABSENCE = _phrases(
+    r"no (?:me |nos )?(?:lo |la )?(?:pierdo|perdemos|perdere|perderemos|perderia|perderiamos)",
+    r"no (?:puedo|podemos|podria|podriamos|pienso|pensamos|voy a|vamos a) "
+    r"(?:faltar|perdermel[oa]|perdernosl[oa])",
+    r"no (?:falto|faltamos|faltare|faltaremos|faltaria|faltariamos)",
+    r"no hay (?:forma|manera|modo) de que (?:falte|faltemos|me l[oa] pierda|nos l[oa] perdamos)",
+    r"sin falta"
+)
+
+_DECLINE = _phrases(
+    r"(?:claro|por supuesto|obvio) que no",
+    r"no (?:me |nos )?(?:puedo|podre|podemos|podremos|puedes|voy|vamos|ire|iremos|asistire|asistiremos"
+    r"|alcanzo|alcanzamos|llego|llegamos|estare|estaremos|confirmo)",
+    r"mejor no", r"no gracias", r"no cuenten? conmigo", r"no cuenten? con nosotros",
+    r"no me es posible", r"no nos es posible", r"imposible", r"declino",
+    r"lamentablemente", r"no asistire", r"tampoco", r"(?:estare|estaremos) (?:de viaje|fuera)"
+)
+_DECLINE_ALONE = re.compile(r"^no\b")
+
+# A reply that opens with a separate "No," ("No, voy solo") loses its comma
+# in normalize_text, so the rest is classified on its own first
+_LEADING_NO = re.compile(r"^\W*no\s*[,.;:!]+", re.IGNORECASE)
+_NO = re.compile(r"\bno\b")
+
+_ACCEPT = _phrases(
+    r"si", r"claro", r"claro que si", r"por supuesto", r"obvio", r"dale", r"ok", r"okay", r"listo",
+    r"voy", r"vamos", r"ire", r"iremos", r"asistire", r"asistiremos", r"estare", r"estaremos",
+    r"confirmo", r"confirmamos", r"confirmad[oa]", r"asistencia confirmada",
+    r"cuenta conmigo", r"cuenten conmigo", r"cuenta con nosotros", r"cuenten con nosotros",
+    r"con gusto", r"encantad[oa]s?", r"presente", r"nos vemos (?:alla|ahi|alli)"
+)
+
+_WITH_COMPANION = _phrases(
+    r"con (?:mi|mis) (?:esposa|esposo|pareja|novia|novio|pololo|polola|marido|mujer|señora|acompañante"
+    r"|amigo|amiga|hijo|hija|hijos|hijas|familia|mama|papa|madre|padre|hermano|hermana)",
+    r"con (?:los|las|mis) (?:niños|niñas|chicos|hijos|hijas)",
+    r"(?:mi|yo y mi) (?:esposa|esposo|pareja|novia|novio|marido|mujer|señora) y yo",
+    r"con (?:un |una )?acompañante", r"con alguien", r"mas uno", r"somos dos", r"vamos dos",
+    r"(?:los|las) dos", r"ambos", r"cuent(?:a|en) con nosotros", r"acompañad[oa]s?"
+)
+
+# Mentions of a partner that the companion rules did not explain are ambiguous
+_PARTNER = _phrases(
+    r"esposa", r"esposo", r"pareja", r"novia", r"novio", r"pololo", r"polola", r"marido", r"mujer",
+    r"señora", r"hijos?", r"hijas?", r"niños"
+)
+
+_ALONE = _phrases(
+    r"solo", r"sola", r"sin acompañante", r"sin pareja", r"sin compañia", r"solo yo", r"sola yo"
+)
+
+_DIET = [
+    (_phrases(r"vegetarian[oa]s?"), "vegetariano"),
+    (_phrases(r"vegan[oa]s?"), "vegano"),
+    (_phrases(r"celiac[oa]s?", r"sin gluten", r"gluten"), "celíaco (sin gluten)"),
+    (_phrases(r"intoleran(?:te|cia) a la lactosa", r"sin lactosa", r"lactosa"), "sin lactosa"),
+    (_phrases(r"diabetic[oa]s?", r"sin azucar"), "diabético (sin azúcar)"),
+    (_phrases(r"kosher"), "kosher"),
+    (_phrases(r"halal"), "halal")
+]
+_ALLERGY = re.compile(
+    r"\b(?:alergi[ac]o?s? (?:a|al)|alergia (?:a|al)|alergia(?: a)? (?:los|las|la|el))"
+    r"(?: (?:los|las|la|el))? ([a-zñ]+)"
+)
+_ALLERGY_ALONE = _phrases(r"alergias?", r"alergic[oa]s?")
+_DOES_NOT_EAT = re.compile(r"\b(?:no como|no comemos|sin) (carne|cerdo|mariscos|pescado|frutos secos|mani|nueces)\b")
+
+# Words that carry no RSVP meaning but are common in replies
+_FILLER = {
+    "hola", "buenas", "buenos", "buen", "dia", "dias", "tardes", "noches", "gracias", "muchas", "mil",
+    "por", "la", "el", "los", "las", "de", "del", "y", "a", "al", "en", "que", "yo", "mi", "nosotros",
+    "con", "muy", "super", "todo", "bien", "genial", "perfecto", "invitacion", "evento", "fiesta",
+    "boda", "matrimonio", "cumpleaños", "celebracion", "saludos", "abrazo", "abrazos", "un", "una",
+    "ahi", "alli", "alla", "nos", "vemos", "tambien", "les", "te", "me", "lo", "siento", "pero",
+    "asistencia", "mucho", "mucha", "feliz", "felices", "estaremos", "estare", "hay", "soy", "es",
+    "tengo", "tiene", "comida", "menu", "restriccion", "restricciones", "alimentaria", "alimenticia",
+    "alimenticias", "ninguna", "ningun", "nada", "especial", "para", "estar", "ahi", "seguro",
+    "poder", "asistir", "ir", "otro", "compromiso", "esta", "vez"
+}
+
+class RSVPClassifier:
+    """Deterministic fast-path classifier for Spanish RSVP replies
+
+    Recognizes confirmations, declines (including negated verbs), companion cues
+    and common dietary keywords. Returns the same shape as the GPT analysis plus
+    a confidence score; callers fall back to GPT when the score is too low.
+    """
+
+    @staticmethod
+    def classify(mensaje):
+        """Classify a guest reply
+
+        Args:
+            mensaje (str): Message to classify
+
+        Returns:
+            dict: {confirmacion, acompanante, restricciones, confianza}
+        """
+        texto = normalize_text((mensaje or "").replace("+1", " mas uno "))
+        resultado = {
+            "confirmacion": None,
+            "acompanante": None,
+            "restricciones": None,
+            "confianza": 0.0
+        }
+        if not texto:
+            return resultado
+
+        leading_no = _LEADING_NO.match(mensaje)
+        if leading_no and normalize_text(mensaje[leading_no.end():]):
+            resto = RSVPClassifier.classify(mensaje[leading_no.end():])
+            if resto["confirmacion"] == "sí" or (resto["confirmacion"] is None and resto["confianza"] > 0):
+                # "No, voy solo": a bare no followed by an acceptance or a hesitation
+                resultado["confianza"] = 0.2
+                return resultado
+
+        spans = []
+
+        def find(pattern, text=texto):
+            matches = list(pattern.finditer(text))
+            spans.extend(m.span() for m in matches)
+            return matches
+
+        def blank(text, matches):
+            for start, end in matches:
+                text = text[:start] + " " * (end - start) + text[end:]
+            return text
+
+        restricciones = RSVPClassifier._find_restrictions(texto, spans)
+        uncertain = find(_UNCERTAIN)
+
+        # Blank out negated absences and declines so "no puedo faltar" is not a
+        # decline and "no voy" does not also count as "voy"
+        attending = find(_NEGATED_ABSENCE)
+        sin_ausencias = blank(texto, [m.span() for m in attending])
+        declines = find(_DECLINE, sin_ausencias) + find(_DECLINE_ALONE, sin_ausencias)
+        sin_rechazos = blank(sin_ausencias, [m.span() for m in declines])
+        accepts = find(_ACCEPT, sin_rechazos) + attending
+        with_companion = find(_WITH_COMPANION, sin_rechazos)
+        alone = find(_ALONE, sin_rechazos)
+
+        if declines and not (accepts or with_companion):
+            resultado["confirmacion"] = "no"
+            resultado["acompanante"] = "no"
+        elif (accepts or with_companion) and not declines:
+            resultado["confirmacion"] = "sí"
+            if with_companion and not alone:
+                resultado["acompanante"] = "sí"
+            elif alone and not with_companion:
+                resultado["acompanante"] = "no"
+        resultado["restricciones"] = ", ".join(restricciones) if restricciones else None
+
+        if resultado["confirmacion"] is None or uncertain:
+            # Unknown, contradictory or hesitant: leave it to GPT
+            resultado["confianza"] = 0.2 if uncertain or declines else 0.0
+            return resultado
+
+        resultado["confianza"] = RSVPClassifier._confidence(texto, spans)
+        if _PARTNER.search(sin_rechazos) and not (with_companion or alone):
+            resultado["confianza"] = min(resultado["confianza"], 0.6)
+        if _NO.search(blank(texto, spans)):
+            # A "no" the rules did not explain ("claro que sí... mi esposa no")
+            # may negate anything: leave it to GPT
+            resultado["confianza"] = min(resultado["confianza"], 0.5)
+        if "?" in mensaje:
+            # Questions usually need a human-like answer, not a bare RSVP
+            resultado["confianza"] = min(resultado["confianza"], 0.5)
+        return resultado
+
+    @staticmethod
+    def _find_restrictions(texto, spans):
+        """Collect dietary restriction labels, recording matched spans"""
+        restricciones = []
+        for pattern, label in _DIET:
+            match = pattern.search(texto)
+            if match:
+                spans.append(match.span())
+                restricciones.append(label)
+
+        allergies = list(_ALLERGY.finditer(texto))
+        for match in allergies:
+            spans.append(match.span())
+            restricciones.append(f"alergia a {match.group(1)}")
+        if not allergies:
+            match = _ALLERGY_ALONE.search(texto)
+            if match:
+                spans.append(match.span())
+                restricciones.append("alergia (sin especificar)")
+
+        for match in _DOES_NOT_EAT.finditer(texto):
+            spans.append(match.span())
+            restricciones.append(f"no come {match.group(1)}")
+        return restricciones
+
+    @staticmethod
+    def _confidence(texto, spans):
+        """Score by how much of the message the rules explain"""
+        covered = [False] * len(texto)
+        for start, end in spans:
+            for i in range(start, end):
+                covered[i] = True
+
+        total = explained = 0
+        for match in re.finditer(r"\S+", texto):
+            total += 1
+            if match.group() in _FILLER or all(covered[match.start():match.end()]):
+                explained += 1
+
+        return round(0.55 + 0.45 * explained / total, 2) if total else 0.0
@@ -0,0 +1,160 @@
+import itertools
+import os
+import threading
+import time
+from supabase import create_client
+from utils.config import (
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    SUPABASE_POOL_SIZE,
+    SUPABASE_POOL_HEALTHCHECK_INTERVAL
+)
+from utils.logging_utils import log_info, log_error, log_warning
+
+class SupabaseClientPool:
+    """Process-wide pool of long-lived Supabase clients
+
+    Every pooled client owns a keep-alive HTTP session to PostgREST. Threads are
+    pinned to one slot of the pool, so consecutive queries issued while handling
+    a message reuse the same open connection instead of paying a new handshake.
+    """
+
+    # Pool slots: [{'client': Client, 'pid': int, 'last_check': float, 'lock': Lock}]
+    _slots = []
+    _lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _local = threading.local()
+    _slot_counter = itertools.count()
+
+    stats = {
+        'clients_created': 0,
+        'checkouts': 0,
+        'health_checks': 0,
+        'health_check_failures': 0
+    }
+
+    @staticmethod
+    def get_client():
+        """Get the pooled client assigned to the current thread
+
+        Returns:
+            Client: Supabase client with a warm HTTP session
+        """
+        slot = SupabaseClientPool._get_slot()
+
+        with slot['lock']:
+            # Clients must not be shared with forked worker processes
+            if slot['client'] is None or slot['pid'] != os.getpid():
+                SupabaseClientPool._replace_client(slot)
+            elif time.monotonic() - slot['last_check'] > SUPABASE_POOL_HEALTHCHECK_INTERVAL:
+                if not SupabaseClientPool._check_client(slot['client']):
+                    SupabaseClientPool._replace_client(slot)
+                slot['last_check'] = time.monotonic()
+
+            SupabaseClientPool._count('checkouts')
+            return slot['client']
+
+    @staticmethod
+    def health_check():
+        """Check every pooled client and rebuild the unhealthy ones
+
+        Returns:
+            dict: {slot_index: healthy}
+        """
+        results = {}
+        with SupabaseClientPool._lock:
+            slots = list(SupabaseClientPool._slots)
+
+        for index, slot in enumerate(slots):
+            with slot['lock']:
+                if slot['client'] is None:
+                    continue
+                healthy = SupabaseClientPool._check_client(slot['client'])
+                if not healthy:
+                    SupabaseClientPool._replace_client(slot)
+                slot['last_check'] = time.monotonic()
+                results[index] = healthy
+        return results
+
+    @staticmethod
+    def get_stats():
+        """Get pool usage statistics
+
+        Returns:
+            dict: Pool size and usage counters
+        """
+        with SupabaseClientPool._lock:
+            open_slots = len([s for s in SupabaseClientPool._slots if s['client'] is not None])
+        return dict(SupabaseClientPool.stats, pool_size=SUPABASE_POOL_SIZE, open_clients=open_slots)
+
+    @staticmethod
+    def reset():
+        """Close every pooled client (used on shutdown and in benchmarks)"""
+        with SupabaseClientPool._lock:
+            for slot in SupabaseClientPool._slots:
+                with slot['lock']:
+                    SupabaseClientPool._close_client(slot['client'])
+                    slot['client'] = None
+            SupabaseClientPool._slots = []
+            SupabaseClientPool._slot_counter = itertools.count()
+            SupabaseClientPool._local = threading.local()
+
+    @staticmethod
+    def _get_slot():
+        """Get (or assign round-robin) the pool slot of the current thread"""
+        slot_index = getattr(SupabaseClientPool._local, 'slot_index', None)
+        if slot_index is None:
+            slot_index = next(SupabaseClientPool._slot_counter) % max(1, SUPABASE_POOL_SIZE)
+            SupabaseClientPool._local.slot_index = slot_index
+
+        with SupabaseClientPool._lock:
+            while len(SupabaseClientPool._slots) <= slot_index:
+                SupabaseClientPool._slots.append({
+                    'client': None,
+                    'pid': None,
+                    'last_check': 0.0,
+                    'lock': threading.Lock()
+                })
+            return SupabaseClientPool._slots[slot_index]
+
+    @staticmethod
+    def _replace_client(slot):
+        """Build a fresh client for a slot (caller holds the slot lock)"""
+        if slot['client'] is not None and slot['pid'] == os.getpid():
+            SupabaseClientPool._close_client(slot['client'])
+
+        slot['client'] = create_client(SUPABASE_URL, SUPABASE_KEY)
+        slot['pid'] = os.getpid()
+        slot['last_check'] = time.monotonic()
+        SupabaseClientPool._count('clients_created')
+        log_info(f"Supabase pooled client created (pid {slot['pid']})")
+
+    @staticmethod
+    def _check_client(client):
+        """Run a lightweight query to verify the client's connection"""
+        SupabaseClientPool._count('health_checks')
+        try:
+            client.table('organizadores').select('id').limit(1).execute()
+            return True
+        except Exception as e:
+            SupabaseClientPool._count('health_check_failures')
+            log_warning(f"Supabase pooled client failed health check: {str(e)}")
+            return False
+
+    @staticmethod
+    def _count(key):
+        """Increment a statistics counter"""
+        with SupabaseClientPool._stats_lock:
+            SupabaseClientPool.stats[key] += 1
+
+    @staticmethod
+    def _close_client(client):
+        """Close the HTTP session of a client, ignoring errors"""
+        if client is None:
+            return
+        try:
+            session = getattr(client.postgrest, 'session', None)
+            if session is not None:
+                session.close()
+        except Exception as e:
+            log_error("Error closing pooled Supabase client", e)
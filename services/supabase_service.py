@@ -1,15 +1,68 @@
-from supabase import create_client
-from utils.config import SUPABASE_URL, SUPABASE_KEY
+import json
+import threading
+from postgrest.types import ReturnMethod
+from services import projections
+from services.supabase_pool import SupabaseClientPool
+from utils.cache import TTLCache
+from utils.config import ORGANIZER_CACHE_SIZE, ORGANIZER_CACHE_TTL, ORGANIZER_CACHE_NEGATIVE_TTL, SUPABASE_PAYLOAD_DEBUG
+from utils.phone_utils import normalize_phone
+from utils.text_utils import RSVP_ANSWER_PATTERN
 from utils.logging_utils import log_info, log_error
 
 class SupabaseService:
     """Service for handling Supabase database operations"""
     
+    # {numero: organizador, or None if the number is not an organizer}
+    organizador_cache = TTLCache(max_size=ORGANIZER_CACHE_SIZE, ttl=ORGANIZER_CACHE_TTL)
+    
+    # {query label: {queries, rows, bytes}} when SUPABASE_PAYLOAD_DEBUG is on
+    payload_stats = {}
+    _payload_lock = threading.Lock()
+    
+    @staticmethod
+    def execute(query, label):
+        """Execute a query, measuring its payload in debug mode
+        
+        Args:
+            query: PostgREST request builder
+            label (str): Name of the query in logs and metrics
+            
+        Returns:
+            APIResponse: The response
+        """
+        response = query.execute()
+        if SUPABASE_PAYLOAD_DEBUG:
+            # Size of the decoded rows re-serialized as JSON (close to the body size)
+            size = len(json.dumps(response.data, ensure_ascii=False, default=str).encode('utf-8'))
+            rows = len(response.data) if isinstance(response.data, list) else 1
+            with SupabaseService._payload_lock:
+                stats = SupabaseService.payload_stats.setdefault(label, {'queries': 0, 'rows': 0, 'bytes': 0})
+                stats['queries'] += 1
+                stats['rows'] += rows
+                stats['bytes'] += size
+            log_info(f"Supabase {label}: {rows} rows, {size} bytes")
+        return response
+    
+    @staticmethod
+    def payload_metrics():
+        """Get payload totals per query (None unless SUPABASE_PAYLOAD_DEBUG is on)
+        
+        Returns:
+            dict: {label: {queries, rows, bytes, bytes_per_query}}
+        """
+        if not SUPABASE_PAYLOAD_DEBUG:
+            return None
+        with SupabaseService._payload_lock:
+            return {
+                label: dict(stats, bytes_per_query=round(stats['bytes'] / stats['queries']))
+                for label, stats in SupabaseService.payload_stats.items()
+            }
+    
     @staticmethod
     def init_client():
-        """Initialize and return Supabase client"""
+        """Return the pooled Supabase client for the current thread"""
         try:
-            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+            supabase = SupabaseClientPool.get_client()
             return supabase
         except Exception as e:
             log_error("Error initializing Supabase client", e)
@@ -28,7 +81,7 @@ class SupabaseService:
             # Function to verify if a table exists
             def verify_table(table_name):
                 try:
-                    response = supabase.table(table_name).select('*').limit(1).execute()
+                    response = supabase.table(table_name).select(projections.SONDA).limit(1).execute()
                     log_info(f"Table '{table_name}' exists in Supabase")
                     return True
                 except Exception as e:
@@ -58,16 +111,27 @@ class SupabaseService:
     # Organizadores operations
     @staticmethod
     def get_organizador_by_numero(numero):
-        """Get organizador by phone number"""
+        """Get organizador by phone number (read-through cache, including misses)"""
         try:
+            cached = SupabaseService.organizador_cache.get(numero, default=False)
+            if cached is None:
+                return False, "Organizador not found"
+            if cached:
+                return True, cached
+            
             supabase = SupabaseService.init_client()
             if not supabase:
                 return False, "Could not connect to Supabase"
             
-            response = supabase.table('organizadores').select('*').eq('numero', numero).execute()
+            response = SupabaseService.execute(
+                supabase.table('organizadores').select(projections.ORGANIZADOR).eq('numero', numero),
+                'organizador_by_numero'
+            )
             if len(response.data) == 0:
+                SupabaseService.organizador_cache.set(numero, None, ttl=ORGANIZER_CACHE_NEGATIVE_TTL)
                 return False, "Organizador not found"
             
+            SupabaseService.organizador_cache.set(numero, response.data[0])
             return True, response.data[0]
         except Exception as e:
             log_error(f"Error getting organizador by number", e)
@@ -82,8 +146,12 @@ class SupabaseService:
                 return False, "Could not connect to Supabase"
             
             # Check if organizador already exists
-            response = supabase.table('organizadores').select('*').eq('numero', numero).execute()
+            response = SupabaseService.execute(
+                supabase.table('organizadores').select(projections.ORGANIZADOR).eq('numero', numero),
+                'organizador_by_numero'
+            )
             if len(response.data) > 0:
+                SupabaseService.organizador_cache.set(numero, response.data[0])
                 return True, response.data[0]
             
             # Register new organizador
@@ -94,13 +162,20 @@ class SupabaseService:
             
             response = supabase.table('organizadores').insert(organizador_data).execute()
             if len(response.data) == 0:
+                SupabaseService.invalidate_organizador(numero)
                 return False, "Error registering organizador"
             
+            SupabaseService.organizador_cache.set(numero, response.data[0])
             return True, response.data[0]
         except Exception as e:
             log_error(f"Error registering organizador", e)
             return False, f"Error: {str(e)}"
 
+    @staticmethod
+    def invalidate_organizador(numero):
+        """Drop the cached organizador (or "not an organizer") entry for a number"""
+        SupabaseService.organizador_cache.delete(numero)
+
     # Eventos operations
     @staticmethod
     def create_evento(organizador_id, nombre, descripcion="", fecha=None):
@@ -136,7 +211,10 @@ class SupabaseService:
             if not supabase:
                 return False, "Could not connect to Supabase"
             
-            response = supabase.table('eventos').select('*').eq('organizador_id', organizador_id).execute()
+            response = SupabaseService.execute(
+                supabase.table('eventos').select(projections.EVENTO).eq('organizador_id', organizador_id),
+                'eventos_by_organizador'
+            )
             return True, response.data
         except Exception as e:
             log_error(f"Error getting eventos for organizador", e)
@@ -150,7 +228,11 @@ class SupabaseService:
             if not supabase:
                 return False, "Could not connect to Supabase"
             
-            response = supabase.table('eventos').select('*').eq('organizador_id', organizador_id).order('fecha_creacion', desc=True).limit(1).execute()
+            response = SupabaseService.execute(
+                supabase.table('eventos').select(projections.EVENTO)
+                .eq('organizador_id', organizador_id).order('fecha_creacion', desc=True).limit(1),
+                'active_evento'
+            )
             if len(response.data) == 0:
                 return False, "No active eventos"
             
@@ -168,10 +250,12 @@ class SupabaseService:
                 return False, "Could not connect to Supabase"
             
             # Delete invitados first
-            supabase.table('invitados').delete().eq('evento_id', evento_id).execute()
+            supabase.table('invitados').delete(returning=ReturnMethod.minimal).eq('evento_id', evento_id).execute()
             
             # Delete evento
-            supabase.table('eventos').delete().eq('id', evento_id).execute()
+            supabase.table('eventos').delete(returning=ReturnMethod.minimal).eq('id', evento_id).execute()
+            
+            GuestDirectory.invalidate_event(evento_id)
             
             return True, "Evento deleted successfully"
         except Exception as e:
@@ -180,19 +264,69 @@ class SupabaseService:
 
     # Invitados operations
     @staticmethod
-    def get_invitados_by_evento(evento_id):
-        """Get all invitados for an evento"""
+    def get_invitados_by_evento(evento_id, columns=projections.INVITADO):
+        """Get all invitados for an evento
+        
+        Prefer iter_invitados_by_evento for large events; this collects every
+        page into one list.
+        """
         try:
-            supabase = SupabaseService.init_client()
-            if not supabase:
-                return False, "Could not connect to Supabase"
-            
-            response = supabase.table('invitados').select('*').eq('evento_id', evento_id).execute()
-            return True, response.data
+            invitados = []
+            for pagina in SupabaseService.iter_invitados_by_evento(evento_id, columns=columns):
+                invitados.extend(pagina)
+            return True, invitados
         except Exception as e:
             log_error(f"Error getting invitados for evento", e)
             return False, f"Error: {str(e)}"
     
+    @staticmethod
+    def iter_invitados_by_evento(evento_id, page_size=1000, columns=projections.INVITADO, pending_only=False):
+        """Yield the invitados of an evento page by page
+        
+        PostgREST caps responses (1000 rows on Supabase by default), so large
+        rosters must be read in pages. Pages are keyset-paginated on id
+        (id > last id seen), which stays cheap deep into the roster and does
+        not skip or repeat rows when guests are added or removed meanwhile.
+        
+        Args:
+            evento_id (int): ID of the evento
+            page_size (int): Rows per request (at most the PostgREST max-rows setting)
+            columns (str): Columns to select (id is always included)
+            pending_only (bool): Only invitados that have not answered sí or no (see utils.text_utils.has_rsvp)
+            
+        Yields:
+            list: Page of invitados
+        """
+        supabase = SupabaseService.init_client()
+        if not supabase:
+            raise ConnectionError("Could not connect to Supabase")
+        
+        if columns != '*' and 'id' not in [col.strip() for col in columns.split(',')]:
+            columns = f"id,{columns}"
+        
+        filtros = [lambda query: query]
+        if pending_only:
+            # postgrest 0.13 has no or_(), so NULL confirmaciones and values
+            # that are not an answer are read in two keyset passes
+            filtros = [
+                lambda query: query.is_('confirmacion', 'null'),
+                lambda query: query.not_.filter('confirmacion', 'imatch', RSVP_ANSWER_PATTERN)
+            ]
+        
+        for filtro in filtros:
+            ultimo_id = None
+            while True:
+                query = filtro(supabase.table('invitados').select(columns).eq('evento_id', evento_id))
+                if ultimo_id is not None:
+                    query = query.gt('id', ultimo_id)
+                response = SupabaseService.execute(query.order('id').limit(page_size), f"invitados_page({columns})")
+                
+                if response.data:
+                    yield response.data
+                    ultimo_id = response.data[-1]['id']
+                if len(response.data) < page_size:
+                    break
+    
     @staticmethod
     def get_invitado_by_numero(evento_id, numero):
         """Get invitado by phone number for an evento"""
@@ -201,7 +335,11 @@ class SupabaseService:
             if not supabase:
                 return False, "Could not connect to Supabase"
             
-            response = supabase.table('invitados').select('*').eq('evento_id', evento_id).eq('numero', numero).execute()
+            response = SupabaseService.execute(
+                supabase.table('invitados').select(projections.INVITADO)
+                .eq('evento_id', evento_id).eq('numero', normalize_phone(numero)),
+                'invitado_by_numero'
+            )
             if len(response.data) == 0:
                 return False, "Invitado not found in this evento"
             
@@ -212,7 +350,7 @@ class SupabaseService:
     
     @staticmethod
     def update_invitado_response(invitado_id, confirmacion=None, acompanante=None, restricciones=None):
-        """Update an invitado's response"""
+        """Update an invitado's response (evento_contadores is adjusted by its trigger)"""
         try:
             supabase = SupabaseService.init_client()
             if not supabase:
@@ -230,7 +368,7 @@ class SupabaseService:
             if not update_data:
                 return True, "No changes to update"
             
-            response = supabase.table('invitados').update(update_data).eq('id', invitado_id).execute()
+            supabase.table('invitados').update(update_data, returning=ReturnMethod.minimal).eq('id', invitado_id).execute()
             return True, "Response updated successfully"
         except Exception as e:
             log_error(f"Error updating invitado response", e)
@@ -238,21 +376,25 @@ class SupabaseService:
     
     @staticmethod
     def import_invitados_to_evento(evento_id, invitados):
-        """Import invitados to an evento"""
-        try:
-            supabase = SupabaseService.init_client()
-            if not supabase:
-                return False, "Could not connect to Supabase"
-            
-            # Delete existing invitados
-            supabase.table('invitados').delete().eq('evento_id', evento_id).execute()
-            
-            # Insert new invitados
-            response = supabase.table('invitados').insert(invitados).execute()
+        """Import invitados to an evento, diffing against the stored roster
+        
+        Args:
+            evento_id (int): ID of the evento
+            invitados (list): Guest dicts
             
-            return True, f"Successfully imported {len(invitados)} invitados"
+        Returns:
+            tuple: (success, summary dict or error_message)
+        """
+        importacion = None
+        try:
+            importacion = GuestImport(evento_id)
+            importacion.start()
+            importacion.add(invitados)
+            return True, importacion.finish()
         except Exception as e:
             log_error(f"Error importing invitados to evento", e)
+            if importacion is not None and importacion.applied():
+                return False, f"Error: {str(e)} (partially applied: {importacion.stats})"
             return False, f"Error: {str(e)}"
 
     @staticmethod
@@ -270,7 +412,10 @@ class SupabaseService:
             if not supabase:
                 return False, "Could not connect to Supabase"
             
-            response = supabase.table('eventos').select('*').eq('id', evento_id).execute()
+            response = SupabaseService.execute(
+                supabase.table('eventos').select(projections.EVENTO).eq('id', evento_id),
+                'evento_by_id'
+            )
             if len(response.data) == 0:
                 return False, "Evento not found"
             
@@ -280,4 +425,6 @@ class SupabaseService:
             return False, f"Error: {str(e)}"
 
 # Import this at the end to avoid circular imports
-from utils.logging_utils import log_warning 
\ No newline at end of file
+from utils.logging_utils import log_warning
+from services.guest_directory import GuestDirectory
+from services.guest_import import GuestImport 
\ No newline at end of file
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe bounded LRU cache with optional per-entry expiration"""
+
+    def __init__(self, max_size=1024, ttl=None):
+        """Create the cache
+
+        Args:
+            max_size (int): Maximum number of entries (least recently used are evicted)
+            ttl (float, optional): Seconds an entry stays valid (None = no expiration)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # {key: (expires_at, value)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Get a value, counting the lookup as a hit or a miss
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl (float, optional): Override the default expiration for this entry
+        """
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def add(self, key, value=True, ttl=None):
+        """Store a value only if the key is not already cached
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl (float, optional): Override the default expiration for this entry
+
+        Returns:
+            bool: True if the key was added, False if it was already present
+        """
+        with self._lock:
+            if self._get(key) is not _MISSING:
+                self.hits += 1
+                return False
+            self.misses += 1
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        """Remove a key if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._get(key) is not _MISSING
+
+    def stats(self):
+        """Get usage statistics
+
+        Returns:
+            dict: Size, hits, misses, hit rate and evictions
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _set(self, key, value, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
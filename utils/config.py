@@ -7,9 +7,33 @@ load_dotenv()
 # App configuration
 EXCEL_FILE = os.getenv("EXCEL_FILE", "invitados.xlsx")
 ADMIN_NUMBER = os.getenv("ADMIN_NUMBER")  # Admin phone number without "+"
+# Phone numbers written without a country code get this prefix when they have
+# at most PHONE_NATIONAL_MAX_DIGITS digits (Chilean mobiles: 9 1234 5678)
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "56")
+PHONE_NATIONAL_MAX_DIGITS = int(os.getenv("PHONE_NATIONAL_MAX_DIGITS", "9"))
 
 # OpenAI configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Shared client settings and the cap on concurrent LLM requests
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))  # Seconds per request
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "30"))  # Seconds waiting for a slot
+# Minimum confidence for the local RSVP classifier to answer without GPT (above 1 disables it)
+RSVP_CLASSIFIER_THRESHOLD = float(os.getenv("RSVP_CLASSIFIER_THRESHOLD", "0.85"))
+# Cache of GPT analyses keyed on the normalized message (empty DB path = memory only)
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "5000"))
+ANALYSIS_CACHE_DB = os.getenv("ANALYSIS_CACHE_DB", "")
+# Admin chat memory: turns kept per organizer, prompt token budget and idle eviction
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", "20"))
+CONVERSATION_MAX_TOKENS = int(os.getenv("CONVERSATION_MAX_TOKENS", "1500"))
+CONVERSATION_IDLE_TTL = int(os.getenv("CONVERSATION_IDLE_TTL", "3600"))  # Seconds
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "5000"))
+# Micro-batching of GPT analyses during RSVP bursts
+OPENAI_BATCH_ENABLED = os.getenv("OPENAI_BATCH_ENABLED", "false").lower() == "true"
+OPENAI_BATCH_MAX_ITEMS = int(os.getenv("OPENAI_BATCH_MAX_ITEMS", "20"))
+OPENAI_BATCH_MAX_WAIT_MS = int(os.getenv("OPENAI_BATCH_MAX_WAIT_MS", "300"))
+OPENAI_BATCH_RESULT_TIMEOUT = float(os.getenv("OPENAI_BATCH_RESULT_TIMEOUT", "60"))  # Seconds
 
 # Twilio credentials
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
@@ -18,11 +42,68 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 # Supabase credentials
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "4"))
+SUPABASE_POOL_HEALTHCHECK_INTERVAL = int(os.getenv("SUPABASE_POOL_HEALTHCHECK_INTERVAL", "60"))  # Seconds
+# Organizer lookups by number ("not an organizer" results expire sooner)
+ORGANIZER_CACHE_SIZE = int(os.getenv("ORGANIZER_CACHE_SIZE", "10000"))
+ORGANIZER_CACHE_TTL = int(os.getenv("ORGANIZER_CACHE_TTL", "300"))  # Seconds
+ORGANIZER_CACHE_NEGATIVE_TTL = int(os.getenv("ORGANIZER_CACHE_NEGATIVE_TTL", "60"))  # Seconds
+
+# Webhook ingestion configuration (acknowledge first, process on a worker queue)
+WEBHOOK_ASYNC_INGESTION = os.getenv("WEBHOOK_ASYNC_INGESTION", "false").lower() == "true"
+INGESTION_QUEUE_DB = os.getenv("INGESTION_QUEUE_DB", "ingestion_queue.db")
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "4"))
+INGESTION_MAX_DEPTH = int(os.getenv("INGESTION_MAX_DEPTH", "10000"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+
+# Inbound message idempotency
+DEDUPE_TTL_SECONDS = int(os.getenv("DEDUPE_TTL_SECONDS", "900"))
+DEDUPE_MAX_ENTRIES = int(os.getenv("DEDUPE_MAX_ENTRIES", "50000"))
+
+# In-process guest directory (phone number -> invitations)
+GUEST_DIRECTORY_SIZE = int(os.getenv("GUEST_DIRECTORY_SIZE", "50000"))
+GUEST_DIRECTORY_TTL = int(os.getenv("GUEST_DIRECTORY_TTL", "600"))  # Seconds
+GUEST_DIRECTORY_NEGATIVE_TTL = int(os.getenv("GUEST_DIRECTORY_NEGATIVE_TTL", "60"))  # Seconds for non-guests
+
+# Log the JSON payload size of every Supabase read and expose per-query totals
+SUPABASE_PAYLOAD_DEBUG = os.getenv("SUPABASE_PAYLOAD_DEBUG", "false").lower() == "true"
+
+# Guest list import (rows per insert/upsert/delete request)
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+# Rendered Excel exports, reused while the event's roster version is unchanged
+EXPORT_CACHE_SIZE = int(os.getenv("EXPORT_CACHE_SIZE", "100"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EXPORT_CACHE_TTL = int(os.getenv("EXPORT_CACHE_TTL", "3600"))  # Seconds
+
+# Bulk invitation sending: workers, per-provider rate (messages per second),
+# attempts per recipient, recipients between progress messages and messages
+# per /send-batch request to the WhatsApp Web JS bridge (1 = one request each)
+DISPATCH_CONCURRENCY = int(os.getenv("DISPATCH_CONCURRENCY", "4"))
+TWILIO_SEND_RATE = float(os.getenv("TWILIO_SEND_RATE", "10"))
+WHATSAPP_WEB_SEND_RATE = float(os.getenv("WHATSAPP_WEB_SEND_RATE", "2"))
+DISPATCH_MAX_ATTEMPTS = int(os.getenv("DISPATCH_MAX_ATTEMPTS", "4"))
+DISPATCH_PROGRESS_EVERY = int(os.getenv("DISPATCH_PROGRESS_EVERY", "100"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "50"))
+
+# Campaign ledger: per-recipient send state that survives restarts, written in
+# batches of CAMPAIGN_FLUSH_SIZE or every CAMPAIGN_FLUSH_INTERVAL seconds
+CAMPAIGN_LEDGER_DB = os.getenv("CAMPAIGN_LEDGER_DB", "campaign_ledger.db")
+CAMPAIGN_LEDGER_SUPABASE = os.getenv("CAMPAIGN_LEDGER_SUPABASE", "false").lower() == "true"
+CAMPAIGN_FLUSH_SIZE = int(os.getenv("CAMPAIGN_FLUSH_SIZE", "50"))
+CAMPAIGN_FLUSH_INTERVAL = float(os.getenv("CAMPAIGN_FLUSH_INTERVAL", "1"))
 
 # WhatsApp Web JS configuration
 USE_WHATSAPP_WEB = os.getenv("USE_WHATSAPP_WEB", "false").lower() == "true"
 WHATSAPP_SERVER_PORT = os.getenv("WHATSAPP_SERVER_PORT", "3000")
 WHATSAPP_SERVER_URL = f"http://localhost:{WHATSAPP_SERVER_PORT}"
 
+# HTTP connections to the WhatsApp Web JS bridge and Twilio: pooled keep-alive
+# connections, timeouts in seconds and retries for requests that never connected
+WHATSAPP_HTTP_POOL_SIZE = int(os.getenv("WHATSAPP_HTTP_POOL_SIZE", "10"))
+WHATSAPP_HTTP_CONNECT_TIMEOUT = float(os.getenv("WHATSAPP_HTTP_CONNECT_TIMEOUT", "3"))
+WHATSAPP_HTTP_READ_TIMEOUT = float(os.getenv("WHATSAPP_HTTP_READ_TIMEOUT", "30"))
+WHATSAPP_HTTP_RETRIES = int(os.getenv("WHATSAPP_HTTP_RETRIES", "3"))
+
 # Google Drive configuration
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID") 
\ No newline at end of file
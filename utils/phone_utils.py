@@ -0,0 +1,70 @@
+import re
+import numpy as np
+import pandas as pd
+from utils.config import DEFAULT_COUNTRY_CODE, PHONE_NATIONAL_MAX_DIGITS
+
+_NON_DIGIT = re.compile(r"\D+")
+
+def normalize_phone(numero, default_country_code=DEFAULT_COUNTRY_CODE):
+    """Normalize a phone number to its canonical key: E.164 digits without "+"
+
+    Handles provider prefixes, Excel artifacts and national numbers:
+    "whatsapp:+56 9 1234-5678" -> "56912345678", 56912345678.0 -> "56912345678",
+    "9 1234 5678" -> "56912345678" (with default country code 56).
+
+    Args:
+        numero (str or number): Phone number as received or stored
+        default_country_code (str): Prefix for numbers written without one
+
+    Returns:
+        str: Canonical digits ("" if there are none, they are all zeros or the value is signed)
+    """
+    if numero is None or (isinstance(numero, float) and numero != numero):
+        return ""
+    if isinstance(numero, (int, float)) and numero < 0:
+        return ""
+    if isinstance(numero, float) and numero.is_integer():
+        numero = int(numero)
+    texto = str(numero).strip().replace("whatsapp:", "")
+    texto = texto.split("@", 1)[0]  # WhatsApp Web JS ids: 569...@c.us
+    if texto.endswith(".0"):
+        texto = texto[:-2]
+
+    digits = _NON_DIGIT.sub("", texto)
+    if texto.startswith("-") or not digits.lstrip("0"):
+        # "-5", "0", "000": not a phone number, and not a key to import under
+        return ""
+    if texto.startswith("00"):
+        return digits[2:]
+    if texto.startswith("+"):
+        return digits
+    if digits and default_country_code and len(digits) <= PHONE_NATIONAL_MAX_DIGITS:
+        return default_country_code + digits.lstrip("0")
+    return digits
+
+def normalize_phone_series(serie, default_country_code=DEFAULT_COUNTRY_CODE):
+    """normalize_phone for a whole column
+
+    Numeric columns (what Excel produces for phone numbers) are normalized
+    with array arithmetic; text columns go through normalize_phone once per
+    value, which is faster than chaining pandas string methods.
+
+    Args:
+        serie (Series): Phone numbers (text, floats or NaN)
+        default_country_code (str): Prefix for numbers written without one
+
+    Returns:
+        Series: Canonical digits ("" where there are none)
+    """
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        numeros = serie.to_numpy(dtype='float64', na_value=np.nan)
+        validos = (numeros > 0) & (numeros % 1 == 0)
+        if validos.sum() == serie.notna().sum():
+            enteros = np.where(validos, numeros, 1).astype(np.int64)
+            if default_country_code:
+                nacional = validos & (enteros < 10 ** PHONE_NATIONAL_MAX_DIGITS)
+                longitud = np.floor(np.log10(enteros)).astype(np.int64) + 1
+                enteros = np.where(nacional, int(default_country_code) * 10 ** longitud + enteros, enteros)
+            return pd.Series(enteros, index=serie.index).astype(str).where(validos, '')
+    return pd.Series([normalize_phone(valor, default_country_code) for valor in serie.tolist()],
+                     index=serie.index, dtype=object)
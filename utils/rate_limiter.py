@@ -0,0 +1,89 @@
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket with additive-increase / multiplicative-decrease rate
+
+    Tokens refill continuously at `rate` per second up to `capacity`. When
+    the provider pushes back (HTTP 429/503) slow_down() cuts the rate, and
+    every success adds back a fraction of the configured rate, so senders
+    settle just under what the provider accepts.
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=None):
+        """Create the bucket
+
+        Args:
+            rate (float): Tokens per second (also the ceiling for speed_up)
+            capacity (float, optional): Burst size (defaults to one second of tokens)
+            min_rate (float, optional): Floor for slow_down (defaults to rate / 20)
+        """
+        self.max_rate = max(float(rate), 0.001)
+        self.rate = self.max_rate
+        self.min_rate = min_rate if min_rate is not None else self.max_rate / 20
+        self.capacity = capacity if capacity is not None else max(1.0, self.max_rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.slowdowns = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting for it if necessary
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait (None = forever)
+
+        Returns:
+            bool: True if a token was taken
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.waited_seconds += time.monotonic() - start
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def slow_down(self, factor=0.5):
+        """Cut the rate after the provider throttled a request"""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * factor)
+            self._tokens = min(self._tokens, 0)
+            self.slowdowns += 1
+
+    def speed_up(self):
+        """Recover part of the configured rate after a successful request"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def stats(self):
+        """Get the current rate and counters
+
+        Returns:
+            dict: Rate, configured rate, slowdowns and seconds spent waiting
+        """
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'slowdowns': self.slowdowns,
+                'waited_seconds': round(self.waited_seconds, 3)
+            }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
@@ -0,0 +1,42 @@
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^a-z0-9ñ]+")
+
+def normalize_text(text):
+    """Normalize free text for matching and cache keys
+
+    Casefolds, removes accents (keeping ñ), drops emoji and punctuation and
+    collapses whitespace: "¡Sí, ahí estaré! 🎉" -> "si ahi estare".
+
+    Args:
+        text (str): Text to normalize
+
+    Returns:
+        str: Normalized text
+    """
+    if not text:
+        return ""
+    text = text.casefold().replace("ñ", "\0")
+    text = "".join(
+        c for c in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(c)
+    ).replace("\0", "ñ")
+    return _NON_WORD.sub(" ", text).strip()
+
+# A guest has responded when confirmacion is "sí" or "no" (any case, padded or
+# not); anything else, including NULL, blank or free text, is still pending.
+# RSVP_ANSWER_PATTERN is the same rule as a Postgres regex for PostgREST imatch.
+RSVP_ANSWERS = ('sí', 'no')
+RSVP_ANSWER_PATTERN = r'^\s*(sí|no)\s*$'
+
+def has_rsvp(confirmacion):
+    """Whether a stored confirmacion counts as an answer
+
+    Args:
+        confirmacion (str): Stored value (may be None)
+
+    Returns:
+        bool: True for "sí" or "no"
+    """
+    return (confirmacion or '').strip().lower() in RSVP_ANSWERS
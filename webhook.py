@@ -1,14 +1,19 @@
 from flask import Flask, request, jsonify, render_template, send_from_directory
-from openai import OpenAI
 import pandas as pd
 import json
 import os
 from datetime import datetime
 import requests
-from send_message import enviar_invitaciones_masivas
+from send_message import enviar_invitaciones_evento
 from twilio.rest import Client
-from supabase import create_client
 from dotenv import load_dotenv
+from services.openai_service import OpenAIService
+from services.conversation_store import ConversationStore
+from services.excel_service import ExcelService
+from services.supabase_service import SupabaseService
+from adapters.bridge_client import BridgeClient
+from utils.phone_utils import normalize_phone
+from utils.text_utils import has_rsvp
 
 # Cargar variables de entorno
 load_dotenv()
@@ -28,10 +33,6 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 # Configuración de WhatsApp Web JS
 USE_WHATSAPP_WEB = os.getenv("USE_WHATSAPP_WEB", "false").lower() == "true"
-WHATSAPP_SERVER_URL = f"http://localhost:{os.getenv('WHATSAPP_SERVER_PORT', '3000')}"
-
-# Configurar OpenAI
-client = OpenAI(api_key=OPENAI_API_KEY)
 
 # Estructura para almacenar sesiones activas de organizadores
 # {numero_telefono: {evento_activo_id: id, context: {...}}}
@@ -136,9 +137,9 @@ class WhatsAppAdapter:
                 clean_number = number.replace("whatsapp:+", "").replace("+", "")
                 
                 # Usar WhatsApp Web JS
-                response = requests.post(
-                    f"{WHATSAPP_SERVER_URL}/send-message",
-                    json={"number": clean_number, "message": message}
+                response = BridgeClient.shared().post(
+                    "/send-message",
+                    {"number": clean_number, "message": message}
                 )
                 if response.status_code == 200:
                     print(f"Mensaje enviado a {clean_number} usando WhatsApp Web JS")
@@ -169,9 +170,9 @@ class WhatsAppAdapter:
                 clean_number = number.replace("whatsapp:+", "").replace("+", "")
                 
                 # Usar WhatsApp Web JS
-                response = requests.post(
-                    f"{WHATSAPP_SERVER_URL}/send-file",
-                    json={"number": clean_number, "filePath": file_path, "caption": caption or ""}
+                response = BridgeClient.shared().post(
+                    "/send-file",
+                    {"number": clean_number, "filePath": file_path, "caption": caption or ""}
                 )
                 if response.status_code == 200:
                     print(f"Archivo enviado a {clean_number} usando WhatsApp Web JS")
@@ -193,19 +194,13 @@ class WhatsAppAdapter:
 # Inicializar el adaptador de WhatsApp
 whatsapp = WhatsAppAdapter()
 
-# Configurar OpenAI y Twilio
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Configurar Twilio (OpenAI usa el cliente compartido de OpenAIService)
 twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
 # Inicializar cliente de Supabase
 def init_supabase():
-    """Inicializa y devuelve el cliente de Supabase"""
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        return supabase
-    except Exception as e:
-        print(f"Error al inicializar Supabase: {str(e)}")
-        return None
+    """Devuelve el cliente de Supabase del pool compartido (None si no hay conexión)"""
+    return SupabaseService.init_client()
 
 # Funciones para gestionar invitados con Supabase
 def obtener_invitados_supabase():
@@ -284,7 +279,7 @@ def verificar_todas_respuestas_supabase():
         
         # Contar respondidos
         for invitado in invitados:
-            if invitado.get('confirmacion') in ['Sí', 'No', 'sí', 'no']:
+            if has_rsvp(invitado.get('confirmacion')):
                 respondidos += 1
         
         return respondidos == total, respondidos, total
@@ -292,63 +287,6 @@ def verificar_todas_respuestas_supabase():
         print(f"Error al verificar respuestas: {str(e)}")
         return False, 0, 0
 
-def importar_excel_a_supabase(file_path):
-    """Importa datos de Excel a Supabase"""
-    try:
-        # Leer Excel
-        df = pd.read_excel(file_path)
-        
-        # Limpiar nombres de columnas
-        df.columns = df.columns.str.strip()
-        
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            return False, "No se pudo conectar a Supabase"
-        
-        # Verificar columnas requeridas
-        required_columns = ["Nombre", "Numero"]
-        current_columns = [col.strip() for col in df.columns]
-        required_columns_clean = [col.strip() for col in required_columns]
-        
-        if not all(col in current_columns for col in required_columns_clean):
-            missing_cols = [col for col in required_columns_clean if col not in current_columns]
-            return False, f"El Excel debe contener las columnas obligatorias: {', '.join(missing_cols)}"
-            
-        # Convertir DataFrame a lista de diccionarios con manejo adecuado de valores nulos
-        invitados_formateados = []
-        
-        for _, row in df.iterrows():
-            # Crear diccionario con valores convertidos a string o vacíos si son nulos
-            invitado_formateado = {
-                'nombre': str(row.get('Nombre', '')) if not pd.isna(row.get('Nombre', '')) else '',
-                'numero': str(row.get('Numero', '')) if not pd.isna(row.get('Numero', '')) else '',
-                'confirmacion': str(row.get('Confirmacion', '')) if not pd.isna(row.get('Confirmacion', '')) else '',
-                'acompanante': str(row.get('+1', '')) if not pd.isna(row.get('+1', '')) else '',
-                'restricciones_alimenticias': str(row.get('Restricciones alimenticias', '')) if not pd.isna(row.get('Restricciones alimenticias', '')) else ''
-            }
-            
-            # Validar que el número no esté vacío
-            if invitado_formateado['nombre'] and invitado_formateado['numero']:
-                invitados_formateados.append(invitado_formateado)
-        
-        if not invitados_formateados:
-            return False, "No se encontraron datos válidos para importar"
-            
-        # Eliminar datos existentes (opcional)
-        supabase.table('invitados').delete().neq('id', 0).execute()
-        
-        # Insertar nuevos datos
-        response = supabase.table('invitados').insert(invitados_formateados).execute()
-        
-        print(f"DEBUG: Datos importados a Supabase: {len(invitados_formateados)} invitados")
-        return True, f"Excel importado con éxito. {len(invitados_formateados)} invitados registrados en Supabase."
-    except Exception as e:
-        print(f"ERROR detallado en importar_excel_a_supabase: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return False, f"Error al importar Excel a Supabase: {str(e)}"
-
 def exportar_supabase_a_excel():
     """Exporta datos de Supabase a Excel"""
     try:
@@ -401,9 +339,8 @@ def obtener_reporte_supabase():
     except Exception as e:
         return f"Error al generar reporte: {str(e)}"
 
-# Historial de conversaciones para el administrador
-admin_conversation_history = [
-    {"role": "system", "content": """Eres un asistente inteligente para gestionar invitaciones a través de WhatsApp. 
+# Historial de conversaciones por organizador (acotado y con prompt de sistema fijo)
+admin_conversations = ConversationStore("""Eres un asistente inteligente para gestionar invitaciones a través de WhatsApp. 
 Tu trabajo es ayudar al administrador a utilizar el sistema de gestión de invitaciones.
 
 Información importante:
@@ -412,8 +349,7 @@ Información importante:
 3. El sistema procesa automáticamente respuestas de los invitados usando GPT
 
 Responde de manera concisa y amigable. Si el usuario es nuevo, explícale brevemente cómo funciona el sistema.
-"""}
-]
+""")
 
 def backup_excel():
     """Crear una copia de respaldo del Excel"""
@@ -495,7 +431,7 @@ Responde SOLO con este JSON exacto:
 }}"""
 
     try:
-        response = client.chat.completions.create(
+        response = OpenAIService.create_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "Eres un asistente experto en interpretar respuestas a invitaciones."},
@@ -512,21 +448,18 @@ Responde SOLO con este JSON exacto:
         print(f"Error al analizar con GPT: {str(e)}")
         return None
 
-def chat_con_gpt(mensaje, conversation_history):
+def chat_con_gpt(mensaje, conversations, numero):
     """Función para mantener una conversación con GPT"""
     print(f"Iniciando chat con GPT. Mensaje: '{mensaje}'")
     
-    # Agregar el mensaje del usuario al historial
-    conversation_history.append({"role": "user", "content": mensaje})
-    
     try:
-        # Limitar el historial para evitar tokens excesivos (últimos 10 mensajes)
-        limited_history = conversation_history[-10:]
+        # Prompt de sistema más los mensajes recientes que caben en el presupuesto de tokens
+        limited_history = conversations.build_prompt(numero, mensaje)
         print(f"Historia de conversación (últimos {len(limited_history)} mensajes)")
         
         # Realizar la llamada a GPT
         print("Llamando a la API de OpenAI...")
-        response = client.chat.completions.create(
+        response = OpenAIService.create_completion(
             model="gpt-3.5-turbo",
             messages=limited_history,
             temperature=0.7,
@@ -538,7 +471,7 @@ def chat_con_gpt(mensaje, conversation_history):
         print(f"Respuesta recibida de GPT: '{respuesta}'")
         
         # Agregar la respuesta al historial
-        conversation_history.append({"role": "assistant", "content": respuesta})
+        conversations.add_reply(numero, respuesta)
         
         return respuesta
     except Exception as e:
@@ -575,13 +508,11 @@ def verificar_todas_respuestas():
             
         total_invitados = len(invitados)
         # Cambiar 'respuesta' por 'confirmacion'
-        respondieron = [i for i in invitados if i.get('confirmacion') is not None 
-                        and i.get('confirmacion').strip() != '']
+        respondieron = [i for i in invitados if has_rsvp(i.get('confirmacion'))]
         num_respuestas = len(respondieron)
         
         # Cambiar 'respuesta' por 'confirmacion'
-        faltantes = [i['nombre'] for i in invitados if i.get('confirmacion') is None 
-                    or i.get('confirmacion').strip() == '']
+        faltantes = [i['nombre'] for i in invitados if not has_rsvp(i.get('confirmacion'))]
         
         todas_respondieron = (num_respuestas == total_invitados)
         
@@ -1125,23 +1056,9 @@ Usa !crear para crear un nuevo evento o !eventos para ver tus eventos existentes
         
         elif comando == "!enviar":
             try:
-                # Exportar datos para envío
-                output_file = f"temp_evento_{evento_activo_id}.xlsx"
-                success, file_path = exportar_evento_a_excel(evento_activo_id, output_file)
-                if not success:
-                    return f"❌ Error al preparar datos: {file_path}"
-                    
-                # Enviar invitaciones
-                from send_message import enviar_invitaciones_masivas
-                success, result = enviar_invitaciones_masivas(file_path)
+                # Enviar en segundo plano a los pendientes leídos de la base (progreso y reporte llegan por WhatsApp)
+                success, result = enviar_invitaciones_evento(evento_activo_id, numero)
                 
-                # Eliminar archivo temporal
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except:
-                    pass
-                    
                 if success:
                     return result
                 else:
@@ -1151,19 +1068,17 @@ Usa !crear para crear un nuevo evento o !eventos para ver tus eventos existentes
         
         elif comando == "!excel":
             try:
-                # Exportar datos
-                output_file = f"evento_{evento_activo_id}.xlsx"
-                success, file_path = exportar_evento_a_excel(evento_activo_id, output_file)
+                # Exportar datos a un archivo temporal único (no se pisan exportaciones simultáneas)
+                success, file_path = ExcelService.export_evento_to_excel(evento_activo_id)
                 if not success:
                     return f"❌ Error al generar Excel: {file_path}"
-                
-                # Comprobar si el archivo existe
-                if not os.path.exists(file_path):
-                    return "❌ No hay datos disponibles para exportar"
                     
                 # Enviar mensaje y archivo
-                whatsapp.send_message(numero, "💾 Preparando el archivo Excel actualizado...")
-                whatsapp.send_file(numero, os.path.abspath(file_path), "📊 Archivo Excel con los datos actualizados de tu evento")
+                try:
+                    whatsapp.send_message(numero, "💾 Preparando el archivo Excel actualizado...")
+                    whatsapp.send_file(numero, file_path, "📊 Archivo Excel con los datos actualizados de tu evento")
+                finally:
+                    os.remove(file_path)
                 return None  # Ya enviamos el mensaje, no necesitamos devolver otro
             except Exception as e:
                 return f"❌ Error al preparar el Excel: {str(e)}"
@@ -1174,20 +1089,18 @@ Usa !crear para crear un nuevo evento o !eventos para ver tus eventos existentes
 @app.route("/webhook", methods=["POST"])
 def recibir_respuesta():
     """Procesa mensajes recibidos desde WhatsApp"""
-    global admin_conversation_history
-    
     # Diferentes formatos según el proveedor
     if request.is_json and USE_WHATSAPP_WEB:
         # Formato de WhatsApp Web JS
         data = request.json
-        numero = data.get("From", "").replace("@c.us", "")
+        numero = normalize_phone(data.get("From", ""))
         mensaje = data.get("Body", "").strip()
         media_url = None  # Los medios se manejan en el servidor Node.js
         print(f"Mensaje recibido de WhatsApp Web JS: De={numero}, Mensaje={mensaje}")
     else:
         # Formato de Twilio
         data = request.form
-        numero = data.get("From", "").replace("whatsapp:", "").replace("+", "")
+        numero = normalize_phone(data.get("From", ""))
         mensaje = data.get("Body", "").strip()
         media_url = data.get("MediaUrl0", "")
         print(f"Mensaje recibido de Twilio: De={numero}, Mensaje={mensaje}")
@@ -1328,7 +1241,7 @@ def recibir_respuesta():
             return "Excel procesado", 200
             
         # Conversar con GPT para otros mensajes
-        respuesta = chat_con_gpt(mensaje, admin_conversation_history)
+        respuesta = chat_con_gpt(mensaje, admin_conversations, numero)
         whatsapp.send_message(numero, respuesta)
         
         return "Mensaje procesado", 200
@@ -1428,10 +1341,12 @@ Te envío el archivo Excel actualizado con todas las respuestas."""
                             whatsapp.send_message(organizador_numero, mensaje_notificacion)
                             
                             # Exportar datos actualizados y enviar Excel
-                            output_file = f"evento_{evento_id}.xlsx"
-                            success, file_path = exportar_evento_a_excel(evento_id, output_file)
+                            success, file_path = ExcelService.export_evento_to_excel(evento_id)
                             if success:
-                                whatsapp.send_file(organizador_numero, os.path.abspath(file_path), "📊 Archivo Excel con todas las respuestas")
+                                try:
+                                    whatsapp.send_file(organizador_numero, file_path, "📊 Archivo Excel con todas las respuestas")
+                                finally:
+                                    os.remove(file_path)
                                 print(f"Excel enviado al organizador ({organizador_numero}) con todas las respuestas")
                 
                 # Enviar confirmación al invitado 
@@ -1472,7 +1387,7 @@ def process_received_excel():
     """Procesa un archivo Excel recibido a través de WhatsApp Web JS"""
     try:
         data = request.json
-        numero = data.get("from", "").replace("@c.us", "")
+        numero = normalize_phone(data.get("from", ""))
         
         # Verificar si existe el archivo invitados.xlsx
         if not os.path.exists(EXCEL_FILE):
@@ -1482,14 +1397,29 @@ def process_received_excel():
             }), 400
             
         # Verificar si es el organizador
-        if numero != ADMIN_NUMBER:
+        if numero != normalize_phone(ADMIN_NUMBER):
             return jsonify({
                 "status": "error",
                 "message": "Solo el organizador puede enviar archivos Excel"
             }), 403
             
-        # Importar Excel a Supabase
-        success, message = importar_excel_a_supabase(EXCEL_FILE)
+        # Importar Excel al evento activo del organizador (nunca a toda la tabla)
+        evento_activo_id = sesiones_organizadores.get(numero, {}).get('evento_activo_id')
+        if not evento_activo_id:
+            success, organizador = obtener_organizador_por_numero(numero)
+            if success:
+                success, evento = obtener_evento_activo(organizador['id'])
+                if success:
+                    evento_activo_id = evento['id']
+                    sesiones_organizadores.setdefault(numero, {})['evento_activo_id'] = evento_activo_id
+        if not evento_activo_id:
+            whatsapp.send_message(numero, "❌ No tienes un evento activo. Primero crea un evento usando !crear")
+            return jsonify({
+                "status": "error",
+                "message": "No hay evento activo"
+            }), 400
+        
+        success, message = importar_excel_a_evento(EXCEL_FILE, evento_activo_id)
         
         # Notificar al organizador
         respuesta = f"✅ {message}" if success else f"❌ {message}"
@@ -1650,15 +1580,10 @@ def obtener_evento_activo(organizador_id):
         return False, f"Error al obtener evento activo: {str(e)}"
 
 # Funciones para gestionar invitados con la nueva estructura
-def obtener_invitados_evento(evento_id):
-    """Obtiene todos los invitados de un evento específico"""
+def obtener_invitados_evento(evento_id, columns='*'):
+    """Obtiene todos los invitados de un evento específico (paginado, sin el tope de PostgREST)"""
     try:
-        supabase = init_supabase()
-        if not supabase:
-            return False, "No se pudo conectar a Supabase"
-        
-        response = supabase.table('invitados').select('*').eq('evento_id', evento_id).execute()
-        return True, response.data
+        return SupabaseService.get_invitados_by_evento(evento_id, columns)
     except Exception as e:
         return False, f"Error al obtener invitados: {str(e)}"
 
@@ -1711,22 +1636,21 @@ def verificar_todas_respuestas_evento(evento_id):
         if not supabase:
             return False, 0, 0, []
         
-        # Obtener todos los invitados del evento
-        response = supabase.table('invitados').select('*').eq('evento_id', evento_id).execute()
-        invitados = response.data
+        # Obtener todos los invitados del evento (paginado)
+        success, invitados = obtener_invitados_evento(evento_id, 'nombre,confirmacion')
+        if not success:
+            return False, 0, 0, []
         
         total_invitados = len(invitados)
         if total_invitados == 0:
             return True, 0, 0, []  # No hay invitados, consideramos que todos respondieron
             
         # Contar respondidos
-        respondieron = [i for i in invitados if i.get('confirmacion') is not None 
-                        and i.get('confirmacion').strip() != '']
+        respondieron = [i for i in invitados if has_rsvp(i.get('confirmacion'))]
         num_respuestas = len(respondieron)
         
         # Listado de faltantes
-        faltantes = [i['nombre'] for i in invitados if i.get('confirmacion') is None 
-                    or i.get('confirmacion').strip() == '']
+        faltantes = [i['nombre'] for i in invitados if not has_rsvp(i.get('confirmacion'))]
         
         todas_respondieron = (num_respuestas == total_invitados)
         
@@ -1738,61 +1662,13 @@ def verificar_todas_respuestas_evento(evento_id):
         return False, 0, 0, []
 
 def importar_excel_a_evento(file_path, evento_id):
-    """Importa datos de Excel a un evento específico"""
-    try:
-        # Leer Excel
-        df = pd.read_excel(file_path)
-        
-        # Limpiar nombres de columnas
-        df.columns = df.columns.str.strip()
-        
-        # Inicializar Supabase
-        supabase = init_supabase()
-        if not supabase:
-            return False, "No se pudo conectar a Supabase"
-        
-        # Verificar columnas requeridas
-        required_columns = ["Nombre", "Numero"]
-        current_columns = [col.strip() for col in df.columns]
-        required_columns_clean = [col.strip() for col in required_columns]
-        
-        if not all(col in current_columns for col in required_columns_clean):
-            missing_cols = [col for col in required_columns_clean if col not in current_columns]
-            return False, f"El Excel debe contener las columnas obligatorias: {', '.join(missing_cols)}"
-            
-        # Convertir DataFrame a lista de diccionarios
-        invitados_formateados = []
-        
-        for _, row in df.iterrows():
-            invitado_formateado = {
-                'evento_id': evento_id,
-                'nombre': str(row.get('Nombre', '')) if not pd.isna(row.get('Nombre', '')) else '',
-                'numero': str(row.get('Numero', '')) if not pd.isna(row.get('Numero', '')) else '',
-                'confirmacion': str(row.get('Confirmacion', '')) if not pd.isna(row.get('Confirmacion', '')) else '',
-                'acompanante': str(row.get('+1', '')) if not pd.isna(row.get('+1', '')) else '',
-                'restricciones_alimenticias': str(row.get('Restricciones alimenticias', '')) if not pd.isna(row.get('Restricciones alimenticias', '')) else ''
-            }
-            
-            # Validar que el número no esté vacío
-            if invitado_formateado['nombre'] and invitado_formateado['numero']:
-                invitados_formateados.append(invitado_formateado)
-        
-        if not invitados_formateados:
-            return False, "No se encontraron datos válidos para importar"
-            
-        # Eliminar invitados anteriores del evento (opcional)
-        supabase.table('invitados').delete().eq('evento_id', evento_id).execute()
-        
-        # Insertar nuevos invitados
-        response = supabase.table('invitados').insert(invitados_formateados).execute()
-        
-        print(f"DEBUG: Datos importados a Supabase: {len(invitados_formateados)} invitados para el evento {evento_id}")
-        return True, f"Excel importado con éxito. {len(invitados_formateados)} invitados registrados para su evento."
-    except Exception as e:
-        print(f"ERROR detallado en importar_excel_a_evento: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return False, f"Error al importar Excel: {str(e)}"
+    """Importa datos de Excel a un evento específico
+    
+    Compara la planilla con los invitados guardados (GuestImport): agrega los
+    nuevos, actualiza los cambiados y elimina los que ya no están, sin borrar
+    las respuestas registradas. El mensaje resume los cambios (describe_import).
+    """
+    return ExcelService.import_excel_to_evento(file_path, evento_id)
 
 def exportar_evento_a_excel(evento_id, output_file=None):
     """Exporta los invitados de un evento a Excel"""
@@ -1850,7 +1726,7 @@ def obtener_reporte_evento(evento_id):
         evento = response_evento.data[0]
         
         # Obtener invitados del evento
-        success, invitados = obtener_invitados_evento(evento_id)
+        success, invitados = obtener_invitados_evento(evento_id, 'confirmacion')
         if not success:
             return f"Error al generar reporte: {invitados}"
         
@@ -1883,7 +1759,7 @@ def generar_codigo():
     """Genera un código de verificación para un número de teléfono"""
     try:
         data = request.json
-        numero = data.get('numero', '').strip()
+        numero = normalize_phone(data.get('numero', ''))
         
         print(f"\n🔑 Generando código para: {numero}")
         
@@ -16,7 +16,8 @@ const ADMIN_NUMBER = process.env.ADMIN_NUMBER;
 // Inicializar Express
 const app = express();
 app.use(cors());
-app.use(bodyParser.json());
+// Los archivos de /send-media llegan en base64 dentro del JSON
+app.use(bodyParser.json({ limit: process.env.WHATSAPP_SERVER_BODY_LIMIT || '25mb' }));
 app.use(bodyParser.urlencoded({ extended: true }));
 
 // Estado del cliente
@@ -65,7 +66,10 @@ client.on('message', async (message) => {
                 fetch('http://localhost:5000/process-excel', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ from: message.from.replace('@c.us', '') })
+                    body: JSON.stringify({
+                        from: message.from.replace('@c.us', ''),
+                        messageId: message.id._serialized
+                    })
                 }).catch(err => console.error('Error al llamar al backend de Python:', err));
             }
         }
@@ -77,7 +81,9 @@ client.on('message', async (message) => {
             body: JSON.stringify({
                 From: message.from.replace('@c.us', ''),
                 Body: message.body,
-                HasMedia: message.hasMedia
+                HasMedia: message.hasMedia,
+                MessageId: message.id._serialized,
+                Timestamp: message.timestamp
             })
         }).catch(err => console.error('Error al llamar al backend de Python:', err));
         
@@ -155,6 +161,120 @@ app.post('/send-file', async (req, res) => {
     }
 });
 
+// API para enviar archivos en memoria (base64), sin pasar por el disco
+app.post('/send-media', async (req, res) => {
+    try {
+        if (!clientReady) {
+            return res.status(503).json({ 
+                status: 'error', 
+                message: 'Cliente de WhatsApp no está listo' 
+            });
+        }
+        
+        const { number, data, mimetype, filename, caption } = req.body;
+        
+        if (!data || !mimetype) {
+            return res.status(400).json({ 
+                status: 'error', 
+                message: 'Faltan los campos data y mimetype' 
+            });
+        }
+        
+        // Formatear número para WhatsApp
+        let formattedNumber = number;
+        if (!formattedNumber.includes('@c.us')) {
+            formattedNumber = `${formattedNumber}@c.us`;
+        }
+        
+        // Crear media desde los bytes recibidos
+        const media = new MessageMedia(mimetype, data, filename);
+        
+        // Enviar archivo
+        await client.sendMessage(formattedNumber, media, { caption });
+        
+        console.log(`Archivo enviado a ${formattedNumber}: ${filename}`);
+        res.json({ status: 'success', message: 'Archivo enviado con éxito' });
+    } catch (error) {
+        console.error('Error al enviar archivo:', error);
+        res.status(500).json({ status: 'error', message: error.message });
+    }
+});
+
+// API para enviar muchos mensajes en una sola solicitud. El servidor los
+// espacia internamente (intervalMs entre envíos) y devuelve el resultado de
+// cada uno en el mismo orden.
+const BATCH_MAX = parseInt(process.env.WHATSAPP_BATCH_MAX || '500', 10);
+const BATCH_INTERVAL_MS = parseInt(process.env.WHATSAPP_BATCH_INTERVAL_MS || '500', 10);
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+app.post('/send-batch', async (req, res) => {
+    try {
+        if (!clientReady) {
+            return res.status(503).json({ 
+                status: 'error', 
+                message: 'Cliente de WhatsApp no está listo' 
+            });
+        }
+        
+        const { messages, intervalMs } = req.body;
+        
+        if (!Array.isArray(messages) || messages.length === 0) {
+            return res.status(400).json({ 
+                status: 'error', 
+                message: 'El campo messages debe ser una lista con al menos un mensaje' 
+            });
+        }
+        if (messages.length > BATCH_MAX) {
+            return res.status(413).json({ 
+                status: 'error', 
+                message: `Máximo ${BATCH_MAX} mensajes por lote` 
+            });
+        }
+        
+        const intervalo = Number.isFinite(intervalMs) ? Math.max(0, intervalMs) : BATCH_INTERVAL_MS;
+        const results = [];
+        let enviados = 0;
+        
+        for (let i = 0; i < messages.length; i++) {
+            const { number, message } = messages[i] || {};
+            
+            // Si el cliente se desconecta a mitad del lote, el resto se devuelve como reintentable
+            if (!clientReady) {
+                results.push({ number, status: 'error', code: 503, message: 'Cliente de WhatsApp no está listo' });
+                continue;
+            }
+            if (i > 0 && intervalo > 0) {
+                await sleep(intervalo);
+            }
+            
+            try {
+                if (!number || !message) {
+                    throw new Error('Faltan los campos number y message');
+                }
+                
+                // Formatear número para WhatsApp
+                let formattedNumber = String(number);
+                if (!formattedNumber.includes('@c.us')) {
+                    formattedNumber = `${formattedNumber}@c.us`;
+                }
+                
+                await client.sendMessage(formattedNumber, message);
+                results.push({ number, status: 'success' });
+                enviados++;
+            } catch (error) {
+                console.error(`Error al enviar mensaje a ${number}:`, error);
+                results.push({ number, status: 'error', code: 500, message: error.message });
+            }
+        }
+        
+        console.log(`Lote enviado: ${enviados}/${messages.length} mensajes`);
+        res.json({ status: 'success', results });
+    } catch (error) {
+        console.error('Error al enviar lote:', error);
+        res.status(500).json({ status: 'error', message: error.message });
+    }
+});
+
 // Endpoint para verificar el estado del cliente
 app.get('/status', (req, res) => {
     res.json({